@@ -1,50 +1,13 @@
 # a4_split_tab.py
 
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QListWidget,
-    QFileDialog, QMessageBox, QListWidgetItem
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QAbstractItemView,
+    QFileDialog, QMessageBox, QComboBox, QCheckBox
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QDragEnterEvent
-from PyPDF2 import PdfReader, PdfWriter
+from file_list import FileListWidget, count_pdf_pages
+from job_worker import Job, JobPanel, enqueue
+from file_hash_cache import content_keys, duplicate_rows
 import os
-from datetime import datetime
-
-
-class FileListWidget(QListWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAcceptDrops(True)
-
-    def dragEnterEvent(self, event: QDragEnterEvent):
-        if event.mimeData().hasUrls():
-            for url in event.mimeData().urls():
-                file_path = url.toLocalFile()
-                if file_path.endswith('.pdf'):
-                    modification_time = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d %H:%M:%S')
-                    file_name = os.path.basename(file_path)
-                    item_text = f"{file_name} (修改日期: {modification_time})"
-                    item = QListWidgetItem(item_text)
-                    item.setData(Qt.UserRole, file_path)
-                    self.addItem(item)
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
-    def dropEvent(self, event):
-        if event.mimeData().hasUrls():
-            for url in event.mimeData().urls():
-                file_path = url.toLocalFile()
-                if file_path.endswith('.pdf'):
-                    modification_time = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d %H:%M:%S')
-                    file_name = os.path.basename(file_path)
-                    item_text = f"{file_name} (修改日期: {modification_time})"
-                    item = QListWidgetItem(item_text)
-                    item.setData(Qt.UserRole, file_path)
-                    self.addItem(item)
-            event.acceptProposedAction()
-        else:
-            event.ignore()
 
 
 class A4SplitTab(QWidget):
@@ -59,15 +22,24 @@ class A4SplitTab(QWidget):
         right_layout = QVBoxLayout()
 
         # 左侧文件列表
-        self.file_list = FileListWidget()
-        self.file_list.setSelectionMode(QListWidget.ExtendedSelection)  # 允许选择多个文件
+        self.file_list = FileListWidget(('.pdf',), count_pdf_pages, "页")
+        self.file_list.setSelectionMode(QAbstractItemView.ExtendedSelection)  # 允许选择多个文件
+        # 文件夹扫描到的文件也默认全部选中
+        self.file_list.files_found.connect(lambda file_paths: self.file_list.selectAll())
         left_layout.addWidget(self.file_list)
 
+        self.job_panel = JobPanel()
+        left_layout.addWidget(self.job_panel)
+
         # 右侧按钮
         self.add_button = QPushButton("添加A4 PDF文件")
         self.add_button.clicked.connect(self.add_pdf)
         right_layout.addWidget(self.add_button)
 
+        self.add_folder_button = QPushButton("添加文件夹")
+        self.add_folder_button.clicked.connect(self.add_folder)
+        right_layout.addWidget(self.add_folder_button)
+
         self.delete_button = QPushButton("删除选择")
         self.delete_button.clicked.connect(self.delete_selected)
         right_layout.addWidget(self.delete_button)
@@ -98,6 +70,18 @@ class A4SplitTab(QWidget):
         self.split_5_button.clicked.connect(lambda: self.split_pdf(5))
         right_layout.addWidget(self.split_5_button)
 
+        # 输出配置见 pdf_stream_writer.OUTPUT_PROFILES
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("输出: 快速写出", 'fast')
+        self.profile_combo.addItem("输出: 压缩体积", 'small')
+        self.profile_combo.addItem("输出: 打印(图片降采样)", 'print')
+        self.profile_combo.activated.connect(self.check_profile)
+        right_layout.addWidget(self.profile_combo)
+
+        # 勾选后每个文件作为一个任务写入持久队列，由调度器按优先级执行，关闭程序后下次启动继续
+        self.queue_checkbox = QCheckBox("加入任务队列")
+        right_layout.addWidget(self.queue_checkbox)
+
         layout.addLayout(left_layout, 70)
         layout.addLayout(right_layout, 30)
         self.setLayout(layout)
@@ -105,123 +89,87 @@ class A4SplitTab(QWidget):
     def add_pdf(self):
         files, _ = QFileDialog.getOpenFileNames(self, "选择A4 PDF文件", "", "PDF Files (*.pdf)")
         if files:
-            for file in files:
-                modification_time = datetime.fromtimestamp(os.path.getmtime(file)).strftime('%Y-%m-%d %H:%M:%S')
-                file_name = os.path.basename(file)
-                item_text = f"{file_name} (修改日期: {modification_time})"
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, file)
-                self.file_list.addItem(item)
-                
+            self.file_list.add_files(files)
+
             # 默认选择所有文件
             self.file_list.selectAll()
 
+    def add_folder(self):
+        """递归添加文件夹内的文件，在后台扫描，找到的文件陆续加入列表"""
+        directory = QFileDialog.getExistingDirectory(self, "选择A4 PDF文件夹")
+        if directory:
+            self.file_list.add_directory(directory)
+
     def delete_selected(self):
-        for item in self.file_list.selectedItems():
-            self.file_list.takeItem(self.file_list.row(item))
+        self.file_list.delete_selected()
 
     def clear_list(self):
         self.file_list.clear()
 
     def remove_duplicates(self):
-        """去除重复文件"""
-        pdf_files = [self.file_list.item(i).data(Qt.UserRole) for i in range(self.file_list.count())]
-        # Remove duplicates while preserving order
-        unique_files = []
-        seen_files = set()
-        for file in reversed(pdf_files):
-            if file not in seen_files:
-                unique_files.append(file)
-                seen_files.add(file)
-        unique_files.reverse()
+        """按文件内容去除重复文件，另存为不同名称或复制到不同目录的同一文件也能识别"""
+        paths = self.file_list.paths()
+        job = Job(content_keys, paths)
+        job.signals.finished.connect(self.remove_duplicate_items)
+        job.signals.failed.connect(lambda error: QMessageBox.critical(self, "错误", f"查找重复文件失败:\n{error}"))
+        self.job_panel.start(job)
+
+    def remove_duplicate_items(self, keys=None):
+        """在原列表上删除重复项，不重建列表；任务运行期间列表可能已被修改，按当前内容重新判断"""
+        paths = self.file_list.paths()
+        self.file_list.remove_rows(duplicate_rows(paths, keys or {}))
 
-        self.file_list.clear()
-        for file in unique_files:
-            item_text = f"{os.path.basename(file)} (修改日期: {datetime.fromtimestamp(os.path.getmtime(file)).strftime('%Y-%m-%d %H:%M:%S')})"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, file)
-            self.file_list.addItem(item)
-            
         # 重新选择所有文件
         self.file_list.selectAll()
 
+    def check_profile(self):
+        """选中的输出配置因缺少依赖不能完全生效时提示"""
+        from pdf_stream_writer import profile_warning
+        warning = profile_warning(self.profile_combo.currentData())
+        if warning:
+            QMessageBox.warning(self, "提示", warning)
+
     def split_pdf(self, num_parts):
         """将选中的PDF文件的每页拆分为指定数量的A5页面"""
-        # 先去除重复项
-        self.remove_duplicates()
+        # 先去除路径相同的重复项
+        self.remove_duplicate_items()
         
-        selected_items = self.file_list.selectedItems()
-        if not selected_items:
+        # 多个文件时交给进程池并行拆分，结束后统一汇报结果
+        file_paths = self.file_list.selected_paths()
+        if not file_paths:
             QMessageBox.warning(self, "警告", "请至少选择一个PDF文件")
             return
 
-        # 处理所有选中的文件
-        for item in selected_items:
-            file_path = item.data(Qt.UserRole)
-            if not file_path or not os.path.exists(file_path):
-                QMessageBox.critical(self, "错误", f"文件不存在: {file_path}")
-                continue
-                
-            try:
-                # 读取PDF文件
-                reader = PdfReader(file_path)
-                total_pages = len(reader.pages)
-
-                # 获取原文件路径和文件名信息
-                file_dir = os.path.dirname(file_path)
-                file_name = os.path.splitext(os.path.basename(file_path))[0]
-                
-                # 创建输出文件
-                output_filename = f"{file_name}-{num_parts}a5.pdf"
-                output_path = os.path.join(file_dir, output_filename)
-                
-                writer = PdfWriter()
-
-                # 处理每一页
-                for page_num in range(total_pages):
-                    # 获取原始页面
-                    original_page = reader.pages[page_num]
-                    
-                    # 获取页面尺寸
-                    width = float(original_page.mediabox.width)
-                    height = float(original_page.mediabox.height)
-                    
-                    # 根据拆分数量计算每个子页面的尺寸和位置
-                    for i in range(num_parts):
-                        # 为每个裁剪创建一个独立的页面副本
-                        # 我们需要创建一个新的PDF来获取独立的页面对象
-                        temp_writer = PdfWriter()
-                        temp_writer.add_page(original_page)
-                        
-                        # 将页面写入临时缓冲区
-                        from io import BytesIO
-                        buffer = BytesIO()
-                        temp_writer.write(buffer)
-                        
-                        # 从缓冲区创建新的reader以获取独立的页面对象
-                        buffer.seek(0)
-                        new_reader = PdfReader(buffer)
-                        new_page = new_reader.pages[0]
-                        
-                        # 计算裁剪区域 (垂直分割，从上到下)
-                        # 注意：PDF坐标系统是从左下角(0,0)开始的
-                        left = 0
-                        bottom = height * (num_parts - i - 1) / num_parts
-                        right = width
-                        top = height * (num_parts - i) / num_parts
-                        
-                        # 设置裁剪框
-                        new_page.cropbox.lower_left = (left, bottom)
-                        new_page.cropbox.upper_right = (right, top)
-                        
-                        # 添加到输出文件
-                        writer.add_page(new_page)
-
-                # 保存文件
-                with open(output_path, 'wb') as output_file:
-                    writer.write(output_file)
-
-                QMessageBox.information(self, "成功", f"A4 PDF已成功拆分为{num_parts}份A5页面\n文件保存为:\n{output_path}")
-
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"拆分PDF失败:\n{str(e)}")
+        if self.queue_checkbox.isChecked():
+            job_ids = [enqueue('split', {'file': file_path, 'parts': num_parts,
+                                         'profile': self.profile_combo.currentData()},
+                               f"拆分{num_parts}份 {os.path.basename(file_path)}")
+                       for file_path in file_paths]
+            self.job_panel.status_label.setText(f"已加入任务队列 {len(job_ids)} 个，编号 {job_ids[0]}-{job_ids[-1]}")
+            return
+
+        # PyPDF2 第一次拆分时才导入
+        from a4_splitter import A4Splitter
+        splitter = A4Splitter(self.profile_combo.currentData())
+        if len(file_paths) > 1:
+            job = Job(splitter.split_files_parallel, file_paths, num_parts)
+        else:
+            job = Job(splitter.split_files, file_paths, num_parts)
+        job.signals.finished.connect(lambda summary: self.on_split_finished(summary, num_parts))
+        job.signals.failed.connect(lambda error: QMessageBox.critical(self, "错误", f"拆分PDF失败:\n{error}"))
+        self.job_panel.start(job)
+
+    def on_split_finished(self, summary, num_parts):
+        message = (f"A4 PDF已拆分为{num_parts}份A5页面\n"
+                   f"成功 {summary['succeeded']} 个, 失败 {summary['failed']} 个\n"
+                   f"共 {summary['pages']} 页, 耗时 {summary['seconds']:.2f} 秒, "
+                   f"速度 {summary['pages_per_second']:.1f} 页/秒")
+        output_paths = [output_path for _, output_path, error, _ in summary['results'] if not error]
+        if output_paths:
+            message += "\n\n文件保存为:\n" + "\n".join(output_paths)
+        errors = [error for _, _, error, _ in summary['results'] if error]
+        if errors:
+            message += "\n\n失败:\n" + "\n".join(errors)
+            QMessageBox.warning(self, "完成", message)
+        else:
+            QMessageBox.information(self, "成功", message)
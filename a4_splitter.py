@@ -0,0 +1,183 @@
+# a4_splitter.py
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import DictionaryObject, NameObject, RectangleObject
+from pdf_stream_writer import PdfStreamWriter, OUTPUT_PROFILES
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from instrumentation import stage, count_read, count_written
+from pdf_index import invalid_pdfs, pdf_media_boxes, read_media_boxes
+from mapped_file import open_mapped
+from output_file import replace_on_success
+import os
+import time
+
+
+class A4Splitter:
+    def __init__(self, profile='fast'):
+        self.last_page_count = 0
+        # 输出配置(见 pdf_stream_writer.OUTPUT_PROFILES)，fast 以外的配置由 PdfStreamWriter 写出
+        self.profile = profile
+
+    def split_pdf(self, file_path, num_parts, on_page=None, output_path=None):
+        """将PDF文件的每页拆分为指定数量的A5页面，返回输出文件路径；
+        不指定 output_path 时输出为源文件旁边的 文件名-Na5.pdf"""
+        # 以内存映射方式读取PDF文件，页面内容在写出时才读取，映射保持到写完
+        with open_mapped(file_path) as source:
+            return self._split_mapped(source, file_path, num_parts, on_page, output_path)
+
+    def _split_mapped(self, source, file_path, num_parts, on_page=None, output_path=None):
+        with stage('open', file_path):
+            reader = PdfReader(source)
+        count_read(file_path)
+        total_pages = len(reader.pages)
+        self.last_page_count = total_pages
+        # 各页尺寸取自PDF索引，第一次拆分时从已打开的 reader 读取并记入索引
+        media_boxes = pdf_media_boxes(file_path, reader) or read_media_boxes(reader)
+
+        if output_path is None:
+            # 获取原文件路径和文件名信息
+            file_dir = os.path.dirname(file_path)
+            file_name = os.path.splitext(os.path.basename(file_path))[0]
+
+            # 创建输出文件
+            output_filename = f"{file_name}-{num_parts}a5.pdf"
+            output_path = os.path.join(file_dir, output_filename)
+
+        if self.profile != 'fast':
+            self._split_optimized(reader, media_boxes, file_path, output_path, num_parts, on_page)
+            return output_path
+
+        writer = PdfWriter()
+
+        # 处理每一页
+        with stage('crop', file_path):
+            for page_num in range(total_pages):
+                if on_page:
+                    on_page(page_num, total_pages)
+                # 获取原始页面
+                original_page = reader.pages[page_num]
+
+                # 获取页面尺寸
+                x0, y0, x1, y1 = media_boxes[page_num]
+                width = x1 - x0
+                height = y1 - y0
+
+                # 根据拆分数量计算每个子页面的尺寸和位置
+                for i in range(num_parts):
+                    # add_page 每次都会生成新的页面字典，内容流和资源仍与原页面共享，
+                    # 各子页面只有裁剪框不同
+                    new_page = writer.add_page(original_page)
+
+                    # 计算裁剪区域 (垂直分割，从上到下)
+                    # 注意：PDF坐标系统是从左下角(0,0)开始的
+                    left = 0
+                    bottom = height * (num_parts - i - 1) / num_parts
+                    right = width
+                    top = height * (num_parts - i) / num_parts
+
+                    # 设置裁剪框，整体替换而不是修改可能被共享的矩形对象
+                    new_page.cropbox = RectangleObject((left, bottom, right, top))
+
+        # 保存文件
+        with stage('write', file_path):
+            with replace_on_success(output_path) as temp_path, open(temp_path, 'wb') as output_file:
+                writer.write(output_file)
+        count_written(output_path)
+        return output_path
+
+    def _split_optimized(self, reader, media_boxes, file_path, output_path, num_parts, on_page=None):
+        """按输出配置压缩写出；各子页面是同一页面字典换了裁剪框，内容流和资源只写一次"""
+        pages = []
+        with stage('crop', file_path):
+            for page, (x0, y0, x1, y1) in zip(reader.pages, media_boxes):
+                width = x1 - x0
+                height = y1 - y0
+                for i in range(num_parts):
+                    part = DictionaryObject(page)
+                    part[NameObject("/CropBox")] = RectangleObject(
+                        (0, height * (num_parts - i - 1) / num_parts, width, height * (num_parts - i) / num_parts))
+                    pages.append((part, page.indirect_reference))
+        with stage('write', file_path):
+            with replace_on_success(output_path) as temp_path, open(temp_path, 'wb') as output_file:
+                writer = PdfStreamWriter(output_file, **OUTPUT_PROFILES[self.profile])
+                writer.add_pages(pages, on_page)
+                writer.close()
+        count_written(output_path)
+
+    def split_files(self, file_paths, num_parts, on_file=None, on_page=None):
+        """依次拆分多个文件，返回汇总结果(见 summarize)"""
+        start = time.perf_counter()
+        invalid = check_files(file_paths)
+        results = []
+        for index, file_path in enumerate(file_paths):
+            if on_file:
+                on_file(index, len(file_paths), file_path)
+            if file_path in invalid:
+                results.append((file_path, None, invalid[file_path], 0))
+                continue
+            results.append(self._split_one(file_path, num_parts, on_page))
+        return summarize(results, time.perf_counter() - start)
+
+    def split_files_parallel(self, file_paths, num_parts, workers=None, on_file=None, on_page=None):
+        """每个文件交给一个独立进程拆分，充分利用多核，返回汇总结果(见 summarize)"""
+        start = time.perf_counter()
+        invalid = check_files(file_paths)
+        results = [None] * len(file_paths)
+        for index, file_path in enumerate(file_paths):
+            if file_path in invalid:
+                results[index] = (file_path, None, invalid[file_path], 0)
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        try:
+            futures = {executor.submit(_split_in_process, file_path, num_parts, self.profile): index
+                       for index, file_path in enumerate(file_paths) if file_path not in invalid}
+            # 子进程内的各阶段无法记录，主进程等待结果的时间计入 wait
+            with stage('wait'):
+                for done, future in enumerate(as_completed(futures)):
+                    index = futures[future]
+                    results[index] = future.result()
+                    # 子进程内的逐页进度无法传回，按完成的文件数报告
+                    if on_file:
+                        on_file(done, len(file_paths), file_paths[index])
+                    if on_page:
+                        on_page(done, len(file_paths))
+        except BaseException:
+            # 取消或出错时丢弃尚未开始的文件，不等待正在运行的进程
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        return summarize(results, time.perf_counter() - start)
+
+    def _split_one(self, file_path, num_parts, on_page=None):
+        """拆分单个文件，返回 (源文件, 输出文件, 错误信息, 页数)"""
+        if not file_path or not os.path.exists(file_path):
+            return file_path, None, f"文件不存在: {file_path}", 0
+        try:
+            output_path = self.split_pdf(file_path, num_parts, on_page)
+        except Exception as e:
+            return file_path, None, f"拆分PDF失败:\n{str(e)}", 0
+        return file_path, output_path, None, self.last_page_count
+
+
+def _split_in_process(file_path, num_parts, profile='fast'):
+    # 进程池只能调用模块级函数
+    return A4Splitter(profile)._split_one(file_path, num_parts)
+
+
+def check_files(file_paths):
+    """按PDF索引找出无法拆分的文件，返回 {路径: 错误信息}，这些文件不再交给拆分进程"""
+    with stage('check'):
+        invalid = invalid_pdfs([file_path for file_path in file_paths if file_path])
+    return {file_path: f"拆分PDF失败:\n{error}" for file_path, error in invalid.items()}
+
+
+def summarize(results, seconds):
+    """汇总批量拆分结果，pages_per_second 按源文件页数计算"""
+    pages = sum(result[3] for result in results)
+    return {
+        'results': results,
+        'succeeded': sum(1 for result in results if result[2] is None),
+        'failed': sum(1 for result in results if result[2] is not None),
+        'pages': pages,
+        'seconds': seconds,
+        'pages_per_second': pages / seconds if seconds > 0 else 0.0,
+    }
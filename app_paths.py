@@ -0,0 +1,11 @@
+# app_paths.py
+
+import os
+
+
+def app_data_dir():
+    """本机数据目录(缓存、索引、日志)，Windows 下位于 %LOCALAPPDATA%\\FinanceTool"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    path = os.path.join(base, 'FinanceTool')
+    os.makedirs(path, exist_ok=True)
+    return path
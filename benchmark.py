@@ -0,0 +1,366 @@
+# benchmark.py
+# 性能基准：用固定种子生成测试文件，无界面运行各合并/拆分流程，
+# 记录耗时、每秒页数/行数和用例运行期间的内存峰值增量，并与保存的基准结果比较，发现性能退化。
+#   python benchmark.py                          运行全部用例并与基准比较
+#   python benchmark.py --sizes small medium     只运行指定规模
+#   python benchmark.py --cases pdf-merge split  只运行指定用例
+#   python benchmark.py --save-baseline          把本次结果保存为基准
+
+from instrumentation import MemorySampler
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+# 各规模的输入: PDF文件数 x 每个文件页数, Excel文件数 x 每个文件数据行数
+SIZES = {
+    'small': {'pdf_files': 5, 'pdf_pages': 4, 'excel_files': 4, 'excel_rows': 500},
+    'medium': {'pdf_files': 20, 'pdf_pages': 10, 'excel_files': 8, 'excel_rows': 5000},
+    'large': {'pdf_files': 50, 'pdf_pages': 20, 'excel_files': 16, 'excel_rows': 20000},
+}
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+# 吞吐量下降或内存增量增长超过这个比例视为退化
+DEFAULT_TOLERANCE = 0.2
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4
+IMAGE_SIZE = 160
+
+
+def _pdf_bytes(objects, catalog_id):
+    """按对象顺序拼出完整的PDF文件内容"""
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for object_id, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % object_id + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref)
+    return bytes(out)
+
+
+def _stream(dictionary, data):
+    return b"<< %s /Length %d >>\nstream\n" % (dictionary, len(data)) + data + b"\nendstream"
+
+
+def make_pdf(path, pages, seed):
+    """生成A4多页PDF：每个文件嵌入同一份字体程序(像同一系统开出的发票)和一张各自不同的图片(像扫描的印章)"""
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    # 字体程序内容固定，所有文件相同，可以测出合并时的资源去重效果
+    font_rng = random.Random(0)
+    font_program = bytes(font_rng.getrandbits(8) for _ in range(40000))
+    font_file = add(_stream(b"/Length1 %d /Filter /FlateDecode" % len(font_program), zlib.compress(font_program)))
+    descriptor = add(b"<< /Type /FontDescriptor /FontName /LedgerSans /Flags 32 /FontBBox [0 -200 1000 900] "
+                     b"/ItalicAngle 0 /Ascent 900 /Descent -200 /CapHeight 700 /StemV 80 /FontFile2 %d 0 R >>"
+                     % font_file)
+    font = add(b"<< /Type /Font /Subtype /TrueType /BaseFont /LedgerSans /FirstChar 32 /LastChar 126 "
+               b"/Widths [%s] /FontDescriptor %d 0 R >>" % (b" ".join([b"500"] * 95), descriptor))
+    # 随机像素几乎无法压缩，大小接近真实照片
+    pixels = bytes(rng.getrandbits(8) for _ in range(IMAGE_SIZE * IMAGE_SIZE * 3))
+    image = add(_stream(b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+                        b"/BitsPerComponent 8 /Filter /FlateDecode" % (IMAGE_SIZE, IMAGE_SIZE), zlib.compress(pixels)))
+    resources = add(b"<< /Font << /F1 %d 0 R >> /XObject << /Im1 %d 0 R >> >>" % (font, image))
+
+    pages_id = len(objects) + 2 * pages + 1
+    kids = []
+    for page in range(pages):
+        lines = [b"BT /F1 10 Tf 50 800 Td 14 TL"]
+        for line in range(50):
+            amount = rng.randint(100, 999999) / 100
+            lines.append(b"(%d-%03d-%02d  Voucher %06d  Amount %.2f) '" % (seed, page, line, rng.randint(0, 999999),
+                                                                          amount))
+        lines.append(b"ET q 120 0 0 120 420 60 cm /Im1 Do Q")
+        content = add(_stream(b"", b"\n".join(lines)))
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %d 0 R /Contents %d 0 R >>"
+                        % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, resources, content)))
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), pages))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    with open(path, 'wb') as f:
+        f.write(_pdf_bytes(objects, catalog))
+
+
+def ledger_rows(rows, seed):
+    """台账内容：8行表头，之后是数据行，每隔一段夹一个空行"""
+    rng = random.Random(seed)
+    header = [["多瑞财务 记账凭证汇总", None, None, None, None, None]]
+    header += [[f"表头{index}", f"说明{index}", None, None, None, None] for index in range(1, 7)]
+    header.append(["日期", "凭证号", "科目", "摘要", "借方", "贷方"])
+    data = []
+    for row in range(rows):
+        if row % 37 == 36:
+            data.append([None] * 6)
+            continue
+        amount = rng.randint(100, 9999999) / 100
+        data.append([f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", f"记-{seed:03d}-{row:05d}",
+                     rng.choice(("银行存款", "应收账款", "管理费用", "应交税费", "主营业务收入")),
+                     f"摘要{rng.randint(0, 9999)}", amount if row % 2 else None, None if row % 2 else amount])
+    return header, data
+
+
+def make_xlsx(path, rows, seed):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("凭证")
+    header, data = ledger_rows(rows, seed)
+    for row in header + data:
+        ws.append(row)
+    wb.save(path)
+
+
+def make_xls(path, rows, seed):
+    import xlwt
+    wb = xlwt.Workbook(encoding='utf-8')
+    ws = wb.add_sheet("凭证")
+    header, data = ledger_rows(rows, seed)
+    for row_index, row in enumerate(header + data):
+        for column_index, value in enumerate(row):
+            if value is not None:
+                ws.write(row_index, column_index, value)
+    wb.save(path)
+
+
+def xls_available():
+    try:
+        import xlwt  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def prepare_inputs(data_dir, size):
+    """生成(或复用已生成的)测试文件，返回 (PDF文件列表, Excel文件列表)"""
+    spec = SIZES[size]
+    pdf_dir = os.path.join(data_dir, size, 'pdf')
+    excel_dir = os.path.join(data_dir, size, 'excel')
+    os.makedirs(pdf_dir, exist_ok=True)
+    os.makedirs(excel_dir, exist_ok=True)
+
+    pdf_files = []
+    for index in range(spec['pdf_files']):
+        path = os.path.join(pdf_dir, f"in{index:03d}.pdf")
+        if not os.path.exists(path):
+            make_pdf(path, spec['pdf_pages'], index)
+        pdf_files.append(path)
+
+    # 有 xlwt 时一半文件为 .xls，和实际台账一样两种格式混合
+    with_xls = xls_available()
+    excel_files = []
+    for index in range(spec['excel_files']):
+        extension = '.xls' if with_xls and index % 2 else '.xlsx'
+        path = os.path.join(excel_dir, f"ledger{index:03d}{extension}")
+        if not os.path.exists(path):
+            (make_xls if extension == '.xls' else make_xlsx)(path, spec['excel_rows'], index)
+        excel_files.append(path)
+    return pdf_files, excel_files
+
+
+def _pdf_merge(pdf_files, excel_files, output_dir, first_page=False, **options):
+    from pdf_manager import PdfManager
+    if first_page:
+        # 每个文件只取第1页(发票首页)
+        options['page_ranges'] = {pdf_file: '1' for pdf_file in pdf_files}
+    PdfManager().merge_pdfs(pdf_files, os.path.join(output_dir, 'merged.pdf'), **options)
+
+
+def _excel_merge(pdf_files, excel_files, output_dir, **options):
+    from excel_manager import ExcelManager
+    ExcelManager().merge_files(excel_files, os.path.join(output_dir, 'merged.xlsx'), **options)
+
+
+def _excel_merge_parallel(pdf_files, excel_files, output_dir):
+    from excel_manager import ExcelManager
+    ExcelManager().merge_files_parallel(excel_files, os.path.join(output_dir, 'merged.xlsx'))
+
+
+def _excel_merge_columnar(pdf_files, excel_files, output_dir, workers=None):
+    from excel_manager import ExcelManager
+    ExcelManager().merge_files_columnar(excel_files, os.path.join(output_dir, 'merged.xlsx'), workers)
+
+
+def _excel_print(pdf_files, excel_files, output_dir, parallel=False):
+    from excel_manager import ExcelManager
+    excel_manager = ExcelManager()
+    merge = excel_manager.merge_sheets_parallel if parallel else excel_manager.merge_sheets
+    merge(excel_files, os.path.join(output_dir, 'print.xlsx'))
+
+
+def _split(pdf_files, excel_files, output_dir, parallel=False, profile='fast'):
+    from a4_splitter import A4Splitter
+    splitter = A4Splitter(profile)
+    summary = (splitter.split_files_parallel if parallel else splitter.split_files)(pdf_files, 2)
+    if summary['failed']:
+        raise RuntimeError(summary['results'])
+    # 拆分结果写在源文件旁边，统计大小后删掉以免影响下一次运行
+    output_bytes = 0
+    for _, output_path, _, _ in summary['results']:
+        output_bytes += os.path.getsize(output_path)
+        os.remove(output_path)
+    return output_bytes
+
+
+def _output_bytes(output_dir):
+    return sum(entry.stat().st_size for entry in os.scandir(output_dir) if entry.is_file())
+
+
+# 用例名 -> (运行函数, 参数, 计量单位)
+CASES = {
+    'pdf-merge': (_pdf_merge, {}, 'pages'),
+    'pdf-merge-streaming': (_pdf_merge, {'streaming': True}, 'pages'),
+    'pdf-merge-dedupe': (_pdf_merge, {'dedupe': True}, 'pages'),
+    'pdf-merge-first-page': (_pdf_merge, {'first_page': True}, 'files'),
+    'pdf-merge-small': (_pdf_merge, {'profile': 'small'}, 'pages'),
+    'pdf-merge-print': (_pdf_merge, {'profile': 'print'}, 'pages'),
+    'excel-merge': (_excel_merge, {}, 'rows'),
+    'excel-merge-streaming': (_excel_merge, {'streaming': True}, 'rows'),
+    'excel-merge-parallel': (_excel_merge_parallel, {}, 'rows'),
+    'excel-merge-columnar': (_excel_merge_columnar, {'workers': 1}, 'rows'),
+    'excel-merge-columnar-parallel': (_excel_merge_columnar, {}, 'rows'),
+    'excel-print': (_excel_print, {}, 'rows'),
+    'excel-print-parallel': (_excel_print, {'parallel': True}, 'rows'),
+    'split': (_split, {}, 'pages'),
+    'split-parallel': (_split, {'parallel': True}, 'pages'),
+    'split-small': (_split, {'profile': 'small'}, 'pages'),
+}
+
+
+def run_case(case, size, data_dir):
+    """在当前进程运行一个用例并返回测量结果；由 run_isolated 在独立进程中调用"""
+    func, options, unit = CASES[case]
+    pdf_files, excel_files = prepare_inputs(data_dir, size)
+    spec = SIZES[size]
+    if unit == 'pages':
+        units = spec['pdf_files'] * spec['pdf_pages']
+    elif unit == 'files':
+        units = spec['pdf_files']
+    else:
+        units = spec['excel_files'] * spec['excel_rows']
+    with tempfile.TemporaryDirectory() as output_dir:
+        # 内存按用例运行期间的峰值减去开始前的值计算，不含导入模块和准备数据
+        memory = MemorySampler()
+        memory.start()
+        start = time.perf_counter()
+        output_bytes = func(pdf_files, excel_files, output_dir, **options)
+        seconds = time.perf_counter() - start
+        memory.stop()
+        if output_bytes is None:
+            output_bytes = _output_bytes(output_dir)
+    return {
+        'case': case,
+        'size': size,
+        'seconds': round(seconds, 3),
+        'unit': unit,
+        'units': units,
+        'per_second': round(units / seconds, 1) if seconds > 0 else 0.0,
+        'peak_memory_mb': memory.growth_mb(),
+        'output_mb': round(output_bytes / 1024 / 1024, 2),
+    }
+
+
+def run_isolated(case, size, data_dir):
+    """每个用例在新进程中运行，内存互不影响"""
+    command = [sys.executable, os.path.abspath(__file__), '--run-case', case, '--sizes', size, '--data-dir', data_dir]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        return {'case': case, 'size': size, 'error': completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    baseline = load_baseline(path)
+    for result in results:
+        if 'error' not in result:
+            baseline[f"{result['case']}/{result['size']}"] = result
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def compare(result, baseline, tolerance):
+    """与基准比较，返回 (吞吐量变化比例, 内存变化比例, 是否退化)"""
+    previous = baseline.get(f"{result['case']}/{result['size']}")
+    if not previous or 'error' in result:
+        return None, None, False
+    speed_change = result['per_second'] / previous['per_second'] - 1 if previous['per_second'] else None
+    memory_change = None
+    if result['peak_memory_mb'] and previous.get('peak_memory_mb'):
+        memory_change = result['peak_memory_mb'] / previous['peak_memory_mb'] - 1
+    regressed = ((speed_change is not None and speed_change < -tolerance)
+                 or (memory_change is not None and memory_change > tolerance))
+    return speed_change, memory_change, regressed
+
+
+def format_change(change):
+    return "" if change is None else f"{change:+.0%}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合并/拆分性能基准")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'], help="测试规模")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES), help="测试用例")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'FinanceTool-benchmark'),
+                        help="测试文件目录，生成过的文件会复用")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基准结果文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基准")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="允许的退化比例，默认0.2")
+    parser.add_argument('--json', action='store_true', help="以JSON行输出结果")
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.sizes[0], args.data_dir), ensure_ascii=False))
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    results = []
+    regressions = 0
+    if not args.json:
+        print(f"{'用例':<24}{'规模':<8}{'耗时(秒)':>10}{'吞吐量':>16}{'内存增量(MB)':>14}{'输出(MB)':>10}"
+              f"{'速度变化':>10}{'内存变化':>10}")
+    for size in args.sizes:
+        # 先在本进程生成测试文件，生成时间不计入用例耗时
+        prepare_inputs(args.data_dir, size)
+        for case in args.cases:
+            result = run_isolated(case, size, args.data_dir)
+            speed_change, memory_change, regressed = compare(result, baseline, args.tolerance)
+            result['regressed'] = regressed
+            regressions += regressed
+            results.append(result)
+            if args.json:
+                print(json.dumps(result, ensure_ascii=False), flush=True)
+            elif 'error' in result:
+                print(f"{case:<24}{size:<8}失败: {result['error']}", flush=True)
+            else:
+                rate = f"{result['per_second']:.0f} {result['unit']}/s"
+                print(f"{case:<24}{size:<8}{result['seconds']:>10.2f}{rate:>16}{result['peak_memory_mb'] or 0:>14.1f}"
+                      f"{result['output_mb']:>10.2f}{format_change(speed_change):>10}{format_change(memory_change):>10}"
+                      f"{'  退化' if regressed else ''}", flush=True)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+    failed = sum(1 for result in results if 'error' in result)
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,291 @@
+# cli.py
+# 无界面批处理入口，不依赖PyQt5，便于计划任务或服务器批量运行。
+# 结果以一行JSON输出到标准输出，例如:
+#   python cli.py pdf-merge D:/发票 -o D:/PDF/合并.pdf --dedupe
+#   python cli.py excel-merge "D:/台账/*.xlsx" -o D:/台账/合并.xlsx --incremental
+#   python cli.py split D:/凭证 -n 2
+#   python cli.py watch D:/收件 --mode split -n 2
+#   python cli.py split D:/凭证 -n 2 --queue          (只加入任务队列)
+#   python cli.py queue run --once                   (执行队列中的任务，完成后退出)
+
+from dir_scanner import iter_files
+from instrumentation import start_trace, finish_trace
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+PDF_EXTENSIONS = ('.pdf',)
+# 与 pdf_stream_writer.OUTPUT_PROFILES 一致，这里列出以免解析参数时就导入PyPDF2
+PDF_PROFILES = ('fast', 'small', 'print')
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+
+def expand_inputs(inputs, extensions, recursive=False):
+    """把文件、通配符、目录展开为文件列表；与界面一样去除重复路径，保留最后出现的一项"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(iter_files(item, extensions, recursive))
+        elif glob.has_magic(item):
+            files.extend(sorted(glob.glob(item, recursive=recursive)))
+        else:
+            files.append(item)
+    files = [file for file in files if file.lower().endswith(extensions)]
+
+    unique_files = []
+    seen_files = set()
+    for file in reversed(files):
+        if file not in seen_files:
+            unique_files.append(file)
+            seen_files.add(file)
+    unique_files.reverse()
+    return unique_files
+
+
+def run_pdf_merge(args):
+    from pdf_manager import PdfManager
+    files = expand_inputs(args.inputs, PDF_EXTENSIONS, args.recursive)
+    if not files:
+        raise ValueError("没有找到PDF文件")
+    page_ranges = {file: args.pages for file in files} if args.pages else None
+    if args.queue:
+        params = {'files': files, 'output': args.output, 'streaming': args.streaming, 'dedupe': args.dedupe,
+                  'page_ranges': page_ranges, 'profile': args.profile}
+        return enqueue_jobs([('pdf-merge', params, f"PDF合并 {os.path.basename(args.output)}")], args.priority)
+    pdf_manager = PdfManager()
+    pdf_manager.merge_pdfs(files, args.output, args.streaming, dedupe=args.dedupe, page_ranges=page_ranges,
+                           profile=args.profile)
+    return {
+        'inputs': len(files),
+        'output': args.output,
+        'output_bytes': os.path.getsize(args.output),
+        'saved_objects': pdf_manager.saved_objects,
+        'saved_bytes': pdf_manager.saved_bytes,
+    }
+
+
+def run_excel_merge(args):
+    from excel_manager import ExcelManager
+    files = expand_inputs(args.inputs, EXCEL_EXTENSIONS, args.recursive)
+    if not files:
+        raise ValueError("没有找到Excel文件")
+    if args.queue:
+        # 队列任务之间并行执行，--parallel/--workers 不适用
+        params = {'files': files, 'output': args.output, 'streaming': args.streaming,
+                  'incremental': args.incremental, 'columnar': args.columnar,
+                  'dedupe': args.dedupe, 'key_columns': args.key_columns}
+        return enqueue_jobs([('excel-merge', params, f"Excel合并 {os.path.basename(args.output)}")], args.priority)
+    excel_manager = ExcelManager()
+    if args.dedupe:
+        from row_index import RowIndex, parse_columns
+        row_index = RowIndex(parse_columns(args.key_columns or ''), args.dedupe)
+        excel_manager.merge_files_streaming(files, args.output, row_index=row_index)
+    elif args.incremental:
+        excel_manager.merge_files_incremental(files, args.output)
+    elif args.columnar:
+        excel_manager.merge_files_columnar(files, args.output, args.workers if args.parallel else 1)
+    elif args.parallel and len(files) > 1:
+        excel_manager.merge_files_parallel(files, args.output, args.workers)
+    else:
+        excel_manager.merge_files(files, args.output, args.streaming)
+    return {
+        'inputs': len(files),
+        'output': args.output,
+        'output_bytes': os.path.getsize(args.output),
+        'rows': excel_manager.rows_merged,
+        'incremental': excel_manager.incremental_stats,
+        'duplicate_rows': excel_manager.duplicate_rows,
+        'duplicate_report': excel_manager.duplicate_report,
+    }
+
+
+def run_split(args):
+    from a4_splitter import A4Splitter
+    files = expand_inputs(args.inputs, PDF_EXTENSIONS, args.recursive)
+    if not files:
+        raise ValueError("没有找到PDF文件")
+    # 目录中已有的拆分结果不再重复拆分
+    suffix = f"-{args.parts}a5.pdf"
+    files = [file for file in files if not file.endswith(suffix)]
+    if args.queue:
+        # 每个文件一个任务
+        return enqueue_jobs([('split', {'file': file, 'parts': args.parts, 'profile': args.profile},
+                              f"拆分{args.parts}份 {os.path.basename(file)}") for file in files], args.priority)
+    splitter = A4Splitter(args.profile)
+    if args.workers != 1 and len(files) > 1:
+        summary = splitter.split_files_parallel(files, args.parts, args.workers)
+    else:
+        summary = splitter.split_files(files, args.parts)
+    return {
+        'inputs': len(files),
+        'succeeded': summary['succeeded'],
+        'failed': summary['failed'],
+        'pages': summary['pages'],
+        'pages_per_second': summary['pages_per_second'],
+        'results': [{'input': file_path, 'output': output_path, 'error': error, 'pages': pages}
+                    for file_path, output_path, error, pages in summary['results']],
+    }
+
+
+def run_watch(args):
+    from hot_folder import HotFolder
+    hot_folder = HotFolder(args.input_dir, args.mode, args.output_dir, args.processed_dir, args.failed_dir,
+                           parts=args.parts, batch_size=args.batch_size, settle_seconds=args.settle,
+                           poll_interval=args.interval, workers=args.workers, give_up_seconds=args.give_up)
+
+    def print_result(result):
+        # 持续运行时每完成一个任务输出一行
+        print(json.dumps(dict(command='task', ok=result['error'] is None, **result), ensure_ascii=False), flush=True)
+
+    try:
+        stats = hot_folder.run(print_result, once=args.once)
+    except KeyboardInterrupt:
+        stats = hot_folder.stats
+    return stats
+
+
+def enqueue_jobs(jobs, priority=0):
+    """把 (任务名称, 参数, 标题) 写入持久任务队列；路径转为绝对路径，执行时与当前目录无关"""
+    from job_queue import JobQueue
+    queue = JobQueue()
+    try:
+        job_ids = []
+        for operation, params, title in jobs:
+            params = dict(params)
+            for key in ('file', 'output'):
+                if key in params:
+                    params[key] = os.path.abspath(params[key])
+            if 'files' in params:
+                params['files'] = [os.path.abspath(file) for file in params['files']]
+            if params.get('page_ranges'):
+                params['page_ranges'] = {os.path.abspath(file): spec for file, spec in params['page_ranges'].items()}
+            job_ids.append(queue.submit(operation, params, title, priority))
+    finally:
+        queue.close()
+    return {'queued': job_ids}
+
+
+def run_queue(args):
+    from job_queue import JobQueue, JobScheduler
+    if args.action == 'list':
+        queue = JobQueue()
+        try:
+            jobs = queue.jobs(args.limit)
+        finally:
+            queue.close()
+        return {'jobs': [{key: job[key] for key in ('id', 'title', 'priority', 'status', 'attempts', 'seconds',
+                                                     'error')} for job in jobs]}
+
+    def print_change(job_id, status, record):
+        # 持续运行时每个任务状态变化输出一行
+        print(json.dumps({'command': 'job', 'id': job_id, 'status': status,
+                          'seconds': record['seconds'] if record else None}, ensure_ascii=False), flush=True)
+
+    scheduler = JobScheduler(workers=args.workers, on_change=print_change)
+    try:
+        scheduler.run(once=args.once)
+    except KeyboardInterrupt:
+        # 运行中的任务留在队列里，下次启动后重新执行
+        pass
+    return {'completed': scheduler.completed}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="多瑞财务工具 - 命令行批处理")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_inputs(subparser):
+        subparser.add_argument('inputs', nargs='+', help="文件、通配符或目录")
+        subparser.add_argument('-r', '--recursive', action='store_true', help="递归处理子目录")
+        subparser.add_argument('--queue', action='store_true', help="不立即执行，加入持久任务队列")
+        subparser.add_argument('--priority', type=int, default=0, help="队列优先级，数字大的先执行，默认0")
+
+    pdf_parser = subparsers.add_parser('pdf-merge', help="合并PDF")
+    add_inputs(pdf_parser)
+    pdf_parser.add_argument('-o', '--output', required=True, help="输出PDF文件")
+    pdf_parser.add_argument('--streaming', action='store_true', help="低内存合并")
+    pdf_parser.add_argument('--dedupe', action='store_true', help="合并重复资源")
+    pdf_parser.add_argument('--pages', help="每个文件只取这些页，如 1 或 1-3,5 或 2-")
+    pdf_parser.add_argument('--profile', choices=PDF_PROFILES, default='fast',
+                            help="输出配置：fast 快速写出，small 压缩体积，print 另将图片降采样到打印分辨率")
+    pdf_parser.set_defaults(func=run_pdf_merge)
+
+    excel_parser = subparsers.add_parser('excel-merge', help="合并Excel(表头取第一个文件前8行，数据取第9行后)")
+    add_inputs(excel_parser)
+    excel_parser.add_argument('-o', '--output', required=True, help="输出xlsx文件")
+    excel_parser.add_argument('--streaming', action='store_true', help="流式合并")
+    excel_parser.add_argument('--parallel', action='store_true', help="多核并行解析")
+    excel_parser.add_argument('--incremental', action='store_true', help="增量合并")
+    excel_parser.add_argument('--columnar', action='store_true', help="列式合并(批量过滤空行，.xls日期转为日期)")
+    excel_parser.add_argument('--workers', type=int, default=None, help="并行进程数，默认CPU核数")
+    excel_parser.add_argument('--dedupe', choices=('drop', 'flag'), help="检查重复行：drop 删除，flag 在行尾标注(按流式合并)")
+    excel_parser.add_argument('--key-columns', help="判断重复时比较的列，如 A,C,F；默认比较整行")
+    excel_parser.set_defaults(func=run_excel_merge)
+
+    split_parser = subparsers.add_parser('split', help="把A4页面拆分为N份")
+    add_inputs(split_parser)
+    split_parser.add_argument('-n', '--parts', type=int, default=2, help="每页拆分的份数，默认2")
+    split_parser.add_argument('--workers', type=int, default=None, help="并行进程数，默认CPU核数，1为顺序处理")
+    split_parser.add_argument('--profile', choices=PDF_PROFILES, default='fast',
+                              help="输出配置：fast 快速写出，small 压缩体积，print 另将图片降采样到打印分辨率")
+    split_parser.set_defaults(func=run_split)
+
+    watch_parser = subparsers.add_parser('watch', help="监视文件夹，新文件写完后自动合并或拆分")
+    watch_parser.add_argument('input_dir', help="监视的输入目录")
+    watch_parser.add_argument('--mode', choices=('pdf-merge', 'excel-merge', 'split'), required=True, help="处理方式")
+    watch_parser.add_argument('-n', '--parts', type=int, default=2, help="拆分模式下每页拆分的份数，默认2")
+    watch_parser.add_argument('--output-dir', help="输出目录，默认为输入目录下的\"输出\"")
+    watch_parser.add_argument('--processed-dir', help="处理成功的源文件移到此目录，默认为输入目录下的\"已处理\"")
+    watch_parser.add_argument('--failed-dir', help="处理失败的源文件移到此目录，默认为输入目录下的\"失败\"")
+    watch_parser.add_argument('--batch-size', type=int, default=50, help="合并模式下每个输出文件最多包含的文件数")
+    watch_parser.add_argument('--settle', type=float, default=2.0, help="文件大小多少秒不变才算写完，默认2")
+    watch_parser.add_argument('--interval', type=float, default=1.0, help="扫描间隔秒数，默认1")
+    watch_parser.add_argument('--workers', type=int, default=None, help="并行进程数，默认CPU核数")
+    watch_parser.add_argument('--give-up', type=float, default=60.0,
+                              help="写完后仍一直无法读取的文件等待多少秒后放弃，默认60")
+    watch_parser.add_argument('--once', action='store_true', help="处理完目录中现有文件后退出")
+    watch_parser.set_defaults(func=run_watch)
+
+    queue_parser = subparsers.add_parser('queue', help="查看或执行持久任务队列(与界面共用)")
+    queue_parser.add_argument('action', choices=('run', 'list'), help="run 执行队列中的任务，list 列出任务")
+    queue_parser.add_argument('--workers', type=int, default=None,
+                              help="同时运行的任务数，默认 FINANCETOOL_QUEUE_WORKERS 或CPU核数")
+    queue_parser.add_argument('--once', action='store_true', help="队列中的任务执行完后退出")
+    queue_parser.add_argument('--limit', type=int, default=200, help="list 最多列出的任务数")
+    queue_parser.set_defaults(func=run_queue)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command in ('split', 'watch') and args.parts < 2:
+        print(json.dumps({'command': args.command, 'ok': False, 'error': "拆分份数至少为2"}, ensure_ascii=False))
+        return 2
+
+    start = time.perf_counter()
+    # 与界面任务一样把各阶段耗时写入日志
+    trace = start_trace(args.command)
+    try:
+        result = args.func(args)
+    except Exception as e:
+        result = {'ok': False, 'error': str(e)}
+    else:
+        result = dict(ok=True, **result)
+    finish_trace(trace, 'ok' if result['ok'] else 'failed')
+    result = dict(command=args.command, seconds=round(time.perf_counter() - start, 3), **result)
+    if result['ok'] and getattr(args, 'profile', 'fast') != 'fast':
+        from pdf_stream_writer import profile_warning
+        warning = profile_warning(args.profile)
+        if warning:
+            result['warning'] = warning
+    print(json.dumps(result, ensure_ascii=False, default=str))
+    return 0 if result['ok'] and not result.get('failed') else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
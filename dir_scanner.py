@@ -0,0 +1,45 @@
+# dir_scanner.py
+
+import os
+import time
+
+
+def iter_files(root, extensions, recursive=True):
+    """用 os.scandir 遍历目录，按名称顺序逐个产出扩展名匹配的文件；
+    scandir 直接给出文件类型，网络共享目录上也不需要逐个 stat"""
+    extensions = tuple(ext.lower() for ext in extensions)
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name.lower())
+        except OSError:
+            # 无权限或已被删除的目录直接跳过
+            continue
+        sub_directories = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_directories.append(entry.path)
+                elif entry.name.lower().endswith(extensions):
+                    yield entry.path
+            except OSError:
+                continue
+        if recursive:
+            # 倒序入栈，保证按名称顺序深度优先遍历
+            stack.extend(reversed(sub_directories))
+
+
+def iter_file_batches(root, extensions, recursive=True, batch_size=200, interval=0.2):
+    """把 iter_files 的结果按批产出，文件数达到 batch_size 或距上一批超过 interval 秒就产出一批"""
+    batch = []
+    last = time.monotonic()
+    for file_path in iter_files(root, extensions, recursive):
+        batch.append(file_path)
+        if len(batch) >= batch_size or time.monotonic() - last >= interval:
+            yield batch
+            batch = []
+            last = time.monotonic()
+    if batch:
+        yield batch
@@ -0,0 +1,292 @@
+# excel_columnar.py
+# 列式读取：每个工作表第9行之后的数据整块读入，.xls 按列读取值和类型码。
+# 装了 NumPy 时 .xls 的空行判断用 int8 类型码数组完成，数字、日期列取成 float64 数组批量换算(整数判断、日期序号)；
+# 单元格类型混杂，最终的行仍是Python对象。没有 NumPy 时逐行处理，两种方式结果相同。
+# 合并结果由 write_xlsx 一次性写出。
+
+from openpyxl import load_workbook
+from openpyxl.utils.datetime import to_excel
+from xml.sax.saxutils import escape
+import datetime
+import decimal
+import math
+import os
+import re
+import xlrd
+import zipfile
+
+# 尝试导入numpy，如果失败则使用纯Python实现
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+HEADER_ROWS = 8
+# 整数值的浮点数转成 int 的上限，超过后浮点数无法精确表示整数
+MAX_EXACT_INTEGER = 2 ** 53
+# 1900 日期系统里 61 之前的序号受 Excel 闰年错误影响，超出范围的序号 xlrd 会报错，都交给 xlrd 逐个换算
+FIRST_PLAIN_DATE = 61
+LAST_PLAIN_DATE = 2958465
+DATE_EPOCHS = {0: '1899-12-30', 1: '1904-01-01'}
+
+
+def read_data_block(file, with_header=False):
+    """返回 (第一个工作表名称, 前8行, 所有工作表第9行之后的非空行)；
+    .xls 中的日期转为 datetime，整数值的数字转为 int，错误值转为错误文本"""
+    _, ext = os.path.splitext(file)
+    ext = ext.lower()
+    if ext == '.xlsx':
+        return _read_xlsx(file, with_header)
+    if ext == '.xls':
+        return _read_xls(file, with_header)
+    return "Sheet1", [], []
+
+
+def _read_xlsx(file, with_header):
+    wb = load_workbook(file, read_only=True)
+    try:
+        sheet_name = wb.sheetnames[0]
+        header_rows = []
+        if with_header:
+            header_rows = list(wb[sheet_name].iter_rows(min_row=1, max_row=HEADER_ROWS, values_only=True))
+        rows = []
+        for ws in wb.worksheets:
+            rows.extend(row for row in ws.iter_rows(min_row=HEADER_ROWS + 1, values_only=True)
+                        if any(cell is not None and cell != '' for cell in row))
+        return sheet_name, header_rows, rows
+    finally:
+        wb.close()
+
+
+def _read_xls(file, with_header):
+    wb = xlrd.open_workbook(file, on_demand=True)
+    try:
+        sheet_names = wb.sheet_names()
+        header_rows = []
+        if with_header:
+            # 表头与数据行按同样规则转换(日期、整数等)
+            ws = wb.sheet_by_name(sheet_names[0])
+            header_rows = [[convert_xls_cell(value, cell_type, wb.datemode)
+                            for value, cell_type in zip(ws.row_values(row_idx), ws.row_types(row_idx))]
+                           for row_idx in range(min(HEADER_ROWS, ws.nrows))]
+        rows = []
+        for sheet_name in sheet_names:
+            ws = wb.sheet_by_name(sheet_name)
+            if ws.nrows > HEADER_ROWS and ws.ncols:
+                # 按列读取值和类型，一次取整列比逐行取值快
+                values = [ws.col_values(col, HEADER_ROWS) for col in range(ws.ncols)]
+                types = [ws.col_types(col, HEADER_ROWS) for col in range(ws.ncols)]
+                convert = _convert_columns_numpy if NUMPY_AVAILABLE else _convert_columns
+                rows.extend(convert(values, types, wb.datemode))
+            wb.unload_sheet(sheet_name)
+        return sheet_names[0], header_rows, rows
+    finally:
+        wb.release_resources()
+
+
+def convert_xls_cell(value, cell_type, datemode):
+    """xlrd 单元格值按类型转换：日期转为 datetime，整数值的数字转为 int，布尔值转为 bool，错误值转为错误文本"""
+    if cell_type == xlrd.XL_CELL_NUMBER:
+        return int(value) if value.is_integer() and abs(value) < MAX_EXACT_INTEGER else value
+    if cell_type == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate.xldate_as_datetime(value, datemode)
+        except xlrd.xldate.XLDateError:
+            return value
+    if cell_type == xlrd.XL_CELL_BOOLEAN:
+        return bool(value)
+    if cell_type == xlrd.XL_CELL_ERROR:
+        return xlrd.error_text_from_code.get(value, value)
+    if cell_type in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return ''
+    return value
+
+
+def _convert_columns(values, types, datemode):
+    rows = []
+    for row_values, row_types in zip(zip(*values), zip(*types)):
+        if all(cell_type in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK) or value == ''
+               for value, cell_type in zip(row_values, row_types)):
+            continue
+        rows.append([convert_xls_cell(value, cell_type, datemode) for value, cell_type in zip(row_values, row_types)])
+    return rows
+
+
+def _convert_columns_numpy(values, types, datemode):
+    kinds = np.array(types, dtype=np.int8).T
+    empty = (kinds == xlrd.XL_CELL_EMPTY) | (kinds == xlrd.XL_CELL_BLANK)
+    # 只有文本单元格可能是空字符串，逐个看这些
+    text = np.nonzero(kinds == xlrd.XL_CELL_TEXT)
+    for row, col in zip(*text):
+        if values[col][row] == '':
+            empty[row, col] = True
+    keep = np.flatnonzero(~empty.all(axis=1))
+    kinds = kinds[keep]
+    block = np.empty((len(keep), len(values)), dtype=object)
+    for col, column_values in enumerate(values):
+        block[:, col] = [column_values[row] for row in keep]
+
+    # 数字：整数值转为 int
+    numbers = kinds == xlrd.XL_CELL_NUMBER
+    if numbers.any():
+        number_values = block[numbers].astype(float)
+        integral = (number_values == np.floor(number_values)) & (np.abs(number_values) < MAX_EXACT_INTEGER)
+        converted = number_values.astype(object)
+        converted[integral] = number_values[integral].astype(np.int64).astype(object)
+        block[numbers] = converted
+
+    # 日期：序号换算为 datetime，精确到毫秒
+    dates = kinds == xlrd.XL_CELL_DATE
+    if dates.any():
+        date_values = block[dates].astype(float)
+        first = FIRST_PLAIN_DATE if datemode == 0 else 0
+        plain = (date_values >= first) & (date_values <= LAST_PLAIN_DATE)
+        converted = date_values.astype(object)
+        # 与 xlrd 一样整数天和小数部分分开换算，舍入结果一致
+        days = np.floor(date_values[plain])
+        milliseconds = (days.astype(np.int64) * 86400000
+                        + np.round((date_values[plain] - days) * 86400000).astype(np.int64))
+        converted[plain] = (np.datetime64(DATE_EPOCHS[datemode], 'ms')
+                            + milliseconds.astype('timedelta64[ms]')).astype(object)
+        for index in np.flatnonzero(~plain):
+            converted[index] = convert_xls_cell(date_values[index], xlrd.XL_CELL_DATE, datemode)
+        block[dates] = converted
+
+    # 布尔值、错误值数量很少，逐个转换
+    for row, col in zip(*np.nonzero((kinds == xlrd.XL_CELL_BOOLEAN) | (kinds == xlrd.XL_CELL_ERROR))):
+        block[row, col] = convert_xls_cell(block[row, col], kinds[row, col], datemode)
+    return block.tolist()
+
+
+# 批量写出 .xlsx：直接生成工作表XML，不为每个单元格创建对象；
+# 字符串写为内联字符串，以"="开头的字符串按 openpyxl 的规则写为公式，日期按 openpyxl 的换算写为序号加日期格式(含1900年2月之前的闰年修正)
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+# 样式 1/2/3 分别是日期时间、日期、时间格式
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd h:mm:ss"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="21" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+# XML 1.0 不允许的控制字符
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _escape(text):
+    return escape(_ILLEGAL_XML_CHARS.sub('', text))
+
+
+def _cell_xml(ref, value):
+    """返回单元格XML，None和空字符串不写"""
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, float):
+        if math.isfinite(value):
+            return f'<c r="{ref}"><v>{value!r}</v></c>'
+        value = str(value)
+    elif isinstance(value, datetime.datetime):
+        return f'<c r="{ref}" s="1"><v>{to_excel(value.replace(tzinfo=None))!r}</v></c>'
+    elif isinstance(value, datetime.date):
+        return f'<c r="{ref}" s="2"><v>{to_excel(value)!r}</v></c>'
+    elif isinstance(value, datetime.time):
+        return f'<c r="{ref}" s="3"><v>{to_excel(value)!r}</v></c>'
+    elif isinstance(value, decimal.Decimal):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    elif not isinstance(value, str):
+        value = str(value)
+    elif len(value) > 1 and value.startswith('='):
+        return f'<c r="{ref}"><f>{_escape(value[1:])}</f></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{_escape(value)}</t></is></c>'
+
+
+def write_xlsx(output_path, sheet_name, rows, on_row=None):
+    """把所有行一次写入单个工作表的 .xlsx 文件，返回写出的行数"""
+    columns = []
+    row_count = 0
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(name=escape(sheet_name, {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', _STYLES)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        b'<sheetData>')
+            chunk = []
+            for row in rows:
+                row_count += 1
+                if len(row) > len(columns):
+                    columns.extend(_column_letter(index) for index in range(len(columns), len(row)))
+                cells = ''.join(_cell_xml(f'{columns[index]}{row_count}', value) for index, value in enumerate(row))
+                chunk.append(f'<row r="{row_count}">{cells}</row>')
+                if len(chunk) >= 1000:
+                    sheet.write(''.join(chunk).encode('utf-8'))
+                    chunk = []
+                    if on_row:
+                        on_row(row_count)
+            sheet.write(''.join(chunk).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+    return row_count
@@ -0,0 +1,598 @@
+# excel_manager.py
+
+from openpyxl import load_workbook, Workbook
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import chain, islice
+from file_hash_cache import file_sha256
+from excel_columnar import convert_xls_cell, read_data_block, write_xlsx
+from instrumentation import stage, count_read, count_written
+from row_index import REPORT_SUFFIX
+from output_file import replace_on_success, temp_output_path
+import json
+import os
+import xlrd  # 用于读取 .xls 文件
+
+# 每处理这么多行报告一次进度
+PROGRESS_ROWS = 500
+
+# 增量合并清单与输出文件放在一起，文件名为 输出文件名 + 后缀
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+
+
+class ExcelManager:
+    def __init__(self):
+        # 最近一次合并写入的数据行数(不含表头)
+        self.rows_merged = 0
+        # 最近一次增量合并的文件统计
+        self.incremental_stats = {}
+        # 最近一次合并找到的重复行数和重复行清单文件
+        self.duplicate_rows = 0
+        self.duplicate_report = None
+
+    def merge_files(self, excel_files, output_path, streaming=False, on_file=None, on_page=None, row_index=None):
+        """合并所有文件第9行之后的数据，表头取第一个文件的前8行；
+        指定 row_index (见 row_index.RowIndex) 时按流式合并并检查重复行"""
+        if streaming or row_index is not None:
+            return self.merge_files_streaming(excel_files, output_path, on_file, on_page, row_index)
+        self.rows_merged = 0
+        merged_wb = Workbook()
+        default_sheet = merged_wb.active
+        default_sheet.title = "MergedData"
+
+        # 获取第一个文件的第一个工作表名称作为目标工作表名称
+        if excel_files:
+            first_file = excel_files[0]
+            _, ext_first = os.path.splitext(first_file)
+            if ext_first.lower() == '.xlsx':
+                wb_first = load_workbook(first_file)
+                first_sheet_name = wb_first.sheetnames[0]
+                ws_first = wb_first[first_sheet_name]
+                header_rows = list(ws_first.iter_rows(min_row=1, max_row=8, values_only=True))
+            elif ext_first.lower() == '.xls':
+                wb_first = xlrd.open_workbook(first_file)
+                first_sheet_name = wb_first.sheet_names()[0]
+                ws_first = wb_first.sheet_by_name(first_sheet_name)
+                header_rows = [ws_first.row_values(row_idx, 0, ws_first.ncols) for row_idx in range(0, 8)]
+            else:
+                first_sheet_name = "Sheet1"
+                header_rows = []
+
+        merged_sheet = merged_wb.create_sheet(title=first_sheet_name)
+        merged_wb.remove(merged_wb["MergedData"])  # 删除默认创建的工作表
+
+        # 插入第一个文件的前8行
+        for row in header_rows:
+            merged_sheet.append(row)
+
+        for index, file in enumerate(excel_files):
+            if on_file:
+                on_file(index, len(excel_files), file)
+            _, ext = os.path.splitext(file)
+            count_read(file)
+            if ext.lower() == '.xlsx':
+                with stage('open', file):
+                    wb = load_workbook(file)
+                for sheet_name in wb.sheetnames:
+                    ws = wb[sheet_name]
+
+                    # 从第9行开始读取，直到最后一个非空行
+                    for row_idx, row in enumerate(ws.iter_rows(min_row=9, values_only=True), 9):
+                        if on_page and row_idx % PROGRESS_ROWS == 0:
+                            on_page(row_idx, ws.max_row)
+                        if any(cell is not None and cell != '' for cell in row):
+                            merged_sheet.append(row)
+                            self.rows_merged += 1
+            elif ext.lower() == '.xls':
+                with stage('open', file):
+                    wb = xlrd.open_workbook(file)
+                for sheet_name in wb.sheet_names():
+                    ws = wb.sheet_by_name(sheet_name)
+
+                    # 从第9行开始读取，直到最后一个非空行
+                    for row_idx in range(8, ws.nrows):
+                        if on_page and row_idx % PROGRESS_ROWS == 0:
+                            on_page(row_idx, ws.nrows)
+                        row = ws.row_values(row_idx)
+                        if any(cell != "" for cell in row):
+                            merged_sheet.append(row)
+                            self.rows_merged += 1
+
+        # 先写临时文件，写完才替换，失败或取消时原有的输出文件不受影响
+        with stage('save'), replace_on_success(output_path) as temp_path:
+            merged_wb.save(temp_path)
+        count_written(output_path)
+        return output_path
+
+    def merge_files_streaming(self, excel_files, output_path, on_file=None, on_page=None, row_index=None):
+        """流式合并：只读模式逐行读取，只写模式逐行写出，每个文件只打开一次；
+        指定 row_index 时每行先经过它判断，重复行被丢弃或标注，清单写在输出文件旁边"""
+        self.rows_merged = 0
+        self.duplicate_rows = 0
+        self.duplicate_report = None
+        merged_wb = Workbook(write_only=True)
+        merged_sheet = None
+
+        for index, file in enumerate(excel_files):
+            if on_file:
+                on_file(index, len(excel_files), file)
+            with stage('open', file):
+                wb, ext = open_source(file)
+            count_read(file)
+            try:
+                if merged_sheet is None:
+                    # 第一个文件：目标工作表名称和前8行表头都从这里取
+                    sheet_name, header_rows = read_header(wb, ext)
+                    merged_sheet = merged_wb.create_sheet(title=sheet_name)
+                    for row in header_rows:
+                        merged_sheet.append(row)
+                    if row_index is not None:
+                        row_index.set_header(header_rows)
+                # 只读模式边读边解析，解析时间计入 append
+                with stage('append', file):
+                    if row_index is None:
+                        for row in iter_data_rows(wb, ext, on_page):
+                            merged_sheet.append(row)
+                            self.rows_merged += 1
+                    else:
+                        for source_sheet, row_number, row, key_row in iter_keyed_rows(wb, ext, on_page):
+                            row = row_index.check(row, file, source_sheet, row_number, key_row)
+                            if row is not None:
+                                merged_sheet.append(row)
+                                self.rows_merged += 1
+            finally:
+                close_source(wb, ext)
+
+        if merged_sheet is None:
+            merged_wb.create_sheet(title="Sheet1")
+        with stage('save'), replace_on_success(output_path) as temp_path:
+            merged_wb.save(temp_path)
+        count_written(output_path)
+        if row_index is not None and row_index.duplicates:
+            self.duplicate_rows = len(row_index.duplicates)
+            self.duplicate_report = row_index.write_report(output_path + REPORT_SUFFIX)
+        elif os.path.exists(output_path + REPORT_SUFFIX):
+            # 上次合并留下的清单已不对应当前输出
+            os.remove(output_path + REPORT_SUFFIX)
+        return output_path
+
+    def merge_files_parallel(self, excel_files, output_path, workers=None, on_file=None, on_page=None):
+        """多进程解析各文件，按列表顺序交给同一个写入器，结果与顺序合并一致"""
+        self.rows_merged = 0
+        merged_wb = Workbook(write_only=True)
+        merged_sheet = None
+
+        tasks = [(file, index == 0) for index, file in enumerate(excel_files)]
+        for index, (sheet_name, header_rows, rows) in enumerate(ordered_map(_parse_for_merge, tasks, workers)):
+            if on_file:
+                on_file(index, len(excel_files), excel_files[index])
+            if on_page:
+                on_page(index, len(excel_files))
+            if merged_sheet is None:
+                merged_sheet = merged_wb.create_sheet(title=sheet_name)
+                for row in header_rows:
+                    merged_sheet.append(row)
+            with stage('append', excel_files[index]):
+                for row in rows:
+                    merged_sheet.append(row)
+            count_read(excel_files[index])
+            self.rows_merged += len(rows)
+
+        if merged_sheet is None:
+            merged_wb.create_sheet(title="Sheet1")
+        with stage('save'), replace_on_success(output_path) as temp_path:
+            merged_wb.save(temp_path)
+        count_written(output_path)
+        return output_path
+
+    def merge_files_columnar(self, excel_files, output_path, workers=None, on_file=None, on_page=None):
+        """列式合并：每个文件的数据整块读入并批量过滤空行(见 excel_columnar)，
+        全部读完后由 write_xlsx 一次写出；workers 不为1且文件多于一个时在进程池中读取"""
+        self.rows_merged = 0
+        if workers != 1 and len(excel_files) > 1:
+            tasks = [(file, index == 0) for index, file in enumerate(excel_files)]
+            blocks = ordered_map(read_data_block, tasks, workers)
+        else:
+            blocks = (read_data_block(file, index == 0) for index, file in enumerate(excel_files))
+
+        sheet_name, header_rows = "Sheet1", []
+        data_blocks = []
+        for index, (block_sheet_name, block_header_rows, rows) in enumerate(blocks):
+            if on_file:
+                on_file(index, len(excel_files), excel_files[index])
+            if on_page:
+                on_page(index, len(excel_files))
+            count_read(excel_files[index])
+            if index == 0:
+                sheet_name, header_rows = block_sheet_name, block_header_rows
+            data_blocks.append(rows)
+            self.rows_merged += len(rows)
+
+        # 直接生成工作表XML，不经过 openpyxl 逐个单元格写出
+        with stage('save'), replace_on_success(output_path) as temp_path:
+            write_xlsx(temp_path, sheet_name, chain(header_rows, *data_blocks))
+        count_written(output_path)
+        return output_path
+
+    def merge_files_incremental(self, excel_files, output_path, on_file=None, on_page=None):
+        """增量合并：旁边的清单文件记录每个源文件在输出中的行范围，
+        只解析新增或内容有变化的文件，未变化的行块直接从上次的输出中复制"""
+        self.rows_merged = 0
+        manifest_path = output_path + MANIFEST_SUFFIX
+        manifest = load_manifest(manifest_path, output_path)
+        old_entries = manifest['files'] if manifest else []
+        current = {file: os.stat(file) for file in excel_files}
+
+        # 按本次列表顺序逐个判断：未变化的复制旧行块，新增或内容变化的重新解析
+        old_by_path = {entry['path']: entry for entry in old_entries}
+        plan = []
+        stats = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        for file in excel_files:
+            entry = old_by_path.get(file)
+            if entry is None:
+                stats['added'] += 1
+                plan.append(('parse', file, None))
+                continue
+            stat = current[file]
+            if (stat.st_size, stat.st_mtime) != (entry['size'], entry['mtime']):
+                if file_sha256(file) != entry['sha256']:
+                    stats['changed'] += 1
+                    plan.append(('parse', file, entry))
+                    continue
+                # 只是修改时间变了，内容相同
+                entry = dict(entry, size=stat.st_size, mtime=stat.st_mtime)
+            stats['unchanged'] += 1
+            plan.append(('copy', file, entry))
+        stats['removed'] = sum(1 for entry in old_entries if entry['path'] not in current)
+        # 保留下来的文件相对顺序变了，也要重写
+        stats['reordered'] = [file for file in excel_files if file in old_by_path] != \
+            [entry['path'] for entry in old_entries if entry['path'] in current]
+        self.incremental_stats = stats
+
+        if manifest and not (stats['added'] or stats['changed'] or stats['removed'] or stats['reordered']):
+            return output_path
+
+        merged_wb = Workbook(write_only=True)
+        old_wb = load_workbook(output_path, read_only=True) if manifest else None
+        try:
+            old_rows = enumerate(old_wb.worksheets[0].iter_rows(values_only=True), 1) if old_wb else iter(())
+            # 表头取自列表中的第一个文件；仍是上次的第一个文件且未变化时直接复制旧表头
+            header_unchanged = bool(plan) and plan[0][0] == 'copy' and plan[0][1] == old_entries[0]['path']
+
+            if manifest and header_unchanged:
+                merged_sheet = merged_wb.create_sheet(title=manifest['sheet_name'])
+                for _, row in islice(old_rows, manifest['header_rows']):
+                    merged_sheet.append(row)
+                header_rows = manifest['header_rows']
+            elif plan and plan[0][0] == 'copy':
+                # 第一个文件未变化但原来不在第一位：只读它的表头
+                with stage('open', plan[0][1]):
+                    wb, source_ext = open_source(plan[0][1])
+                try:
+                    sheet_name, header = read_header(wb, source_ext)
+                finally:
+                    close_source(wb, source_ext)
+                merged_sheet = merged_wb.create_sheet(title=sheet_name)
+                for row in header:
+                    merged_sheet.append(row)
+                header_rows = len(header)
+            else:
+                merged_sheet = None
+
+            # 复制的行块在旧输出中按原顺序排列时顺着迭代器取，否则先一次读出所有要复制的行块
+            copy_entries = [entry for action, _, entry in plan if action == 'copy']
+            first_rows = [entry['first_row'] for entry in copy_entries]
+            old_blocks = None if first_rows == sorted(first_rows) else read_old_blocks(old_rows, copy_entries)
+
+            row_count = 0
+            new_entries = []
+            parse_index = 0
+            parse_total = sum(1 for action, _, _ in plan if action == 'parse')
+            for action, file, entry in plan:
+                if action == 'copy':
+                    with stage('copy', file):
+                        if old_blocks is not None:
+                            block = old_blocks.pop(file)
+                        else:
+                            block = next_old_block(old_rows, entry)
+                        first_row = header_rows + row_count + 1
+                        for row in block:
+                            merged_sheet.append(row)
+                    row_count += len(block)
+                    new_entries.append(dict(entry, first_row=first_row, last_row=first_row + len(block) - 1))
+                    continue
+
+                if on_file:
+                    on_file(parse_index, parse_total, file)
+                parse_index += 1
+                with stage('open', file):
+                    wb, source_ext = open_source(file)
+                count_read(file)
+                try:
+                    if merged_sheet is None:
+                        sheet_name, header = read_header(wb, source_ext)
+                        merged_sheet = merged_wb.create_sheet(title=sheet_name)
+                        for row in header:
+                            merged_sheet.append(row)
+                        header_rows = len(header)
+                    first_row = header_rows + row_count + 1
+                    with stage('append', file):
+                        for row in iter_data_rows(wb, source_ext, on_page):
+                            merged_sheet.append(row)
+                            row_count += 1
+                            self.rows_merged += 1
+                finally:
+                    close_source(wb, source_ext)
+                stat = current[file]
+                new_entries.append({
+                    'path': file,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'sha256': file_sha256(file),
+                    'first_row': first_row,
+                    'last_row': header_rows + row_count,
+                })
+        finally:
+            if old_wb:
+                old_wb.close()
+
+        if merged_sheet is None:
+            merged_sheet = merged_wb.create_sheet(title="Sheet1")
+            header_rows = 0
+        with stage('save'), replace_on_success(output_path) as temp_path:
+            merged_wb.save(temp_path)
+        count_written(output_path)
+        save_manifest(manifest_path, output_path, merged_sheet.title, header_rows, new_entries)
+        return output_path
+
+    def merge_sheets(self, excel_files, output_path, on_file=None, on_page=None):
+        """把每个文件的每个工作表原样复制为合并文件中的一个工作表(打印用)"""
+        merged_wb = Workbook()
+        default_sheet = merged_wb.active
+        merged_wb.remove(default_sheet)
+
+        for index, file in enumerate(excel_files):
+            if on_file:
+                on_file(index, len(excel_files), file)
+            count_read(file)
+            with stage('append', file):
+                for title, rows, total_rows in iter_sheets(file):
+                    new_ws = merged_wb.create_sheet(title)
+                    for row_idx, row in enumerate(rows, 1):
+                        if on_page and row_idx % PROGRESS_ROWS == 0:
+                            on_page(row_idx, total_rows)
+                        new_ws.append(row)
+
+        with stage('save'), replace_on_success(output_path) as temp_path:
+            merged_wb.save(temp_path)
+        count_written(output_path)
+        return output_path
+
+    def merge_sheets_parallel(self, excel_files, output_path, workers=None, on_file=None, on_page=None):
+        """多进程解析各文件的工作表，按列表顺序写入合并文件(打印用)"""
+        merged_wb = Workbook()
+        default_sheet = merged_wb.active
+        merged_wb.remove(default_sheet)
+
+        tasks = [(file,) for file in excel_files]
+        for index, sheets in enumerate(ordered_map(_parse_sheets, tasks, workers)):
+            if on_file:
+                on_file(index, len(excel_files), excel_files[index])
+            if on_page:
+                on_page(index, len(excel_files))
+            count_read(excel_files[index])
+            with stage('append', excel_files[index]):
+                for title, rows in sheets:
+                    new_ws = merged_wb.create_sheet(title)
+                    for row in rows:
+                        new_ws.append(row)
+
+        with stage('save'), replace_on_success(output_path) as temp_path:
+            merged_wb.save(temp_path)
+        count_written(output_path)
+        return output_path
+
+
+def next_old_block(old_rows, entry):
+    """旧输出按清单顺序排列时，顺着迭代器跳到该文件的行块"""
+    block = []
+    if entry['last_row'] < entry['first_row']:
+        return block
+    for row_idx, row in old_rows:
+        if row_idx >= entry['first_row']:
+            block.append(row)
+        if row_idx >= entry['last_row']:
+            break
+    return block
+
+
+def read_old_blocks(old_rows, entries):
+    """列表顺序调整后，一次遍历旧输出，按文件取出要复制的行块"""
+    owners = {}
+    blocks = {}
+    for entry in entries:
+        blocks[entry['path']] = []
+        for row_idx in range(entry['first_row'], entry['last_row'] + 1):
+            owners[row_idx] = entry['path']
+    last_row = max(owners, default=0)
+    for row_idx, row in old_rows:
+        if row_idx in owners:
+            blocks[owners[row_idx]].append(row)
+        if row_idx >= last_row:
+            break
+    return blocks
+
+
+def load_manifest(manifest_path, output_path):
+    """读取增量合并清单；输出文件不存在或在合并之外被改动过时返回None，需要全量重建"""
+    if not os.path.exists(manifest_path) or not os.path.exists(output_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(output_path)
+    if manifest.get('version') != MANIFEST_VERSION or \
+            (stat.st_size, stat.st_mtime) != (manifest['output_size'], manifest['output_mtime']):
+        return None
+    return manifest
+
+
+def save_manifest(manifest_path, output_path, sheet_name, header_rows, entries):
+    stat = os.stat(output_path)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'output_size': stat.st_size,
+        'output_mtime': stat.st_mtime,
+        'sheet_name': sheet_name,
+        'header_rows': header_rows,
+        'files': entries,
+    }
+    temp_path = temp_output_path(manifest_path)
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, manifest_path)
+
+
+def excel_row_count(file):
+    """所有工作表的总行数"""
+    wb, ext = open_source(file)
+    try:
+        if ext == '.xlsx':
+            return sum(ws.max_row or 0 for ws in wb.worksheets)
+        if ext == '.xls':
+            return sum(wb.sheet_by_index(i).nrows for i in range(wb.nsheets))
+        return 0
+    finally:
+        close_source(wb, ext)
+
+
+def open_source(file):
+    """以只读方式打开源文件，返回 (工作簿, 扩展名)，不支持的格式工作簿为None"""
+    _, ext = os.path.splitext(file)
+    ext = ext.lower()
+    if ext == '.xlsx':
+        return load_workbook(file, read_only=True), ext
+    if ext == '.xls':
+        # xlrd 按文件名打开时自己做内存映射；on_demand 模式下工作表用到时才解析，用完立即释放
+        return xlrd.open_workbook(file, on_demand=True), ext
+    return None, ext
+
+
+def close_source(wb, ext):
+    if ext == '.xlsx':
+        # 只读模式会一直占用文件句柄，需要显式关闭
+        wb.close()
+    elif ext == '.xls':
+        wb.release_resources()
+
+
+def read_header(wb, ext):
+    """返回第一个工作表的名称和前8行"""
+    if ext == '.xlsx':
+        ws = wb[wb.sheetnames[0]]
+        return wb.sheetnames[0], list(ws.iter_rows(min_row=1, max_row=8, values_only=True))
+    if ext == '.xls':
+        first_sheet_name = wb.sheet_names()[0]
+        ws = wb.sheet_by_name(first_sheet_name)
+        return first_sheet_name, [ws.row_values(row_idx, 0, ws.ncols) for row_idx in range(0, 8)]
+    return "Sheet1", []
+
+
+def iter_data_rows(wb, ext, on_page=None):
+    """逐行产出所有工作表第9行之后的非空行"""
+    for _, _, row in iter_numbered_rows(wb, ext, on_page):
+        yield row
+
+
+def iter_numbered_rows(wb, ext, on_page=None):
+    """逐行产出 (工作表名称, 行号(从1开始), 行)，只包含第9行之后的非空行"""
+    if ext == '.xlsx':
+        for sheet_name in wb.sheetnames:
+            ws = wb[sheet_name]
+            for row_idx, row in enumerate(ws.iter_rows(min_row=9, values_only=True), 9):
+                if on_page and row_idx % PROGRESS_ROWS == 0:
+                    on_page(row_idx, ws.max_row or 0)
+                if any(cell is not None and cell != '' for cell in row):
+                    yield sheet_name, row_idx, row
+    elif ext == '.xls':
+        for sheet_name in wb.sheet_names():
+            ws = wb.sheet_by_name(sheet_name)
+            for row_idx in range(8, ws.nrows):
+                if on_page and row_idx % PROGRESS_ROWS == 0:
+                    on_page(row_idx, ws.nrows)
+                row = ws.row_values(row_idx)
+                if any(cell != "" for cell in row):
+                    yield sheet_name, row_idx + 1, row
+            wb.unload_sheet(sheet_name)
+
+
+def iter_keyed_rows(wb, ext, on_page=None):
+    """在 iter_numbered_rows 的基础上另产出判断重复用的行：.xls 的单元格按类型转换(见 convert_xls_cell)，
+    日期不再是序号，与 .xlsx 中同样的行得到同样的指纹；写出的行不变"""
+    if ext != '.xls':
+        for sheet_name, row_number, row in iter_numbered_rows(wb, ext, on_page):
+            yield sheet_name, row_number, row, row
+        return
+    ws = None
+    for sheet_name, row_number, row in iter_numbered_rows(wb, ext, on_page):
+        if ws is None or ws.name != sheet_name:
+            ws = wb.sheet_by_name(sheet_name)
+        key_row = [convert_xls_cell(value, cell_type, wb.datemode)
+                   for value, cell_type in zip(row, ws.row_types(row_number - 1))]
+        yield sheet_name, row_number, row, key_row
+
+
+def iter_sheets(file):
+    """逐个产出 (新工作表名称, 行迭代器, 总行数)，工作表名称为 文件名_原工作表名；
+    工作表在轮到时才解析，调用方需在取下一个工作表之前读完当前的行"""
+    base_name = os.path.splitext(os.path.basename(file))[0]
+    wb, ext = open_source(file)
+    try:
+        if ext == '.xlsx':
+            for sheet_name in wb.sheetnames:
+                ws = wb[sheet_name]
+                yield f"{base_name}_{sheet_name}", ws.iter_rows(values_only=True), ws.max_row or 0
+        elif ext == '.xls':
+            for sheet_name in wb.sheet_names():
+                ws = wb.sheet_by_name(sheet_name)
+                yield f"{base_name}_{sheet_name}", (ws.row_values(row_idx) for row_idx in range(ws.nrows)), ws.nrows
+                wb.unload_sheet(sheet_name)
+    finally:
+        close_source(wb, ext)
+
+
+def _parse_for_merge(file, with_header):
+    # 进程池只能调用模块级函数；非空行在子进程里过滤好，减少传回的数据量
+    wb, ext = open_source(file)
+    try:
+        sheet_name, header_rows = read_header(wb, ext) if with_header else (None, [])
+        return sheet_name, header_rows, list(iter_data_rows(wb, ext))
+    finally:
+        close_source(wb, ext)
+
+
+def _parse_sheets(file):
+    return [(title, list(rows)) for title, rows, _ in iter_sheets(file)]
+
+
+def ordered_map(func, tasks, workers=None):
+    """在进程池中执行 func(*task)，按tasks顺序逐个产出结果；
+    同时在途的任务数有上限，已解析但还没写出的数据不会无限堆积"""
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        task_iter = iter(tasks)
+        pending = deque(executor.submit(func, *task) for task in islice(task_iter, workers * 2))
+        while pending:
+            # 子进程内的各阶段无法记录，主进程等待结果的时间计入 wait
+            with stage('wait'):
+                result = pending.popleft().result()
+            for task in islice(task_iter, 1):
+                pending.append(executor.submit(func, *task))
+            yield result
+    finally:
+        # 取消时丢弃尚未开始的任务
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -1,47 +1,15 @@
 # excel_merge_tab.py
 
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QListWidget,
-    QFileDialog, QMessageBox, QListWidgetItem
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QAbstractItemView,
+    QFileDialog, QMessageBox, QCheckBox, QComboBox, QLineEdit
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QDragEnterEvent
-from openpyxl import load_workbook, Workbook
+from file_list import FileListWidget, count_excel_rows
+from job_worker import Job, JobPanel, enqueue
+from file_hash_cache import content_keys, duplicate_rows
 import os
-import xlrd  # 用于读取 .xls 文件
-from datetime import datetime
-import subprocess
 import time
 
-# 尝试导入pyautogui，如果失败则标记为不可用
-try:
-    import pyautogui
-    PYAUTOGUI_AVAILABLE = True
-except ImportError:
-    PYAUTOGUI_AVAILABLE = False
-    pyautogui = None
-
-
-class FileListWidget(QListWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAcceptDrops(True)
-
-    def dragEnterEvent(self, event: QDragEnterEvent):
-        if event.mimeData().hasUrls():
-            for url in event.mimeData().urls():
-                file_path = url.toLocalFile()
-                if file_path.endswith(('.xlsx', '.xls')):
-                    modification_time = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d %H:%M:%S')
-                    file_name = os.path.basename(file_path)
-                    item_text = f"{file_name} (修改日期: {modification_time})"
-                    item = QListWidgetItem(item_text)
-                    item.setData(Qt.UserRole, file_path)
-                    self.addItem(item)
-            event.acceptProposedAction()
-        else:
-            event.ignore()
-
 
 class ExcelMergeTab(QWidget):
     def __init__(self):
@@ -54,14 +22,21 @@ class ExcelMergeTab(QWidget):
         left_layout = QVBoxLayout()
         right_layout = QVBoxLayout()
 
-        self.file_list = FileListWidget()
-        self.file_list.setSelectionMode(QListWidget.MultiSelection)
+        self.file_list = FileListWidget(('.xlsx', '.xls'), count_excel_rows, "行")
+        self.file_list.setSelectionMode(QAbstractItemView.MultiSelection)
         left_layout.addWidget(self.file_list)
 
+        self.job_panel = JobPanel()
+        left_layout.addWidget(self.job_panel)
+
         self.add_button = QPushButton("添加Excel")
         self.add_button.clicked.connect(self.add_excel)
         right_layout.addWidget(self.add_button)
 
+        self.add_folder_button = QPushButton("添加文件夹")
+        self.add_folder_button.clicked.connect(self.add_folder)
+        right_layout.addWidget(self.add_folder_button)
+
         self.delete_button = QPushButton("删除选择")
         self.delete_button.clicked.connect(self.delete_excel)
         right_layout.addWidget(self.delete_button)
@@ -90,6 +65,35 @@ class ExcelMergeTab(QWidget):
         self.bottom_button.clicked.connect(self.move_to_bottom)
         right_layout.addWidget(self.bottom_button)
 
+        self.streaming_checkbox = QCheckBox("流式合并(省内存)")
+        self.streaming_checkbox.setChecked(True)
+        right_layout.addWidget(self.streaming_checkbox)
+
+        self.parallel_checkbox = QCheckBox("多核并行解析")
+        self.parallel_checkbox.setChecked(True)
+        right_layout.addWidget(self.parallel_checkbox)
+
+        self.incremental_checkbox = QCheckBox("增量合并(只处理新增/变化文件)")
+        right_layout.addWidget(self.incremental_checkbox)
+
+        self.columnar_checkbox = QCheckBox("列式合并(大表更快，.xls日期按日期写出)")
+        right_layout.addWidget(self.columnar_checkbox)
+
+        # 重复行检查按流式合并进行，与增量/并行/列式合并互斥
+        self.dedupe_combo = QComboBox()
+        self.dedupe_combo.addItem("不检查重复行", None)
+        self.dedupe_combo.addItem("删除重复行", 'drop')
+        self.dedupe_combo.addItem("标注重复行", 'flag')
+        right_layout.addWidget(self.dedupe_combo)
+
+        self.key_columns_edit = QLineEdit()
+        self.key_columns_edit.setPlaceholderText("比较的列，如 A,C,F (留空比较整行)")
+        right_layout.addWidget(self.key_columns_edit)
+
+        # 勾选后合并任务写入持久队列，由调度器按优先级执行，关闭程序后下次启动继续
+        self.queue_checkbox = QCheckBox("加入任务队列")
+        right_layout.addWidget(self.queue_checkbox)
+
         self.merge_button = QPushButton("合并(9行后)")
         self.merge_button.clicked.connect(self.merge_files)
         right_layout.addWidget(self.merge_button)
@@ -104,72 +108,59 @@ class ExcelMergeTab(QWidget):
     def add_excel(self):
         files, _ = QFileDialog.getOpenFileNames(self, "选择Excel文件", "", "Excel Files (*.xlsx *.xls)")
         if files:
-            for file in files:
-                modification_time = datetime.fromtimestamp(os.path.getmtime(file)).strftime('%Y-%m-%d %H:%M:%S')
-                file_name = os.path.basename(file)
-                item_text = f"{file_name} (修改日期: {modification_time})"
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, file)
-                self.file_list.addItem(item)
+            self.file_list.add_files(files)
+
+    def add_folder(self):
+        """递归添加文件夹内的文件，在后台扫描，找到的文件陆续加入列表"""
+        directory = QFileDialog.getExistingDirectory(self, "选择Excel文件夹")
+        if directory:
+            self.file_list.add_directory(directory)
 
     def delete_excel(self):
-        for item in self.file_list.selectedItems():
-            self.file_list.takeItem(self.file_list.row(item))
+        self.file_list.delete_selected()
 
     def clear_list(self):
         self.file_list.clear()
 
     def remove_duplicates(self):
-        excel_files = [self.file_list.item(i).data(Qt.UserRole) for i in range(self.file_list.count())]
-        unique_files = []
-        seen_files = set()
-        for file in reversed(excel_files):
-            if file not in seen_files:
-                unique_files.append(file)
-                seen_files.add(file)
-        unique_files.reverse()
-
-        self.file_list.clear()
-        for file in unique_files:
-            item_text = f"{os.path.basename(file)} (修改日期: {datetime.fromtimestamp(os.path.getmtime(file)).strftime('%Y-%m-%d %H:%M:%S')})"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, file)
-            self.file_list.addItem(item)
+        """按文件内容去除重复文件，另存为不同名称或复制到不同目录的同一文件也能识别"""
+        paths = self.file_list.paths()
+        job = Job(content_keys, paths)
+        job.signals.finished.connect(self.remove_duplicate_items)
+        job.signals.failed.connect(lambda error: QMessageBox.critical(self, "错误", f"查找重复文件失败:\n{error}"))
+        self.job_panel.start(job)
+
+    def remove_duplicate_items(self, keys=None):
+        """在原列表上删除重复项，不重建列表；任务运行期间列表可能已被修改，按当前内容重新判断"""
+        paths = self.file_list.paths()
+        self.file_list.remove_rows(duplicate_rows(paths, keys or {}))
 
     def move_to_top(self):
-        current_row = self.file_list.currentRow()
+        current_row = self.file_list.current_row()
         if current_row > 0:
-            item = self.file_list.takeItem(current_row)
-            self.file_list.insertItem(0, item)
-            self.file_list.setCurrentRow(0)
+            self.file_list.move_row(current_row, 0)
 
     def move_up(self):
-        current_row = self.file_list.currentRow()
+        current_row = self.file_list.current_row()
         if current_row > 0:
-            item = self.file_list.takeItem(current_row)
-            self.file_list.insertItem(current_row - 1, item)
-            self.file_list.setCurrentRow(current_row - 1)
+            self.file_list.move_row(current_row, current_row - 1)
 
     def move_down(self):
-        current_row = self.file_list.currentRow()
-        if current_row < self.file_list.count() - 1:
-            item = self.file_list.takeItem(current_row)
-            self.file_list.insertItem(current_row + 1, item)
-            self.file_list.setCurrentRow(current_row + 1)
+        current_row = self.file_list.current_row()
+        if 0 <= current_row < self.file_list.count() - 1:
+            self.file_list.move_row(current_row, current_row + 1)
 
     def move_to_bottom(self):
-        current_row = self.file_list.currentRow()
-        if current_row < self.file_list.count() - 1:
-            item = self.file_list.takeItem(current_row)
-            self.file_list.addItem(item)
-            self.file_list.setCurrentRow(self.file_list.count() - 1)
+        current_row = self.file_list.current_row()
+        if 0 <= current_row < self.file_list.count() - 1:
+            self.file_list.move_row(current_row, self.file_list.count() - 1)
 
     def merge_files(self):
         output_path, _ = QFileDialog.getSaveFileName(self, "保存合并后的Excel", "", "Excel Files (*.xlsx)")
         if not output_path:
             return
 
-        excel_files = [self.file_list.item(i).data(Qt.UserRole) for i in range(self.file_list.count())]
+        excel_files = self.file_list.paths()
         if not excel_files:
             QMessageBox.warning(self, "警告", "请先添加Excel文件")
             return
@@ -182,121 +173,91 @@ class ExcelMergeTab(QWidget):
                 seen_files.add(file)
         unique_files.reverse()
 
-        try:
-            merged_wb = Workbook()
-            default_sheet = merged_wb.active
-            default_sheet.title = "MergedData"
-
-            # 获取第一个文件的第一个工作表名称作为目标工作表名称
-            if unique_files:
-                first_file = unique_files[0]
-                _, ext_first = os.path.splitext(first_file)
-                if ext_first.lower() == '.xlsx':
-                    wb_first = load_workbook(first_file)
-                    first_sheet_name = wb_first.sheetnames[0]
-                    ws_first = wb_first[first_sheet_name]
-                    header_rows = list(ws_first.iter_rows(min_row=1, max_row=8, values_only=True))
-                elif ext_first.lower() == '.xls':
-                    wb_first = xlrd.open_workbook(first_file)
-                    first_sheet_name = wb_first.sheet_names()[0]
-                    ws_first = wb_first.sheet_by_name(first_sheet_name)
-                    header_rows = [ws_first.row_values(row_idx, 0, ws_first.ncols) for row_idx in range(0, 8)]
-                else:
-                    first_sheet_name = "Sheet1"
-                    header_rows = []
-
-            merged_sheet = merged_wb.create_sheet(title=first_sheet_name)
-            merged_wb.remove(merged_wb["MergedData"])  # 删除默认创建的工作表
-
-            # 插入第一个文件的前8行
-            for row in header_rows:
-                merged_sheet.append(row)
-
-            for file in unique_files:
-                _, ext = os.path.splitext(file)
-                if ext.lower() == '.xlsx':
-                    wb = load_workbook(file)
-                    for sheet_name in wb.sheetnames:
-                        ws = wb[sheet_name]
-
-                        # 从第9行开始读取，直到最后一个非空行
-                        for row in ws.iter_rows(min_row=9, values_only=True):
-                            if any(cell is not None and cell != '' for cell in row):
-                                merged_sheet.append(row)
-                elif ext.lower() == '.xls':
-                    wb = xlrd.open_workbook(file)
-                    for sheet_name in wb.sheet_names():
-                        ws = wb.sheet_by_name(sheet_name)
-
-                        # 从第9行开始读取，直到最后一个非空行
-                        for row_idx in range(8, ws.nrows):
-                            row = ws.row_values(row_idx)
-                            if any(cell != "" for cell in row):
-                                merged_sheet.append(row)
-
-            merged_wb.save(output_path)
-            QMessageBox.information(self, "成功", f"Excel文件已成功合并到:\n{output_path}")
-
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"合并Excel失败:\n{str(e)}")
+        dedupe_mode = self.dedupe_combo.currentData()
+        row_index = None
+        if dedupe_mode:
+            from row_index import RowIndex, parse_columns
+            try:
+                row_index = RowIndex(parse_columns(self.key_columns_edit.text()), dedupe_mode)
+            except ValueError as e:
+                QMessageBox.warning(self, "警告", str(e))
+                return
 
-    def print_files(self):
-        try:
-            current_time = datetime.now().strftime("%y%m%d-%H%M%S")
-            output_path = os.path.abspath(f"{current_time}.xlsx")
+        if self.queue_checkbox.isChecked():
+            # 多个队列任务本身并行执行，单个任务内按顺序解析
+            params = {'files': unique_files, 'output': output_path,
+                      'streaming': self.streaming_checkbox.isChecked(),
+                      'incremental': self.incremental_checkbox.isChecked(),
+                      'columnar': self.columnar_checkbox.isChecked(),
+                      'dedupe': dedupe_mode, 'key_columns': self.key_columns_edit.text()}
+            job_id = enqueue('excel-merge', params, f"Excel合并 {os.path.basename(output_path)}")
+            self.job_panel.status_label.setText(f"已加入任务队列，编号 {job_id}")
+            return
 
-            excel_files = [self.file_list.item(i).data(Qt.UserRole) for i in range(self.file_list.count())]
-            if not excel_files:
-                QMessageBox.warning(self, "警告", "请先添加Excel文件")
-                return
+        # openpyxl/xlrd 第一次合并时才导入
+        from excel_manager import ExcelManager
+        excel_manager = ExcelManager()
+        start_time = time.perf_counter()
+        if row_index is not None:
+            job = Job(excel_manager.merge_files_streaming, unique_files, output_path, row_index=row_index)
+        elif self.incremental_checkbox.isChecked():
+            job = Job(excel_manager.merge_files_incremental, unique_files, output_path)
+        elif self.columnar_checkbox.isChecked():
+            workers = None if self.parallel_checkbox.isChecked() else 1
+            job = Job(excel_manager.merge_files_columnar, unique_files, output_path, workers)
+        elif self.parallel_checkbox.isChecked() and len(unique_files) > 1:
+            job = Job(excel_manager.merge_files_parallel, unique_files, output_path)
+        else:
+            job = Job(excel_manager.merge_files, unique_files, output_path, self.streaming_checkbox.isChecked())
+        job.signals.finished.connect(
+            lambda result: self.on_merge_finished(excel_manager, output_path, time.perf_counter() - start_time))
+        job.signals.failed.connect(lambda error: QMessageBox.critical(self, "错误", f"合并Excel失败:\n{error}"))
+        self.job_panel.start(job)
+
+    def on_merge_finished(self, excel_manager, output_path, seconds):
+        rows_per_second = excel_manager.rows_merged / seconds if seconds > 0 else 0
+        message = (f"Excel文件已成功合并到:\n{output_path}\n"
+                   f"共 {excel_manager.rows_merged} 行, 耗时 {seconds:.1f} 秒, 速度 {rows_per_second:.0f} 行/秒")
+        stats = excel_manager.incremental_stats
+        if stats:
+            message += (f"\n增量: 新增 {stats['added']} 个, 更新 {stats['changed']} 个, "
+                        f"移除 {stats['removed']} 个, 未变 {stats['unchanged']} 个")
+            if stats['reordered']:
+                message += ", 顺序已调整"
+        if excel_manager.duplicate_report:
+            message += f"\n发现重复行 {excel_manager.duplicate_rows} 行, 清单:\n{excel_manager.duplicate_report}"
+        QMessageBox.information(self, "成功", message)
 
-            unique_files = []
-            seen_files = set()
-            for file in reversed(excel_files):
-                if file not in seen_files:
-                    unique_files.append(file)
-                    seen_files.add(file)
-            unique_files.reverse()
-
-            # 合并逻辑
-            merged_wb = Workbook()
-            default_sheet = merged_wb.active
-            merged_wb.remove(default_sheet)
-
-            for file in unique_files:
-                _, ext = os.path.splitext(file)
-                if ext.lower() == '.xlsx':
-                    wb = load_workbook(file)
-                    for sheet_name in wb.sheetnames:
-                        ws = wb[sheet_name]
-                        new_ws = merged_wb.create_sheet(f"{os.path.splitext(os.path.basename(file))[0]}_{sheet_name}")
-                        for row in ws.iter_rows(values_only=True):
-                            new_ws.append(row)
-                elif ext.lower() == '.xls':
-                    wb = xlrd.open_workbook(file)
-                    for sheet_name in wb.sheet_names():
-                        ws = wb.sheet_by_name(sheet_name)
-                        new_ws = merged_wb.create_sheet(f"{os.path.splitext(os.path.basename(file))[0]}_{sheet_name}")
-                        for row_idx in range(ws.nrows):
-                            row = ws.row_values(row_idx)
-                            new_ws.append(row)
-
-            merged_wb.save(output_path)
-
-            if not os.path.exists(output_path):
-                QMessageBox.critical(self, "错误", "生成的Excel文件不存在")
-                return
+    def print_files(self):
+        excel_files = self.file_list.paths()
+        if not excel_files:
+            QMessageBox.warning(self, "警告", "请先添加Excel文件")
+            return
+
+        unique_files = []
+        seen_files = set()
+        for file in reversed(excel_files):
+            if file not in seen_files:
+                unique_files.append(file)
+                seen_files.add(file)
+        unique_files.reverse()
 
-            # 使用默认程序打开 Excel 文件
-            subprocess.Popen(['start', 'excel', output_path], shell=True)
-            time.sleep(2)  # 等待Excel加载
-            
-            # 检查pyautogui是否可用
-            if PYAUTOGUI_AVAILABLE and pyautogui:
-                pyautogui.hotkey('ctrl', 'p')  # 触发打印
-                QMessageBox.information(self, "成功", "打印任务已启动")
-            else:
-                QMessageBox.information(self, "提示", f"Excel文件已生成并打开:\n{output_path}\n请手动按 Ctrl+P 打印")
-
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"打印失败:\n{str(e)}")
+        # 合并和送打印都在后台执行；同一列表(内容未变)重复打印时直接使用缓存的合并结果
+        from excel_manager import ExcelManager
+        from print_spooler import backend_warning, print_merged
+        warning = backend_warning()
+        if warning:
+            QMessageBox.warning(self, "提示", warning)
+        if self.parallel_checkbox.isChecked() and len(unique_files) > 1:
+            merge = ExcelManager().merge_sheets_parallel
+        else:
+            merge = ExcelManager().merge_sheets
+        # 工作表名称取自文件名，内容相同但改了名的文件不能用旧的合并结果
+        params = {'names': [os.path.basename(file) for file in unique_files]}
+        job = Job(print_merged, 'excel-print', unique_files, params, '.xlsx',
+                  lambda output_path, on_file, on_page: merge(unique_files, output_path,
+                                                              on_file=on_file, on_page=on_page),
+                  "Excel合并打印")
+        job.signals.finished.connect(lambda result: QMessageBox.information(self, "成功", f"打印任务已提交:\n{result}"))
+        job.signals.failed.connect(lambda error: QMessageBox.critical(self, "错误", f"打印失败:\n{error}"))
+        self.job_panel.start(job)
@@ -0,0 +1,111 @@
+# file_hash_cache.py
+
+from concurrent.futures import ThreadPoolExecutor
+from app_paths import app_data_dir
+import hashlib
+import os
+import sqlite3
+
+
+def file_sha256(file):
+    sha256 = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def normalize_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class FileHashCache:
+    """按 (路径, 大小, 修改时间) 持久缓存文件的SHA-256，文件未变化时不再重新读取"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(app_data_dir(), 'file_hashes.sqlite3')
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hash ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)"
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, path, stat):
+        row = self.conn.execute(
+            "SELECT sha256 FROM file_hash WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (normalize_path(path), stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        return row[0] if row else None
+
+    def store(self, path, stat, sha256):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO file_hash (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+            (normalize_path(path), stat.st_size, stat.st_mtime_ns, sha256)
+        )
+
+    def hash_files(self, paths, workers=4, on_file=None):
+        """返回 {路径: sha256}；缓存未命中的文件在线程池中并行计算"""
+        stats = {path: os.stat(path) for path in paths}
+        hashes = {}
+        missing = []
+        for path in paths:
+            sha256 = self.lookup(path, stats[path])
+            if sha256:
+                hashes[path] = sha256
+            else:
+                missing.append(path)
+
+        # hashlib 计算大块数据时会释放GIL，线程池即可并行
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for index, (path, sha256) in enumerate(zip(missing, executor.map(file_sha256, missing))):
+                if on_file:
+                    on_file(index, len(missing), path)
+                hashes[path] = sha256
+                self.store(path, stats[path], sha256)
+        self.conn.commit()
+        return hashes
+
+
+def content_keys(paths, cache=None, on_file=None, on_page=None):
+    """计算用于判断重复的内容键 {路径: (大小, sha256)}。
+    先按文件大小筛选，只有大小相同的不同文件才需要计算哈希；其余文件不出现在结果中"""
+    sizes = {}
+    for path in set(paths):
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            pass
+
+    paths_by_size = {}
+    for path, size in sizes.items():
+        paths_by_size.setdefault(size, set()).add(normalize_path(path))
+    candidates = [path for path, size in sizes.items() if len(paths_by_size[size]) > 1]
+    if not candidates:
+        return {}
+
+    own_cache = cache is None
+    cache = cache or FileHashCache()
+    try:
+        hashes = cache.hash_files(candidates, on_file=on_file)
+    finally:
+        if own_cache:
+            cache.close()
+    return {path: (sizes[path], sha256) for path, sha256 in hashes.items()}
+
+
+def duplicate_rows(paths, keys):
+    """返回应删除的行号(升序)，与原来一样保留最后出现的一项；
+    没有内容键的文件按路径判断"""
+    rows = []
+    seen = set()
+    for row in range(len(paths) - 1, -1, -1):
+        key = keys.get(paths[row]) or normalize_path(paths[row])
+        if key in seen:
+            rows.append(row)
+        else:
+            seen.add(key)
+    rows.reverse()
+    return rows
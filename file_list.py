@@ -0,0 +1,342 @@
+# file_list.py
+
+from PyQt5.QtWidgets import QListView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QDragEnterEvent
+from dir_scanner import iter_file_batches
+import os
+import threading
+from datetime import datetime
+
+# 每个后台任务读取的文件数
+METADATA_BATCH_SIZE = 500
+# 页数/行数逐个统计，每统计这么多个刷新一次界面
+COUNT_BATCH_SIZE = 50
+
+# 所有列表共享的文件信息缓存: 路径 -> [大小, 修改时间(纳秒), 修改日期文本, 页数或行数]
+# 大小为None表示文件不存在；页数/行数为None表示尚未统计或无法统计。
+# 每次加入列表都会在后台重新读取大小和修改时间，两者都没变时才沿用缓存的页数/行数
+_metadata_cache = {}
+_metadata_pool = None
+
+
+def metadata_pool():
+    """读取文件信息专用的线程池，不占用合并/拆分任务的线程"""
+    global _metadata_pool
+    if _metadata_pool is None:
+        _metadata_pool = QThreadPool()
+        _metadata_pool.setMaxThreadCount(2)
+    return _metadata_pool
+
+
+def count_pdf_pages(file_path):
+    """PDF页数，取自本机PDF索引，文件未变化时不再解析；
+    在后台线程第一次统计时才导入PyPDF2，不拖慢启动"""
+    from pdf_index import pdf_info
+    info = pdf_info(file_path)
+    if info['error']:
+        raise ValueError(info['error'])
+    return info['page_count']
+
+
+def count_excel_rows(file_path):
+    """Excel总行数；在后台线程第一次统计时才导入openpyxl/xlrd"""
+    from excel_manager import excel_row_count
+    return excel_row_count(file_path)
+
+
+class MetadataSignals(QObject):
+    loaded = pyqtSignal(list)  # [(路径, 大小, 修改时间(纳秒), 修改日期文本, 页数或行数)]
+    done = pyqtSignal()
+
+
+class MetadataLoader(QRunnable):
+    """后台读取一批文件的大小和修改日期，再逐个统计页数/行数(文件未变化时沿用缓存)"""
+
+    def __init__(self, paths, counter=None):
+        super().__init__()
+        self.paths = paths
+        self.counter = counter
+        self.signals = MetadataSignals()
+        self.setAutoDelete(False)
+
+    def run(self):
+        results = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                results.append((path, None, None, None, None))
+                continue
+            modification_time = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+            cached = _metadata_cache.get(path)
+            count = cached[3] if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns] else None
+            results.append((path, stat.st_size, stat.st_mtime_ns, modification_time, count))
+        self.signals.loaded.emit(results)
+
+        if self.counter:
+            counted = []
+            for path, size, mtime_ns, modification_time, count in results:
+                if size is None or count is not None:
+                    continue
+                try:
+                    count = self.counter(path)
+                except Exception:
+                    count = None
+                counted.append((path, size, mtime_ns, modification_time, count))
+                if len(counted) >= COUNT_BATCH_SIZE:
+                    self.signals.loaded.emit(counted)
+                    counted = []
+            if counted:
+                self.signals.loaded.emit(counted)
+        self.signals.done.emit()
+
+
+class ScanSignals(QObject):
+    found = pyqtSignal(list)
+    done = pyqtSignal()
+
+
+class DirectoryScanner(QRunnable):
+    """后台递归扫描目录，找到的文件分批发出，边扫描边加入列表"""
+
+    def __init__(self, root, extensions):
+        super().__init__()
+        self.root = root
+        self.extensions = extensions
+        self.signals = ScanSignals()
+        self._cancel_event = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            for batch in iter_file_batches(self.root, self.extensions):
+                if self._cancel_event.is_set():
+                    break
+                self.signals.found.emit(batch)
+        finally:
+            self.signals.done.emit()
+
+
+class FileListModel(QAbstractListModel):
+    """文件列表数据只保存路径，显示文本由共享的信息缓存生成"""
+
+    def __init__(self, counter=None, count_unit="", parent=None):
+        super().__init__(parent)
+        self.counter = counter
+        self.count_unit = count_unit
+        self.file_paths = []
+        # 文件 -> 页码范围说明，只有设置过的文件才有
+        self.page_ranges = {}
+        self.loaders = set()
+        self.pending = set()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.file_paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        file_path = self.file_paths[index.row()]
+        if role == Qt.DisplayRole:
+            return self.item_text(file_path)
+        if role in (Qt.UserRole, Qt.ToolTipRole):
+            return file_path
+        return None
+
+    def item_text(self, file_path):
+        file_name = os.path.basename(file_path)
+        metadata = _metadata_cache.get(file_path)
+        if metadata is None:
+            return f"{file_name} (读取中...)"
+        size, _, modification_time, count = metadata
+        if size is None:
+            return f"{file_name} (文件不存在)"
+        item_text = f"{file_name} (修改日期: {modification_time})"
+        if count is not None:
+            item_text += f" {count}{self.count_unit}"
+        if file_path in self.page_ranges:
+            item_text += f" [页码: {self.page_ranges[file_path]}]"
+        return item_text
+
+    def add_files(self, file_paths):
+        if not file_paths:
+            return
+        start = len(self.file_paths)
+        self.beginInsertRows(QModelIndex(), start, start + len(file_paths) - 1)
+        self.file_paths.extend(file_paths)
+        self.endInsertRows()
+
+        # 缓存中已有的文件也要重新读取大小和修改时间，文件可能在上次加入后被修改过
+        missing = []
+        for file_path in file_paths:
+            if file_path not in self.pending:
+                missing.append(file_path)
+                self.pending.add(file_path)
+        for i in range(0, len(missing), METADATA_BATCH_SIZE):
+            self.load_metadata(missing[i:i + METADATA_BATCH_SIZE])
+
+    def load_metadata(self, file_paths):
+        loader = MetadataLoader(file_paths, self.counter)
+        self.loaders.add(loader)
+        loader.signals.loaded.connect(self.on_metadata_loaded)
+        loader.signals.done.connect(lambda: self.on_loader_done(loader))
+        metadata_pool().start(loader)
+
+    def on_metadata_loaded(self, results):
+        for file_path, size, mtime_ns, modification_time, count in results:
+            _metadata_cache[file_path] = [size, mtime_ns, modification_time, count]
+        # 只有可见的行会重绘，整体通知一次即可
+        if self.file_paths:
+            self.dataChanged.emit(self.index(0), self.index(len(self.file_paths) - 1), [Qt.DisplayRole])
+
+    def on_loader_done(self, loader):
+        self.loaders.discard(loader)
+        self.pending.difference_update(loader.paths)
+
+    def set_page_range(self, rows, spec):
+        """设置指定行的页码范围，spec 为空时取消"""
+        for row in rows:
+            if spec:
+                self.page_ranges[self.file_paths[row]] = spec
+            else:
+                self.page_ranges.pop(self.file_paths[row], None)
+            self.dataChanged.emit(self.index(row), self.index(row), [Qt.DisplayRole])
+
+    def remove_rows(self, rows):
+        """删除指定的行，连续的行一次删除"""
+        rows = sorted(set(rows), reverse=True)
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.file_paths[first:last + 1]
+            self.endRemoveRows()
+        if self.page_ranges:
+            remaining = set(self.file_paths)
+            self.page_ranges = {path: spec for path, spec in self.page_ranges.items() if path in remaining}
+
+    def move_row(self, source_row, target_row):
+        if source_row == target_row:
+            return
+        # beginMoveRows 的目标位置是移动前的插入点
+        destination = target_row + 1 if target_row > source_row else target_row
+        self.beginMoveRows(QModelIndex(), source_row, source_row, QModelIndex(), destination)
+        self.file_paths.insert(target_row, self.file_paths.pop(source_row))
+        self.endMoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.file_paths = []
+        self.page_ranges = {}
+        self.endResetModel()
+
+
+class FileListWidget(QListView):
+    """三个标签页共用的文件列表，支持拖入文件，大列表滚动和排序不卡顿"""
+
+    files_found = pyqtSignal(list)  # 后台扫描文件夹找到并加入列表的文件
+
+    def __init__(self, extensions, counter=None, count_unit="", parent=None):
+        super().__init__(parent)
+        self.extensions = extensions
+        self.file_model = FileListModel(counter, count_unit, self)
+        self.setModel(self.file_model)
+        # 行高一致、分批布局，上万行也能快速滚动
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setAcceptDrops(True)
+        self.scanners = set()
+
+    def dragEnterEvent(self, event: QDragEnterEvent):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dropEvent(self, event):
+        if event.mimeData().hasUrls():
+            file_paths = [url.toLocalFile() for url in event.mimeData().urls()]
+            # 与目录扫描一样不区分扩展名大小写
+            extensions = tuple(ext.lower() for ext in self.extensions)
+            self.add_files([file_path for file_path in file_paths if file_path.lower().endswith(extensions)])
+            # 拖入的文件夹在后台扫描
+            for file_path in file_paths:
+                if os.path.isdir(file_path):
+                    self.add_directory(file_path)
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def add_files(self, file_paths):
+        self.file_model.add_files(list(file_paths))
+
+    def add_directory(self, directory):
+        scanner = DirectoryScanner(directory, self.extensions)
+        self.scanners.add(scanner)
+        scanner.signals.found.connect(lambda file_paths: self.on_files_found(scanner, file_paths))
+        scanner.signals.done.connect(lambda: self.scanners.discard(scanner))
+        QThreadPool.globalInstance().start(scanner)
+
+    def on_files_found(self, scanner, file_paths):
+        # 列表被清空后，取消前已发出的结果也不再加入
+        if scanner in self.scanners and not scanner.is_cancelled():
+            self.add_files(file_paths)
+            self.files_found.emit(file_paths)
+
+    def is_scanning(self):
+        return bool(self.scanners)
+
+    def cancel_scans(self):
+        for scanner in self.scanners:
+            scanner.cancel()
+
+    def count(self):
+        return self.file_model.rowCount()
+
+    def paths(self):
+        return list(self.file_model.file_paths)
+
+    def selected_rows(self):
+        return sorted(index.row() for index in self.selectionModel().selectedRows())
+
+    def selected_paths(self):
+        return [self.file_model.file_paths[row] for row in self.selected_rows()]
+
+    def remove_rows(self, rows):
+        self.file_model.remove_rows(rows)
+
+    def set_page_range(self, rows, spec):
+        self.file_model.set_page_range(rows, spec)
+
+    def page_ranges(self):
+        return dict(self.file_model.page_ranges)
+
+    def delete_selected(self):
+        self.file_model.remove_rows(self.selected_rows())
+
+    def clear(self):
+        self.cancel_scans()
+        self.file_model.clear()
+
+    def current_row(self):
+        return self.currentIndex().row()
+
+    def move_row(self, source_row, target_row):
+        self.file_model.move_row(source_row, target_row)
+        self.setCurrentIndex(self.file_model.index(target_row))
+
@@ -0,0 +1,257 @@
+# hot_folder.py
+# 热文件夹：监视输入目录，文件写完后自动合并或拆分，不依赖PyQt5。
+# 处理成功的源文件移到"已处理"目录，失败的移到"失败"目录，看目录就知道处理进度。
+
+from dir_scanner import iter_files
+from output_file import temp_output_path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+import os
+import shutil
+import time
+
+MODES = ('pdf-merge', 'excel-merge', 'split')
+MODE_EXTENSIONS = {
+    'pdf-merge': ('.pdf',),
+    'excel-merge': ('.xlsx', '.xls'),
+    'split': ('.pdf',),
+}
+
+
+class HotFolder:
+    """轮询输入目录，大小和修改时间在 settle_seconds 内不再变化的文件才算写完。
+    写完的文件交给进程池处理，进程池里排队的任务达到 max_pending 时不再接收新文件，
+    多出来的文件留在输入目录，等有空闲再处理。
+    大小已稳定但 give_up_seconds 内一直无法读取(被其他程序独占)的文件放弃处理，文件再次变化后才重新处理"""
+
+    def __init__(self, input_dir, mode, output_dir=None, processed_dir=None, failed_dir=None,
+                 parts=2, batch_size=50, settle_seconds=2.0, poll_interval=1.0, workers=None, max_pending=None,
+                 give_up_seconds=60.0):
+        if mode not in MODES:
+            raise ValueError(f"不支持的模式: {mode}")
+        self.input_dir = input_dir
+        self.mode = mode
+        self.output_dir = output_dir or os.path.join(input_dir, "输出")
+        self.processed_dir = processed_dir or os.path.join(input_dir, "已处理")
+        self.failed_dir = failed_dir or os.path.join(input_dir, "失败")
+        self.parts = parts
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.give_up_seconds = give_up_seconds
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending or self.workers * 2
+        # 路径 -> (大小, 修改时间, 开始稳定的时间)
+        self.observed = {}
+        self.in_flight = set()
+        # 放弃处理的文件 -> (大小, 修改时间)；unreadable 为尚未报告的放弃文件
+        self.given_up = {}
+        self.unreadable = []
+        self.futures = {}
+        self.sequence = 0
+        self.stats = {'tasks': 0, 'processed': 0, 'failed': 0, 'skipped': 0, 'pages': 0, 'rows': 0}
+
+    def scan(self, now=None):
+        """扫描一次输入目录，返回已经写完、可以处理的文件(按名称排序)"""
+        now = time.monotonic() if now is None else now
+        # 输出目录可能就是输入目录，拆分结果不能当作新文件再拆一次
+        suffix = f"-{self.parts}a5.pdf" if self.mode == 'split' else None
+        present = set()
+        ready = []
+        for file_path in iter_files(self.input_dir, MODE_EXTENSIONS[self.mode], recursive=False):
+            if suffix and file_path.endswith(suffix):
+                continue
+            present.add(file_path)
+            if file_path in self.in_flight:
+                continue
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self.given_up.get(file_path) == signature:
+                continue
+            self.given_up.pop(file_path, None)
+            previous = self.observed.get(file_path)
+            if previous is None or previous[:2] != signature:
+                self.observed[file_path] = signature + (now,)
+                continue
+            if now - previous[2] < self.settle_seconds:
+                continue
+            if _readable(file_path):
+                ready.append(file_path)
+            elif now - previous[2] >= self.settle_seconds + self.give_up_seconds:
+                del self.observed[file_path]
+                self.given_up[file_path] = signature
+                self.unreadable.append(file_path)
+        # 被外部移走的文件不再跟踪
+        for tracked in (self.observed, self.given_up):
+            for file_path in list(tracked):
+                if file_path not in present:
+                    del tracked[file_path]
+        return ready
+
+    def report_unreadable(self):
+        """返回新放弃的文件的结果(与任务结果格式相同)，文件留在输入目录"""
+        results = []
+        for file_path in self.unreadable:
+            self.stats['skipped'] += 1
+            results.append({'output': None, 'error': f"文件一直无法读取，已放弃: {file_path}", 'pages': 0, 'rows': 0,
+                            'invalid': {}, 'inputs': [file_path]})
+        self.unreadable = []
+        return results
+
+    def make_tasks(self, ready):
+        """拆分模式每个文件一个任务，合并模式每 batch_size 个文件合并为一个输出"""
+        if self.mode == 'split':
+            return [[file_path] for file_path in ready]
+        return [ready[i:i + self.batch_size] for i in range(0, len(ready), self.batch_size)]
+
+    def submit_ready(self, executor):
+        """在排队上限内提交新任务，返回提交的任务数"""
+        capacity = self.max_pending - len(self.futures)
+        if capacity <= 0:
+            return 0
+        tasks = self.make_tasks(self.scan())[:capacity]
+        for files in tasks:
+            self.sequence += 1
+            output_path = self.output_path(files)
+            future = executor.submit(_run_task, self.mode, files, output_path, self.parts)
+            self.futures[future] = files
+            self.in_flight.update(files)
+        return len(tasks)
+
+    def output_path(self, files):
+        if self.mode == 'split':
+            file_name = os.path.splitext(os.path.basename(files[0]))[0]
+            return os.path.join(self.output_dir, f"{file_name}-{self.parts}a5.pdf")
+        extension = '.pdf' if self.mode == 'pdf-merge' else '.xlsx'
+        current_time = datetime.now().strftime("%y%m%d-%H%M%S")
+        return os.path.join(self.output_dir, f"{current_time}-{self.sequence}{extension}")
+
+    def collect(self, futures):
+        """处理已完成的任务：移动源文件，更新统计，返回每个任务的结果"""
+        results = []
+        for future in futures:
+            files = self.futures.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'output': None, 'error': str(e), 'pages': 0, 'rows': 0, 'invalid': {}}
+            # 无法读取的文件移到失败目录，其余文件随任务结果移动
+            invalid = result.get('invalid', {})
+            failed = 0
+            for file_path in files:
+                self.in_flight.discard(file_path)
+                self.observed.pop(file_path, None)
+                if result['error'] or file_path in invalid:
+                    target_dir = self.failed_dir
+                    failed += 1
+                else:
+                    target_dir = self.processed_dir
+                if os.path.exists(file_path):
+                    move_to(file_path, target_dir)
+            self.stats['tasks'] += 1
+            self.stats['failed'] += failed
+            self.stats['processed'] += len(files) - failed
+            self.stats['pages'] += result['pages']
+            self.stats['rows'] += result['rows']
+            results.append(dict(result, inputs=files))
+        return results
+
+    def run(self, on_result=None, stop_event=None, once=False):
+        """持续监视输入目录，直到 stop_event 被设置；once 为真时处理完目录中现有文件就返回"""
+        for directory in (self.output_dir, self.processed_dir, self.failed_dir):
+            os.makedirs(directory, exist_ok=True)
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while not (stop_event and stop_event.is_set()):
+                self.submit_ready(executor)
+                for result in self.report_unreadable():
+                    if on_result:
+                        on_result(result)
+                if once and not self.futures and not self.observed:
+                    break
+                if self.futures:
+                    done, _ = wait(self.futures, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for result in self.collect(done):
+                        if on_result:
+                            on_result(result)
+                else:
+                    time.sleep(self.poll_interval)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        return self.stats
+
+
+def _readable(file_path):
+    # Windows 上仍被写入程序独占打开的文件无法读取
+    try:
+        with open(file_path, 'rb') as f:
+            f.read(1)
+    except OSError:
+        return False
+    return True
+
+
+def move_to(file_path, directory):
+    """把文件移到指定目录，同名时在文件名后加序号，返回新路径"""
+    os.makedirs(directory, exist_ok=True)
+    target = unique_path(os.path.join(directory, os.path.basename(file_path)))
+    shutil.move(file_path, target)
+    return target
+
+
+def unique_path(path):
+    """path 已存在时在文件名后加序号"""
+    file_name, extension = os.path.splitext(path)
+    target = path
+    counter = 1
+    while os.path.exists(target):
+        target = f"{file_name} ({counter}){extension}"
+        counter += 1
+    return target
+
+
+def _run_task(mode, files, output_path, parts):
+    # 进程池只能调用模块级函数，处理结果以字典返回。
+    # 结果先写到本任务自己的临时文件(见 output_file.temp_output_path)，成功后才移到输出目录(同名时加序号)，
+    # 失败时只删除这个临时文件，输出目录和源文件旁边已有的文件都不受影响。
+    # PDF合并先按PDF索引检查，无法读取的文件记在 invalid 中(之后移到失败目录)，其余文件照常合并
+    result = {'output': None, 'error': None, 'pages': 0, 'rows': 0, 'invalid': {}}
+    temp_path = temp_output_path(output_path)
+    try:
+        if mode == 'split':
+            from a4_splitter import A4Splitter
+            splitter = A4Splitter()
+            splitter.split_pdf(files[0], parts, output_path=temp_path)
+            result['pages'] = splitter.last_page_count
+        elif mode == 'pdf-merge':
+            from pdf_index import invalid_pdfs
+            from pdf_manager import PdfManager
+            result['invalid'] = invalid_pdfs(files)
+            valid_files = [file_path for file_path in files if file_path not in result['invalid']]
+            if not valid_files:
+                raise ValueError("没有可以读取的PDF文件")
+            PdfManager().merge_pdfs(valid_files, temp_path, streaming=True, dedupe=True)
+        else:
+            from excel_manager import ExcelManager
+            excel_manager = ExcelManager()
+            excel_manager.merge_files(files, temp_path, streaming=True)
+            result['rows'] = excel_manager.rows_merged
+        output_path = _replace_unique(temp_path, output_path)
+    except Exception as e:
+        result['error'] = str(e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    else:
+        result['output'] = output_path
+    return result
+
+
+def _replace_unique(temp_path, output_path):
+    target = unique_path(output_path)
+    os.replace(temp_path, target)
+    return target
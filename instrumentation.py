@@ -0,0 +1,351 @@
+# instrumentation.py
+# 任务计时：记录每个合并/拆分/打印任务各阶段(打开、解析、复制、写出...)的耗时、读写字节数和任务期间的内存峰值增量，
+# 写入轮转的JSONL日志。当前线程没有正在记录的任务时，stage() 等接口只做一次属性查找。
+# 设置环境变量 FINANCETOOL_TRACE=0 可完全关闭。
+
+from app_paths import app_data_dir
+from datetime import datetime
+import json
+import os
+import sys
+import threading
+import time
+
+# 尝试导入psutil，没有时 Windows 上用 GetProcessMemoryInfo，Linux 上读 /proc
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# 进程的常驻内存峰值由系统记录：Windows 用 GetProcessMemoryInfo，其他系统用 getrusage
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+if sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+
+    class _ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    try:
+        _kernel32 = ctypes.WinDLL('kernel32')
+        _kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        _kernel32.K32GetProcessMemoryInfo.argtypes = [
+            wintypes.HANDLE, ctypes.POINTER(_ProcessMemoryCounters), wintypes.DWORD]
+        _kernel32.K32GetProcessMemoryInfo.restype = wintypes.BOOL
+        WIN32_MEMORY_AVAILABLE = True
+    except (OSError, AttributeError):
+        WIN32_MEMORY_AVAILABLE = False
+else:
+    WIN32_MEMORY_AVAILABLE = False
+
+ENABLED = os.environ.get('FINANCETOOL_TRACE', '1') != '0'
+LOG_NAME = 'jobs.jsonl'
+# 日志超过这个大小就轮转，保留 LOG_BACKUPS 个旧文件
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+# 任务期间读取常驻内存的间隔(秒)；创下新高的峰值由系统记录，采样只用于峰值低于以往最高值的任务
+MEMORY_SAMPLE_INTERVAL = 0.5
+# 装了 psutil 时子进程列表缓存这么多秒再重新枚举
+CHILDREN_REFRESH_SECONDS = 1.0
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+class Trace:
+    """一个任务的记录：阶段 -> 累计秒数/次数，文件 -> 各阶段秒数"""
+
+    def __init__(self, job):
+        self.job = job
+        self.started = datetime.now()
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.files = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.memory = MemorySampler()
+        self.memory.start()
+
+    def add_stage(self, name, seconds, file=None):
+        totals = self.stages.setdefault(name, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+        if file is not None:
+            file_stages = self.files.setdefault(file, {})
+            file_stages[name] = file_stages.get(name, 0.0) + seconds
+
+    def record(self, status):
+        self.memory.stop()
+        return {
+            'job': self.job,
+            'status': status,
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self.start, 4),
+            'stages': {name: {'seconds': round(seconds, 4), 'count': count}
+                       for name, (seconds, count) in self.stages.items()},
+            'files': [{'file': file, 'stages': {name: round(seconds, 4) for name, seconds in stages.items()}}
+                      for file, stages in self.files.items()],
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'peak_memory_mb': self.memory.growth_mb(),
+        }
+
+
+class _Stage:
+    __slots__ = ('trace', 'name', 'file', 'start')
+
+    def __init__(self, trace, name, file):
+        self.trace = trace
+        self.name = name
+        self.file = file
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.trace.add_stage(self.name, time.perf_counter() - self.start, self.file)
+        return False
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, file=None):
+    """with stage('open', 文件路径): ... 把这段代码的耗时计入当前任务的 name 阶段"""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return _NULL_STAGE
+    return _Stage(trace, name, file)
+
+
+def count_read(file_path):
+    """把读取的文件大小计入当前任务"""
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        try:
+            trace.bytes_read += os.path.getsize(file_path)
+        except OSError:
+            pass
+
+
+def count_written(file_path):
+    """把写出的文件大小计入当前任务"""
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        try:
+            trace.bytes_written += os.path.getsize(file_path)
+        except OSError:
+            pass
+
+
+def start_trace(job):
+    """开始记录当前线程上的任务，关闭时返回None"""
+    if not ENABLED:
+        return None
+    trace = Trace(job)
+    _local.trace = trace
+    return trace
+
+
+def finish_trace(trace, status):
+    """结束记录并写入日志，返回记录字典；trace 为None时返回None"""
+    if trace is None:
+        return None
+    if getattr(_local, 'trace', None) is trace:
+        _local.trace = None
+    record = trace.record(status)
+    try:
+        write_log(record)
+    except OSError:
+        # 日志写不进去不影响任务本身
+        pass
+    return record
+
+
+def log_path():
+    directory = os.path.join(app_data_dir(), 'logs')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, LOG_NAME)
+
+
+def write_log(record):
+    path = log_path()
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with _log_lock:
+        if os.path.exists(path) and os.path.getsize(path) + len(line) > LOG_MAX_BYTES:
+            _rotate(path)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def _rotate(path):
+    # jobs.jsonl -> jobs.jsonl.1 -> jobs.jsonl.2 ...，最旧的丢弃
+    for index in range(LOG_BACKUPS, 0, -1):
+        source = path if index == 1 else f"{path}.{index - 1}"
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{index}")
+
+
+def summary_text(record):
+    """状态栏显示的一行摘要，耗时最长的阶段排在前面"""
+    stages = sorted(record['stages'].items(), key=lambda item: item[1]['seconds'], reverse=True)
+    text = f"{record['job']} {record['status']} 用时 {record['seconds']:.2f}秒"
+    if stages:
+        text += " | " + ", ".join(f"{name} {totals['seconds']:.2f}秒" for name, totals in stages[:4])
+    text += f" | 读 {record['bytes_read'] / 1024 / 1024:.1f}MB 写 {record['bytes_written'] / 1024 / 1024:.1f}MB"
+    if record.get('peak_memory_mb') is not None:
+        text += f" | 内存峰值增加 {record['peak_memory_mb']:.0f}MB"
+    return text
+
+
+class MemorySampler:
+    """记录一个任务期间常驻内存比开始时增加的峰值。
+    开始和结束时各读一次系统记录的进程峰值(ru_maxrss / PeakWorkingSetSize)：结束时更高，说明期间创下新高，
+    这个新峰值就是期间的最大值，不会漏掉两次采样之间的尖峰；没有创新高时取共享采样线程读到的最大值。
+    同一进程里同时运行的任务会计入彼此的内存"""
+
+    def __init__(self):
+        self.baseline = None
+        self.peak = None
+        self._peak_at_start = None
+        self._running = False
+
+    def start(self):
+        self.baseline = self.peak = current_rss_mb()
+        if self.baseline is None:
+            return
+        self._peak_at_start = peak_rss_mb()
+        self._running = True
+        _monitor.add(self)
+
+    def sample(self, rss=None):
+        if rss is None:
+            rss = current_rss_mb()
+        if rss is not None and rss > self.peak:
+            self.peak = rss
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        _monitor.remove(self)
+        self.sample()
+        peak = peak_rss_mb()
+        if peak is not None and self._peak_at_start is not None and peak > self._peak_at_start:
+            self.peak = max(self.peak, peak)
+
+    def growth_mb(self):
+        """期间峰值减去开始时的值(MB)，无法读取内存时返回None"""
+        if self.baseline is None:
+            return None
+        return round(self.peak - self.baseline, 1)
+
+
+class _MemoryMonitor:
+    """进程内所有正在记录的任务共用一个采样线程，没有任务时线程退出"""
+
+    def __init__(self):
+        self.samplers = set()
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._thread = None
+
+    def add(self, sampler):
+        with self._lock:
+            self.samplers.add(sampler)
+            self._idle.clear()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+                self._thread.start()
+
+    def remove(self, sampler):
+        with self._lock:
+            self.samplers.discard(sampler)
+            if not self.samplers:
+                # 最后一个任务结束，采样线程不必等到下一次采样才退出
+                self._idle.set()
+
+    def _run(self):
+        while True:
+            self._idle.wait(MEMORY_SAMPLE_INTERVAL)
+            with self._lock:
+                if not self.samplers:
+                    self._thread = None
+                    return
+                samplers = list(self.samplers)
+            rss = current_rss_mb()
+            for sampler in samplers:
+                sampler.sample(rss)
+
+
+_monitor = _MemoryMonitor()
+# [上次枚举的时间, 子进程列表]
+_children = [0.0, []]
+
+
+def current_rss_mb():
+    """本进程当前的常驻内存(MB)；装了 psutil 时包括子进程(并行解析的工作进程)，无法获取时返回None"""
+    if PSUTIL_AVAILABLE:
+        process = psutil.Process()
+        try:
+            now = time.monotonic()
+            if now - _children[0] >= CHILDREN_REFRESH_SECONDS:
+                _children[:] = [now, process.children(recursive=True)]
+            rss = process.memory_info().rss
+        except psutil.Error:
+            return None
+        for child in _children[1]:
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss / 1024 / 1024
+    if WIN32_MEMORY_AVAILABLE:
+        counters = _process_memory_counters()
+        return counters.WorkingSetSize / 1024 / 1024 if counters else None
+    # Linux 没有 psutil 时读 /proc，第二项是常驻内存页数
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    """系统记录的本进程常驻内存峰值(MB)，不含子进程；无法获取时返回None"""
+    if WIN32_MEMORY_AVAILABLE:
+        counters = _process_memory_counters()
+        return counters.PeakWorkingSetSize / 1024 / 1024 if counters else None
+    if RESOURCE_AVAILABLE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 上单位是字节，其他系统是KB
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    return None
+
+
+def _process_memory_counters():
+    counters = _ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not _kernel32.K32GetProcessMemoryInfo(_kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters
@@ -0,0 +1,434 @@
+# job_queue.py
+# 持久任务队列：合并、拆分任务先写入 SQLite，再由调度器按优先级在子进程中执行，不依赖PyQt5。
+# 程序关闭时正在运行的任务重新排队，重启后接着执行；程序崩溃时这些任务不再有心跳，STALE_SECONDS 后重新排队。
+# 每个任务的耗时和各阶段用时(见 instrumentation)保存在队列里，可随时查看历史。
+
+from app_paths import app_data_dir
+from instrumentation import start_trace, finish_trace
+from output_file import partial_outputs
+from multiprocessing import connection
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+
+# 运行中的任务每隔 HEARTBEAT_SECONDS 更新一次心跳，超过 STALE_SECONDS 没有心跳视为已中断
+HEARTBEAT_SECONDS = 5
+STALE_SECONDS = 15
+# 被中断(程序关闭、崩溃)达到这么多次的任务不再重新排队，记为失败，避免一直拖垮程序的任务无限重试
+MAX_ATTEMPTS = 3
+
+
+def default_workers():
+    """同时运行的任务数，FINANCETOOL_QUEUE_WORKERS 未设置时为CPU核数"""
+    value = os.environ.get('FINANCETOOL_QUEUE_WORKERS')
+    return max(int(value), 1) if value else os.cpu_count() or 1
+
+
+class JobQueue:
+    """任务表：operation 为 OPERATIONS 中的名称，params 为JSON；优先级高的先执行，同优先级按提交顺序"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(app_data_dir(), 'job_queue.sqlite3')
+        # 自己控制事务，领取任务时用 BEGIN IMMEDIATE，多个进程同时领取也不会重复
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, operation TEXT, title TEXT, params TEXT, "
+            "priority INTEGER DEFAULT 0, status TEXT, attempts INTEGER DEFAULT 0, "
+            "created REAL, started REAL, finished REAL, heartbeat REAL, "
+            "seconds REAL, result TEXT, error TEXT, trace TEXT, pid INTEGER)"
+        )
+        # 旧版本建的表没有 pid 列(执行任务的子进程号，用于清理被中断任务的临时输出)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")]
+        if 'pid' not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN pid INTEGER")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority, id)")
+
+    def close(self):
+        self.conn.close()
+
+    def submit(self, operation, params, title=None, priority=0):
+        """加入队列，返回任务编号"""
+        if operation not in OPERATIONS:
+            raise ValueError(f"不支持的任务: {operation}")
+        cursor = self.conn.execute(
+            "INSERT INTO jobs (operation, title, params, priority, status, created) VALUES (?, ?, ?, ?, 'queued', ?)",
+            (operation, title or operation, json.dumps(params, ensure_ascii=False), priority, time.time())
+        )
+        return cursor.lastrowid
+
+    def claim_next(self):
+        """把优先级最高的排队任务标记为运行中并返回，没有时返回None"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT id, operation, params FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, id LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'running', started = ?, heartbeat = ?, attempts = attempts + 1, "
+                    "pid = NULL WHERE id = ?",
+                    (now, now, row[0])
+                )
+        finally:
+            self.conn.execute("COMMIT")
+        if row is None:
+            return None
+        return {'id': row[0], 'operation': row[1], 'params': json.loads(row[2])}
+
+    def set_pid(self, job_id, pid):
+        self.conn.execute("UPDATE jobs SET pid = ? WHERE id = ?", (pid, job_id))
+
+    def heartbeat(self, job_ids):
+        now = time.time()
+        self.conn.executemany("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'",
+                              [(now, job_id) for job_id in job_ids])
+
+    def requeue(self, job_ids):
+        """被中断的运行中任务重新排队；已中断 MAX_ATTEMPTS 次的记为失败"""
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE jobs SET "
+            "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "finished = CASE WHEN attempts >= ? THEN ? END, "
+            "seconds = CASE WHEN attempts >= ? THEN ? - started END, "
+            "error = CASE WHEN attempts >= ? THEN '任务多次被中断，不再重试' END "
+            "WHERE id = ? AND status = 'running'",
+            [(MAX_ATTEMPTS, MAX_ATTEMPTS, now, MAX_ATTEMPTS, now, MAX_ATTEMPTS, job_id) for job_id in job_ids]
+        )
+
+    def release(self, job_ids):
+        """调度器正常停止时交还运行中的任务，不计入中断次数"""
+        self.conn.executemany(
+            "UPDATE jobs SET status = 'queued', attempts = attempts - 1 WHERE id = ? AND status = 'running'",
+            [(job_id,) for job_id in job_ids]
+        )
+
+    def requeue_stale(self, stale_seconds=STALE_SECONDS):
+        """心跳超时的运行中任务(程序崩溃或被强行结束)按 requeue 处理，返回这些任务(用于清理临时输出)"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute(
+                "SELECT id, operation, params, pid FROM jobs WHERE status = 'running' AND heartbeat < ?",
+                (time.time() - stale_seconds,)
+            ).fetchall()
+            self.requeue([row[0] for row in rows])
+        finally:
+            self.conn.execute("COMMIT")
+        return [{'id': job_id, 'operation': operation, 'params': json.loads(params), 'pid': pid}
+                for job_id, operation, params, pid in rows]
+
+    def finish(self, job_id, status, result=None, error=None, record=None):
+        """记录任务结果；record 为 instrumentation 的计时记录，关闭记录时按起止时间计算耗时"""
+        now = time.time()
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, finished = ?, seconds = COALESCE(?, ? - started), "
+            "result = ?, error = ?, trace = ? WHERE id = ?",
+            (status, now, record['seconds'] if record else None, now,
+             json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+             error, json.dumps(record, ensure_ascii=False) if record else None, job_id)
+        )
+
+    def cancel(self, job_id):
+        """取消还在排队的任务；已在运行的任务无法中途停止，返回是否取消成功"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+        return cursor.rowcount > 0
+
+    def retry(self, job_id):
+        """失败或已取消的任务重新排队，中断次数从头计算"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, started = NULL, finished = NULL, seconds = NULL, "
+            "result = NULL, error = NULL, trace = NULL WHERE id = ? AND status IN ('failed', 'cancelled')",
+            (job_id,)
+        )
+        return cursor.rowcount > 0
+
+    def set_priority(self, job_id, priority):
+        self.conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+
+    def remove_finished(self):
+        """删除已结束(成功、失败、取消)的任务记录，返回数量"""
+        cursor = self.conn.execute("DELETE FROM jobs WHERE status IN ('ok', 'failed', 'cancelled')")
+        return cursor.rowcount
+
+    def pending_count(self):
+        """排队中和运行中的任务数"""
+        return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def jobs(self, limit=200):
+        """未结束的任务(按执行顺序)在前，之后是最近结束的任务"""
+        rows = self.conn.execute(
+            "SELECT id, operation, title, params, priority, status, attempts, created, started, finished, "
+            "seconds, result, error, trace FROM jobs "
+            "ORDER BY CASE status WHEN 'running' THEN 0 WHEN 'queued' THEN 1 ELSE 2 END, "
+            "CASE status WHEN 'queued' THEN -priority ELSE 0 END, COALESCE(finished, 0) DESC, id LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [_job(row) for row in rows]
+
+    def history(self, operation=None, limit=100):
+        """已结束任务的耗时历史，最近的在前"""
+        query = ("SELECT id, operation, title, params, priority, status, attempts, created, started, finished, "
+                 "seconds, result, error, trace FROM jobs WHERE status IN ('ok', 'failed')")
+        args = ()
+        if operation:
+            query += " AND operation = ?"
+            args = (operation,)
+        rows = self.conn.execute(query + " ORDER BY finished DESC LIMIT ?", args + (limit,)).fetchall()
+        return [_job(row) for row in rows]
+
+
+def _job(row):
+    (job_id, operation, title, params, priority, status, attempts, created, started, finished,
+     seconds, result, error, trace) = row
+    return {
+        'id': job_id,
+        'operation': operation,
+        'title': title,
+        'params': json.loads(params),
+        'priority': priority,
+        'status': status,
+        'attempts': attempts,
+        'created': created,
+        'started': started,
+        'finished': finished,
+        'seconds': seconds,
+        'result': json.loads(result) if result else None,
+        'error': error,
+        'trace': json.loads(trace) if trace else None,
+    }
+
+
+class JobScheduler:
+    """在后台线程里从队列领取任务，每个任务在单独的子进程中执行，最多同时运行 workers 个任务。
+    on_change(job_id, status, record) 在调度线程中调用，界面需自行转到主线程"""
+
+    def __init__(self, db_path=None, workers=None, poll_interval=1.0, on_change=None):
+        self.db_path = db_path
+        self.workers = workers or default_workers()
+        self.poll_interval = poll_interval
+        self.on_change = on_change
+        self.completed = 0
+        # 任务编号 -> (任务, 子进程, 接收结果的管道)
+        self.running = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='job-scheduler', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """有新任务或设置变化时立即检查队列"""
+        self._wake.set()
+
+    def set_workers(self, workers):
+        """调整同时运行的任务数；减少时正在运行的任务照常完成，之后不再补足"""
+        self.workers = max(int(workers), 1)
+        self.wake()
+
+    def stop(self):
+        """停止调度并结束正在运行的任务进程，这些任务重新排队，下次启动后重新执行"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+
+    def run(self, once=False):
+        """调度循环；once 为真时队列清空就返回，返回本次执行完的任务数"""
+        queue = JobQueue(self.db_path)
+        last_heartbeat = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                for job in queue.requeue_stale():
+                    remove_partial_outputs(job['operation'], job['params'], job['pid'])
+                self._start_ready(queue)
+                if once and not self.running and not queue.pending_count():
+                    break
+                if self.running:
+                    if time.monotonic() - last_heartbeat >= HEARTBEAT_SECONDS:
+                        queue.heartbeat(list(self.running))
+                        last_heartbeat = time.monotonic()
+                    # 任一任务送回结果或进程退出时返回
+                    handles = [handle for _, process, receiver in self.running.values()
+                               for handle in (receiver, process.sentinel)]
+                    connection.wait(handles, timeout=self.poll_interval)
+                    self._collect(queue)
+                else:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+        finally:
+            self._terminate(queue)
+            queue.close()
+        return self.completed
+
+    def _start_ready(self, queue):
+        # 每个任务一个新建的子进程(Windows 本来如此)：调度器运行在多线程的界面进程里，
+        # 不复制其他线程持有的 sqlite 锁等状态；停止时可以直接结束该进程
+        context = multiprocessing.get_context('spawn')
+        while len(self.running) < self.workers and not self._stop.is_set():
+            job = queue.claim_next()
+            if job is None:
+                return
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_job_process, args=(sender, job['operation'], job['params']),
+                                      name=f"job-{job['id']}")
+            try:
+                process.start()
+            except Exception as e:
+                # 子进程无法启动，任务记为失败，调度继续
+                receiver.close()
+                queue.finish(job['id'], 'failed', error=str(e) or type(e).__name__)
+                self._changed(job['id'], 'failed', None)
+                continue
+            finally:
+                sender.close()
+            queue.set_pid(job['id'], process.pid)
+            self.running[job['id']] = (job, process, receiver)
+            self._changed(job['id'], 'running', None)
+
+    def _collect(self, queue):
+        for job_id, (job, process, receiver) in list(self.running.items()):
+            outcome = None
+            if receiver.poll():
+                try:
+                    outcome = receiver.recv()
+                except EOFError:
+                    # 管道另一端已关闭：子进程没送回结果就退出了
+                    pass
+            elif process.is_alive():
+                continue
+            del self.running[job_id]
+            receiver.close()
+            process.join()
+            if outcome is None:
+                # 子进程异常退出(崩溃、内存不足被结束、os._exit 等)
+                result, error, record = None, f"任务进程异常退出，退出码 {process.exitcode}", None
+                remove_partial_outputs(job['operation'], job['params'], process.pid)
+            else:
+                result, error, record = outcome
+            status = 'failed' if error else 'ok'
+            queue.finish(job_id, status, result, error, record)
+            self.completed += 1
+            self._changed(job_id, status, record)
+
+    def _changed(self, job_id, status, record):
+        if self.on_change:
+            self.on_change(job_id, status, record)
+
+    def _terminate(self, queue):
+        if not self.running:
+            return
+        for job, process, receiver in self.running.values():
+            process.terminate()
+        for job, process, receiver in self.running.values():
+            process.join()
+            receiver.close()
+            remove_partial_outputs(job['operation'], job['params'], process.pid)
+        # 被中断的任务立即重新排队，下次启动时不必等心跳超时
+        queue.release(list(self.running))
+        self.running.clear()
+
+
+def remove_partial_outputs(operation, params, pid):
+    """删除执行任务的子进程 pid 被中断时留下的临时输出(见 output_file)，
+    目标文件本身和其他任务写同一目标的临时文件不动；pid 未知时不删除"""
+    if pid is None:
+        return
+    if operation == 'split':
+        file_name = os.path.splitext(os.path.basename(params['file']))[0]
+        output = os.path.join(os.path.dirname(params['file']), f"{file_name}-{params['parts']}a5.pdf")
+    else:
+        output = params['output']
+    for temp_path in partial_outputs(output, pid):
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def _job_process(sender, operation, params):
+    # 子进程入口，结果经管道送回调度器
+    try:
+        sender.send(run_job(operation, params))
+    finally:
+        sender.close()
+
+
+def run_job(operation, params):
+    """执行一个任务，返回 (结果, 错误, 计时记录)；输出先写临时文件，失败时目标文件不受影响"""
+    trace = start_trace(operation)
+    result, error = None, None
+    try:
+        result = OPERATIONS[operation](params)
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    record = finish_trace(trace, 'failed' if error else 'ok')
+    return result, error, record
+
+
+def _pdf_merge(params):
+    from pdf_manager import PdfManager
+    pdf_manager = PdfManager()
+    pdf_manager.merge_pdfs(params['files'], params['output'], params.get('streaming', False),
+                           dedupe=params.get('dedupe', True), page_ranges=params.get('page_ranges'),
+                           profile=params.get('profile', 'fast'))
+    return {
+        'output': params['output'],
+        'output_bytes': os.path.getsize(params['output']),
+        'saved_objects': pdf_manager.saved_objects,
+        'saved_bytes': pdf_manager.saved_bytes,
+    }
+
+
+def _excel_merge(params):
+    # 多个任务已经各自在子进程里并行，单个任务内部按顺序解析，不再另开进程池
+    from excel_manager import ExcelManager
+    files, output = params['files'], params['output']
+    excel_manager = ExcelManager()
+    if params.get('dedupe'):
+        from row_index import RowIndex, parse_columns
+        row_index = RowIndex(parse_columns(params.get('key_columns') or ''), params['dedupe'])
+        excel_manager.merge_files_streaming(files, output, row_index=row_index)
+    elif params.get('incremental'):
+        excel_manager.merge_files_incremental(files, output)
+    elif params.get('columnar'):
+        excel_manager.merge_files_columnar(files, output, 1)
+    else:
+        excel_manager.merge_files(files, output, params.get('streaming', True))
+    return {
+        'output': output,
+        'output_bytes': os.path.getsize(output),
+        'rows': excel_manager.rows_merged,
+        'incremental': excel_manager.incremental_stats,
+        'duplicate_rows': excel_manager.duplicate_rows,
+        'duplicate_report': excel_manager.duplicate_report,
+    }
+
+
+def _split(params):
+    from a4_splitter import A4Splitter
+    summary = A4Splitter(params.get('profile', 'fast')).split_files([params['file']], params['parts'])
+    file_path, output_path, error, pages = summary['results'][0]
+    if error:
+        raise RuntimeError(error)
+    return {'input': file_path, 'output': output_path, 'pages': pages}
+
+
+# 任务名称 -> 在子进程中执行的函数，参数和返回值都必须能写成JSON
+OPERATIONS = {
+    'pdf-merge': _pdf_merge,
+    'excel-merge': _excel_merge,
+    'split': _split,
+}
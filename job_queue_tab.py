@@ -0,0 +1,155 @@
+# job_queue_tab.py
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QAbstractItemView,
+    QTableWidget, QTableWidgetItem, QHeaderView, QSpinBox, QLabel, QMessageBox
+)
+from job_queue import JobQueue
+from job_worker import queue_signals, shared_scheduler
+from instrumentation import summary_text
+from datetime import datetime
+import os
+
+STATUS_TEXT = {
+    'queued': "排队中",
+    'running': "运行中",
+    'ok': "完成",
+    'failed': "失败",
+    'cancelled': "已取消",
+}
+COLUMNS = ("编号", "任务", "优先级", "状态", "次数", "提交时间", "用时", "结果")
+
+
+class JobQueueTab(QWidget):
+    """查看持久队列中的任务，调整优先级和同时运行的任务数；任务由各页的"加入任务队列"提交"""
+
+    def __init__(self):
+        super().__init__()
+        self.queue = JobQueue()
+        self.init_ui()
+        queue_signals().changed.connect(self.refresh)
+        self.refresh()
+
+    def init_ui(self):
+        layout = QHBoxLayout()
+
+        left_layout = QVBoxLayout()
+        right_layout = QVBoxLayout()
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(len(COLUMNS) - 1, QHeaderView.Stretch)
+        left_layout.addWidget(self.table)
+
+        self.status_label = QLabel()
+        left_layout.addWidget(self.status_label)
+
+        right_layout.addWidget(QLabel("同时运行的任务数"))
+        # 默认CPU核数，可用 FINANCETOOL_QUEUE_WORKERS 修改
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(os.cpu_count() or 1, 1) * 2)
+        self.workers_spin.setValue(shared_scheduler().workers)
+        self.workers_spin.valueChanged.connect(lambda value: shared_scheduler().set_workers(value))
+        right_layout.addWidget(self.workers_spin)
+
+        self.raise_button = QPushButton("提高优先级")
+        self.raise_button.clicked.connect(lambda: self.change_priority(1))
+        right_layout.addWidget(self.raise_button)
+
+        self.lower_button = QPushButton("降低优先级")
+        self.lower_button.clicked.connect(lambda: self.change_priority(-1))
+        right_layout.addWidget(self.lower_button)
+
+        self.cancel_button = QPushButton("取消排队")
+        self.cancel_button.clicked.connect(self.cancel_jobs)
+        right_layout.addWidget(self.cancel_button)
+
+        self.retry_button = QPushButton("重新执行")
+        self.retry_button.clicked.connect(self.retry_jobs)
+        right_layout.addWidget(self.retry_button)
+
+        self.remove_button = QPushButton("清除已结束")
+        self.remove_button.clicked.connect(self.remove_finished)
+        right_layout.addWidget(self.remove_button)
+
+        self.refresh_button = QPushButton("刷新")
+        self.refresh_button.clicked.connect(self.refresh)
+        right_layout.addWidget(self.refresh_button)
+        right_layout.addStretch()
+
+        layout.addLayout(left_layout, 80)
+        layout.addLayout(right_layout, 20)
+        self.setLayout(layout)
+
+    def refresh(self):
+        """按队列内容重建表格，保留选中的任务"""
+        selected = set(self.selected_jobs())
+        jobs = self.queue.jobs()
+        self.jobs = {job['id']: job for job in jobs}
+        self.table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            values = (
+                str(job['id']),
+                job['title'],
+                str(job['priority']),
+                STATUS_TEXT.get(job['status'], job['status']),
+                str(job['attempts']),
+                datetime.fromtimestamp(job['created']).strftime('%m-%d %H:%M:%S'),
+                f"{job['seconds']:.1f}秒" if job['seconds'] is not None else "",
+                job_result_text(job),
+            )
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if job['trace']:
+                    item.setToolTip(summary_text(job['trace']))
+                self.table.setItem(row, column, item)
+            if job['id'] in selected:
+                self.table.selectRow(row)
+        counts = {status: 0 for status in STATUS_TEXT}
+        for job in jobs:
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        self.status_label.setText(f"运行中 {counts['running']} 个, 排队 {counts['queued']} 个, "
+                                  f"完成 {counts['ok']} 个, 失败 {counts['failed']} 个")
+
+    def selected_jobs(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        return [int(self.table.item(row, 0).text()) for row in rows if self.table.item(row, 0)]
+
+    def change_priority(self, delta):
+        for job_id in self.selected_jobs():
+            self.queue.set_priority(job_id, self.jobs[job_id]['priority'] + delta)
+        self.refresh()
+
+    def cancel_jobs(self):
+        job_ids = self.selected_jobs()
+        cancelled = [job_id for job_id in job_ids if self.queue.cancel(job_id)]
+        self.refresh()
+        if len(cancelled) < len(job_ids):
+            QMessageBox.information(self, "提示", "只能取消排队中的任务，运行中的任务会继续完成")
+
+    def retry_jobs(self):
+        if any([self.queue.retry(job_id) for job_id in self.selected_jobs()]):
+            shared_scheduler().wake()
+        self.refresh()
+
+    def remove_finished(self):
+        self.queue.remove_finished()
+        self.refresh()
+
+
+def job_result_text(job):
+    """结果列：失败显示原因，成功显示输出文件和主要数字"""
+    if job['error']:
+        return job['error'].replace('\n', ' ')
+    result = job['result']
+    if not result:
+        return ""
+    text = result.get('output') or ""
+    if result.get('rows'):
+        text += f" ({result['rows']} 行)"
+    elif result.get('pages'):
+        text += f" ({result['pages']} 页)"
+    return text
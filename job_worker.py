@@ -0,0 +1,188 @@
+# job_worker.py
+
+from PyQt5.QtWidgets import QApplication, QWidget, QHBoxLayout, QPushButton, QProgressBar, QLabel
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from instrumentation import start_trace, finish_trace
+from job_queue import JobQueue, JobScheduler
+import os
+import threading
+
+
+class JobCancelled(BaseException):
+    """任务被取消。继承BaseException，业务代码里的 except Exception 不会把它吞掉"""
+
+
+class JobSignals(QObject):
+    file_progress = pyqtSignal(int, int, str)  # 当前文件序号, 文件总数, 文件路径
+    page_progress = pyqtSignal(int, int)  # 当前页(行)序号, 总页(行)数
+    finished = pyqtSignal(object)  # 任务返回值
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    done = pyqtSignal()  # 无论成功失败都会发出
+    traced = pyqtSignal(object)  # 任务的计时记录(见 instrumentation)，关闭记录时不发出
+
+
+class Job(QRunnable):
+    """在线程池中执行 func(*args, on_file=..., on_page=..., **kwargs)"""
+
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        self.func = func
+        self.name = getattr(func, '__name__', 'job')
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self._cancel_event = threading.Event()
+        # 由 JobPanel 持有引用，避免被Qt提前删除
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report_file(self, index, total, file_path):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self.signals.file_progress.emit(index, total, file_path)
+
+    def report_page(self, index, total):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self.signals.page_progress.emit(index, total)
+
+    def run(self):
+        trace = start_trace(self.name)
+        status = 'failed'
+        try:
+            result = self.func(*self.args, on_file=self.report_file, on_page=self.report_page, **self.kwargs)
+        except JobCancelled:
+            status = 'cancelled'
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            status = 'ok'
+            self.signals.finished.emit(result)
+        finally:
+            record = finish_trace(trace, status)
+            if record:
+                self.signals.traced.emit(record)
+            self.signals.done.emit()
+
+
+class JobPanel(QWidget):
+    """显示后台任务进度并提供取消按钮，可以同时运行多个任务"""
+
+    traced = pyqtSignal(object)  # 转发各任务的计时记录
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.jobs = []
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.status_label = QLabel("空闲")
+        layout.addWidget(self.status_label, 1)
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar, 1)
+        self.cancel_button = QPushButton("取消任务")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_all)
+        layout.addWidget(self.cancel_button)
+        self.setLayout(layout)
+
+    def start(self, job):
+        self.jobs.append(job)
+        job.signals.file_progress.connect(self.on_file_progress)
+        job.signals.page_progress.connect(self.on_page_progress)
+        job.signals.done.connect(lambda: self.on_job_done(job))
+        job.signals.traced.connect(self.traced)
+        self.cancel_button.setEnabled(True)
+        self.update_status()
+        QThreadPool.globalInstance().start(job)
+
+    def cancel_all(self):
+        for job in self.jobs:
+            job.cancel()
+        self.status_label.setText("正在取消...")
+
+    def on_file_progress(self, index, total, file_path):
+        self.status_label.setText(f"[{len(self.jobs)}个任务] 文件 {index + 1}/{total}: {os.path.basename(file_path)}")
+
+    def on_page_progress(self, index, total):
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(index + 1)
+
+    def on_job_done(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+        self.update_status()
+
+    def update_status(self):
+        if self.jobs:
+            self.status_label.setText(f"[{len(self.jobs)}个任务] 运行中")
+        else:
+            self.status_label.setText("空闲")
+            self.progress_bar.reset()
+            self.cancel_button.setEnabled(False)
+
+
+class QueueSignals(QObject):
+    changed = pyqtSignal(int, str)  # 任务编号, 新状态
+    traced = pyqtSignal(object)  # 队列任务的计时记录
+
+
+_queue_signals = None
+_scheduler = None
+
+
+def queue_signals():
+    """队列任务状态变化的信号，在主线程中创建，调度线程发出的信号会排队转到主线程"""
+    global _queue_signals
+    if _queue_signals is None:
+        _queue_signals = QueueSignals()
+    return _queue_signals
+
+
+def shared_scheduler():
+    """整个程序共用一个调度器，第一次使用时启动，退出程序时停止"""
+    global _scheduler
+    if _scheduler is None:
+        signals = queue_signals()
+
+        def on_change(job_id, status, record):
+            signals.changed.emit(job_id, status)
+            if record:
+                signals.traced.emit(record)
+
+        _scheduler = JobScheduler(on_change=on_change)
+        QApplication.instance().aboutToQuit.connect(_scheduler.stop)
+    _scheduler.start()
+    return _scheduler
+
+
+def enqueue(operation, params, title):
+    """把任务写入持久队列并通知调度器，返回任务编号"""
+    scheduler = shared_scheduler()
+    queue = JobQueue()
+    try:
+        job_id = queue.submit(operation, params, title)
+    finally:
+        queue.close()
+    scheduler.wake()
+    queue_signals().changed.emit(job_id, 'queued')
+    return job_id
+
+
+def resume_queue():
+    """启动时队列里还有未完成的任务(上次关闭时排队或运行中)就启动调度器，返回任务数"""
+    queue = JobQueue()
+    try:
+        pending = queue.pending_count()
+    finally:
+        queue.close()
+    if pending:
+        shared_scheduler()
+    return pending
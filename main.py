@@ -1,14 +1,27 @@
 # main.py
 
-from PyQt5.QtWidgets import QApplication, QMainWindow
-from pdf_merge_tab import PdfMergeTab
-from excel_merge_tab import ExcelMergeTab
-from a4_split_tab import A4SplitTab
+import time
+
+# 启动计时从导入界面库之前开始
+STARTUP_START = time.perf_counter()
+
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout
 from PyQt5.QtWidgets import QTabWidget
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
+from instrumentation import start_trace, finish_trace, stage, summary_text
+import importlib
 import sys
+import multiprocessing
 from datetime import datetime
 
+# 标签页标题 -> (模块, 类)；切换到某页时才导入模块并创建界面
+TABS = (
+    ("PDF合并", 'pdf_merge_tab', 'PdfMergeTab'),
+    ("Excel合并", 'excel_merge_tab', 'ExcelMergeTab'),
+    ("A4 PDF拆分", 'a4_split_tab', 'A4SplitTab'),
+    ("任务队列", 'job_queue_tab', 'JobQueueTab'),
+)
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -16,16 +29,67 @@ class MainWindow(QMainWindow):
         self.setWindowTitle(f"多瑞财务工具 - {datetime.now().strftime('%Y-%m-%d')}")
         self.setGeometry(100, 100, 800, 600)
 
-        tab_widget = QTabWidget()
-        tab_widget.addTab(PdfMergeTab(), "PDF合并")
-        tab_widget.addTab(ExcelMergeTab(), "Excel合并")
-        tab_widget.addTab(A4SplitTab(), "A4 PDF拆分")
+        self.tab_widget = QTabWidget()
+        self.tabs = {}
+        for title, _, _ in TABS:
+            # 先放一个空白容器占位
+            container = QWidget()
+            container.setLayout(QVBoxLayout())
+            container.layout().setContentsMargins(0, 0, 0, 0)
+            self.tab_widget.addTab(container, title)
+        self.tab_widget.currentChanged.connect(self.ensure_tab)
+
+        self.setCentralWidget(self.tab_widget)
+        self.statusBar()
+
+    def ensure_tab(self, index):
+        """返回第 index 页的界面，第一次访问时才创建"""
+        if index in self.tabs:
+            return self.tabs[index]
+        _, module_name, class_name = TABS[index]
+        with stage('import', module_name):
+            module = importlib.import_module(module_name)
+        with stage('build', module_name):
+            tab = getattr(module, class_name)()
+            # 任务结束后在状态栏显示各阶段耗时(任务队列页没有自己的任务面板)
+            if hasattr(tab, 'job_panel'):
+                tab.job_panel.traced.connect(self.show_trace)
+            self.tab_widget.widget(index).layout().addWidget(tab)
+        self.tabs[index] = tab
+        return tab
+
+    def show_trace(self, record):
+        self.statusBar().showMessage(summary_text(record))
+
 
-        self.setCentralWidget(tab_widget)
+def finish_startup(window, trace, measure_only):
+    """窗口显示后再创建当前页，启动耗时记入日志并显示在状态栏"""
+    window.ensure_tab(window.tab_widget.currentIndex())
+    # 上次关闭时队列里没做完的任务接着执行，队列任务的耗时同样显示在状态栏
+    with stage('queue'):
+        from job_worker import queue_signals, resume_queue
+        queue_signals().traced.connect(window.show_trace)
+        pending = resume_queue()
+    record = finish_trace(trace, 'ok')
+    seconds = time.perf_counter() - STARTUP_START
+    message = f"启动用时 {seconds:.2f}秒"
+    if pending:
+        message += f" | 任务队列中有 {pending} 个未完成的任务，继续执行"
+    window.statusBar().showMessage(message)
+    if measure_only:
+        # python main.py --measure-startup：输出启动耗时后退出，便于在各台电脑上比较
+        print(f"startup {seconds:.3f}s", record['stages'] if record else "")
+        QApplication.instance().quit()
 
 
 if __name__ == "__main__":
+    # 打包成exe后进程池需要此调用
+    multiprocessing.freeze_support()
+    measure_only = '--measure-startup' in sys.argv
+    trace = start_trace('startup')
     app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    with stage('window'):
+        window = MainWindow()
+        window.show()
+    QTimer.singleShot(0, lambda: finish_startup(window, trace, measure_only))
+    sys.exit(app.exec_())
@@ -0,0 +1,25 @@
+# mapped_file.py
+# 源文件以只读内存映射方式打开：解析器读到哪部分，系统才从磁盘载入哪部分，
+# 不会先把整个文件复制进进程内存；同一个大文件同时被多个任务或进程打开时共用系统页缓存。
+
+from contextlib import contextmanager
+import io
+import mmap
+
+
+@contextmanager
+def open_mapped(path):
+    """产出可 read/seek/tell 的只读映射，离开时解除映射(Windows 下映射未解除前文件无法移动或删除)。
+    空文件无法映射，产出空的 BytesIO"""
+    with open(path, 'rb') as f:
+        try:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            view = None
+    if view is None:
+        yield io.BytesIO()
+        return
+    try:
+        yield view
+    finally:
+        view.close()
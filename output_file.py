@@ -0,0 +1,37 @@
+# output_file.py
+# 输出先写到同目录的临时文件，全部写完才替换目标文件。
+# 失败或取消时只删除临时文件，用户选择覆盖的旧文件、上次增量合并的结果都保持原样。
+
+from contextlib import contextmanager
+import glob
+import itertools
+import os
+
+# 同一进程内每次取临时文件名时递增
+_sequence = itertools.count(1)
+
+
+def temp_output_path(output_path):
+    """与目标同目录、同扩展名的临时文件(openpyxl 等按扩展名判断格式)；
+    文件名含进程号和序号，多个任务同时写同一个目标时各用各的临时文件"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}.{os.getpid()}-{next(_sequence)}.tmp{ext}"
+
+
+def partial_outputs(output_path, pid):
+    """进程 pid 写 output_path 时留下的临时文件(被中断的任务由调度器按子进程号清理)"""
+    root, ext = os.path.splitext(output_path)
+    return glob.glob(f"{glob.escape(root)}.{pid}-*.tmp{glob.escape(ext)}")
+
+
+@contextmanager
+def replace_on_success(output_path):
+    """产出临时文件路径；正常结束时替换 output_path，出现异常(包括取消)时删除临时文件"""
+    temp_path = temp_output_path(output_path)
+    try:
+        yield temp_path
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, output_path)
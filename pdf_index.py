@@ -0,0 +1,186 @@
+# pdf_index.py
+
+from PyPDF2 import PdfReader
+from app_paths import app_data_dir
+from file_hash_cache import file_sha256, normalize_path
+from mapped_file import open_mapped
+import json
+import os
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+class PdfIndex:
+    """按 (路径, 大小, 修改时间) 持久缓存PDF的页数、加密状态、无法读取的原因、内容指纹(SHA-256)和各页尺寸。
+    页数等只读交叉引用表、文件尾和页面树根节点，不逐页解析，也不读取整个文件；
+    指纹和各页尺寸在第一次用到时才计算(见 media_boxes)，内容相同的文件(复制、只改了修改时间)共用已有的各页尺寸"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(app_data_dir(), 'pdf_index.sqlite3')
+        # 并行拆分的各进程会同时写入
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pdf_index ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, "
+            "page_count INTEGER, media_boxes TEXT, encrypted INTEGER, error TEXT)"
+        )
+        # 一度没有指纹和各页尺寸列的索引文件补上这两列
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(pdf_index)")}
+        for column in ('sha256', 'media_boxes'):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE pdf_index ADD COLUMN {column} TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pdf_index_sha256 ON pdf_index (sha256)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, path, stat):
+        row = self.conn.execute(
+            "SELECT page_count, encrypted, error FROM pdf_index "
+            "WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (normalize_path(path), stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        return _info(row) if row else None
+
+    def store(self, path, stat, info):
+        # 文件变化后整行替换，旧的指纹和各页尺寸一并作废
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pdf_index "
+            "(path, size, mtime_ns, page_count, encrypted, error) VALUES (?, ?, ?, ?, ?, ?)",
+            (normalize_path(path), stat.st_size, stat.st_mtime_ns, info['page_count'],
+             int(info['encrypted']), info['error'])
+        )
+        self.conn.commit()
+
+    def get(self, path):
+        """返回文件信息(见 scan_pdf)，只在文件变化后才重新读取"""
+        stat = os.stat(path)
+        info = self.lookup(path, stat)
+        if info is None:
+            info = scan_pdf(path)
+            self.store(path, stat, info)
+        return info
+
+    def _column(self, path, stat, column):
+        row = self.conn.execute(
+            f"SELECT {column} FROM pdf_index WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (normalize_path(path), stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _update(self, path, stat, **values):
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        self.conn.execute(
+            f"UPDATE pdf_index SET {assignments} WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (*values.values(), normalize_path(path), stat.st_size, stat.st_mtime_ns)
+        )
+        self.conn.commit()
+
+    def fingerprint(self, path):
+        """文件内容的SHA-256，第一次用到时读取整个文件计算，之后取自索引"""
+        self.get(path)
+        stat = os.stat(path)
+        sha256 = self._column(path, stat, 'sha256')
+        if sha256 is None:
+            sha256 = file_sha256(path)
+            self._update(path, stat, sha256=sha256)
+        return sha256
+
+    def media_boxes(self, path, reader=None):
+        """各页的 [x0, y0, x1, y1]，无法读取的文件返回None。
+        未记录时：调用方已打开该文件(reader)就直接从中读取，不再打开第二次；
+        否则先按内容指纹找同内容文件的记录，找不到再打开文件逐页读取"""
+        if self.get(path)['error']:
+            return None
+        stat = os.stat(path)
+        media_boxes = self._column(path, stat, 'media_boxes')
+        if media_boxes is not None:
+            return json.loads(media_boxes)
+        if reader is None:
+            row = self.conn.execute(
+                "SELECT media_boxes FROM pdf_index WHERE sha256 = ? AND media_boxes IS NOT NULL LIMIT 1",
+                (self.fingerprint(path),)
+            ).fetchone()
+            if row:
+                self._update(path, stat, media_boxes=row[0])
+                return json.loads(row[0])
+            with open_mapped(path) as f:
+                boxes = read_media_boxes(PdfReader(f))
+        else:
+            boxes = read_media_boxes(reader)
+        self._update(path, stat, media_boxes=json.dumps(boxes))
+        return boxes
+
+
+def _info(row):
+    page_count, encrypted, error = row
+    return {
+        'page_count': page_count,
+        'encrypted': bool(encrypted),
+        'error': error,
+    }
+
+
+def read_media_boxes(reader):
+    """逐页读取页面尺寸(包括从页面树继承的 /MediaBox)"""
+    return [[float(value) for value in page.mediabox] for page in reader.pages]
+
+
+def scan_pdf(path):
+    """读取交叉引用表和页面树根节点，返回页数(见 root_page_count)、是否加密；无法读取时 error 为原因"""
+    info = {'page_count': None, 'encrypted': False, 'error': None}
+    try:
+        with open_mapped(path) as f:
+            reader = PdfReader(f)
+            # 加密文件在读取时会先尝试空密码，仍打不开的读取页面树时会报错
+            info['encrypted'] = reader.is_encrypted
+            info['page_count'] = root_page_count(reader)
+    except Exception as e:
+        info['error'] = f"已加密，无法打开: {e}" if info['encrypted'] else str(e) or type(e).__name__
+    return info
+
+
+def root_page_count(reader):
+    """页数取页面树根节点的 /Count，不展开页面树(PyPDF2 的 len(reader.pages) 会解析每一页)；
+    /Count 缺失或不是非负整数时才按 len(reader.pages) 逐页统计"""
+    pages = reader.trailer["/Root"]["/Pages"].get_object()
+    count = pages.get("/Count")
+    if isinstance(count, int) and count >= 0:
+        return int(count)
+    return len(reader.pages)
+
+
+def _thread_index():
+    """当前线程共用一个索引连接(sqlite连接不能跨线程使用)"""
+    index = getattr(_local, 'index', None)
+    if index is None:
+        index = _local.index = PdfIndex()
+    return index
+
+
+def pdf_info(path):
+    """读取文件信息(见 PdfIndex.get)"""
+    return _thread_index().get(path)
+
+
+def pdf_media_boxes(path, reader=None):
+    """读取各页尺寸(见 PdfIndex.media_boxes)"""
+    return _thread_index().media_boxes(path, reader)
+
+
+def invalid_pdfs(paths, on_file=None):
+    """返回 {路径: 原因}，包含不存在或无法解析的文件，用于在长任务开始前拒绝"""
+    invalid = {}
+    for index, path in enumerate(paths):
+        if on_file:
+            on_file(index, len(paths), path)
+        try:
+            error = pdf_info(path)['error']
+        except OSError as e:
+            error = f"无法读取: {e.strerror or e}"
+        if error:
+            invalid[path] = error
+    return invalid
@@ -0,0 +1,144 @@
+# pdf_manager.py
+
+from PyPDF2 import PdfReader, PdfWriter
+from pdf_stream_writer import PdfStreamWriter, OUTPUT_PROFILES
+from instrumentation import stage, count_read, count_written
+from pdf_index import invalid_pdfs, pdf_info, root_page_count
+from mapped_file import open_mapped
+from output_file import replace_on_success
+from contextlib import ExitStack
+import re
+
+
+class PdfManager:
+    def __init__(self):
+        self.pdf_files = []
+        # 最近一次去重合并节省的对象数和字节数
+        self.saved_objects = 0
+        self.saved_bytes = 0
+
+    def add_pdf(self, file_path):
+        if file_path.endswith('.pdf'):
+            self.pdf_files.append(file_path)
+
+    def merge_pdfs(self, pdf_files, output_path, streaming=False, chunk_size=50, dedupe=False,
+                   page_ranges=None, profile='fast', on_file=None, on_page=None):
+        """page_ranges 为 {文件: 页码范围}(见 parse_page_ranges)，未列出的文件合并全部页；
+        profile 为输出配置(见 pdf_stream_writer.OUTPUT_PROFILES)"""
+        check_pdfs(pdf_files, on_file)
+        page_numbers = select_page_ranges(pdf_files, page_ranges) if page_ranges else None
+        # 去重、按页码选取和输出压缩都在逐对象写出的过程中完成，因此总是走流式合并
+        if streaming or dedupe or page_numbers or profile != 'fast':
+            return self.merge_pdfs_streaming(pdf_files, output_path, chunk_size, dedupe, on_file, on_page,
+                                             page_numbers, profile)
+        pdf_writer = PdfWriter()
+        # 写出时才读取页面内容，所有源文件的映射要保持到写完
+        with ExitStack() as sources:
+            for index, file_path in enumerate(pdf_files):
+                if on_file:
+                    on_file(index, len(pdf_files), file_path)
+                with stage('open', file_path):
+                    pdf_reader = PdfReader(sources.enter_context(open_mapped(file_path)))
+                count_read(file_path)
+                with stage('copy', file_path):
+                    for page in range(len(pdf_reader.pages)):
+                        if on_page:
+                            on_page(page, len(pdf_reader.pages))
+                        pdf_writer.add_page(pdf_reader.pages[page])
+            with stage('write'):
+                with replace_on_success(output_path) as temp_path, open(temp_path, 'wb') as out:
+                    pdf_writer.write(out)
+        count_written(output_path)
+        return True
+
+    def merge_pdfs_streaming(self, pdf_files, output_path, chunk_size=50, dedupe=False,
+                             on_file=None, on_page=None, page_numbers=None, profile='fast'):
+        """低内存合并：逐个打开源文件，页面写入输出后立即关闭释放；
+        page_numbers 为 {文件: 页码下标列表} 时这些文件只复制选中的页；
+        写到临时文件，全部写完才替换 output_path"""
+        with replace_on_success(output_path) as temp_path, open(temp_path, 'wb') as out:
+            stream_writer = PdfStreamWriter(out, chunk_size, dedupe, **OUTPUT_PROFILES[profile])
+            for index, file_path in enumerate(pdf_files):
+                if on_file:
+                    on_file(index, len(pdf_files), file_path)
+                # 从内存映射读取，不把整个源文件读入内存
+                with open_mapped(file_path) as f:
+                    with stage('open', file_path):
+                        pdf_reader = PdfReader(f)
+                    # 页面对象按需解析，解析时间计入 copy
+                    with stage('copy', file_path):
+                        stream_writer.add_reader(pdf_reader, on_page,
+                                                 page_numbers.get(file_path) if page_numbers else None)
+                count_read(file_path)
+            with stage('write'):
+                stream_writer.close()
+        count_written(output_path)
+        self.saved_objects = stream_writer.saved_objects
+        self.saved_bytes = stream_writer.saved_bytes
+        return True
+
+
+def check_pdfs(pdf_files, on_file=None):
+    """开始合并前按PDF索引检查所有文件，有无法读取的文件时直接报错，不写出半个输出文件"""
+    with stage('check'):
+        invalid = invalid_pdfs(pdf_files, on_file)
+    if invalid:
+        details = "\n".join(f"{path}: {error}" for path, error in invalid.items())
+        raise ValueError(f"以下文件无法读取:\n{details}")
+
+
+def parse_page_ranges(spec):
+    """把 "1-3,5,8-" 解析为 [(1, 3), (5, 5), (8, None)]，页码从1开始，"8-" 表示第8页到最后；
+    留空表示全部页，返回空列表"""
+    ranges = []
+    # 先去掉 "-"、"," 两侧的空白，"1 - 3" 与 "1-3" 相同，其余空白与逗号一样用作分隔
+    spec = re.sub(r'\s*([-~,，])\s*', r'\1', spec.strip())
+    for part in re.split(r'[,，\s]+', spec):
+        if not part:
+            continue
+        match = re.fullmatch(r'(\d+)(?:[-~](\d*))?', part)
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"无法识别的页码范围: {part}")
+        start = int(match.group(1))
+        if match.group(2) is None:
+            end = start
+        else:
+            end = int(match.group(2)) if match.group(2) else None
+        if end is not None and end < start:
+            raise ValueError(f"页码范围起止颠倒: {part}")
+        ranges.append((start, end))
+    return ranges
+
+
+def select_pages(ranges, page_count):
+    """按范围列出选中页的下标(从0开始，按范围给出的顺序)，超出页数的部分忽略"""
+    if not ranges:
+        return list(range(page_count))
+    pages = []
+    for start, end in ranges:
+        end = page_count if end is None else min(end, page_count)
+        pages.extend(range(start - 1, end))
+    return pages
+
+
+def select_page_ranges(pdf_files, page_ranges):
+    """返回 {文件: 页码下标列表}；页数取自PDF索引(未命中时只读页面树根节点的 /Count)。选不到任何页的文件直接报错"""
+    page_numbers = {}
+    empty = []
+    for file_path in pdf_files:
+        spec = page_ranges.get(file_path)
+        if not spec:
+            continue
+        page_count = pdf_info(file_path)['page_count']
+        page_numbers[file_path] = select_pages(parse_page_ranges(spec), page_count)
+        if not page_numbers[file_path]:
+            empty.append(f"{file_path}: 共 {page_count} 页，没有 {spec} 范围内的页")
+    if empty:
+        raise ValueError("以下文件按页码范围选不到任何页:\n" + "\n".join(empty))
+    return page_numbers
+
+
+def pdf_page_count(file_path):
+    """页数取页面树根节点的 /Count(见 pdf_index.root_page_count)，不展开页面树"""
+    with open_mapped(file_path) as f:
+        return root_page_count(PdfReader(f))
@@ -1,66 +1,15 @@
 # pdf_merge_tab.py
 
-from PyQt5.QtWidgets import QWidget, QListWidget, QPushButton, QVBoxLayout, QHBoxLayout, QFileDialog, QMessageBox, QListWidgetItem
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QDragEnterEvent
-from PyPDF2 import PdfReader, PdfWriter
+from PyQt5.QtWidgets import QWidget, QAbstractItemView, QPushButton, QVBoxLayout, QHBoxLayout, QFileDialog, QMessageBox, QCheckBox, QInputDialog, QComboBox
+from file_list import FileListWidget, count_pdf_pages
+from job_worker import Job, JobPanel, enqueue
+from file_hash_cache import content_keys, duplicate_rows
 import os
-from datetime import datetime
-import webbrowser
-import time
-
-# 尝试导入pyautogui，如果失败则标记为不可用
-try:
-    import pyautogui
-    PYAUTOGUI_AVAILABLE = True
-except ImportError:
-    PYAUTOGUI_AVAILABLE = False
-    pyautogui = None
-
-
-class PdfManager:
-    def __init__(self):
-        self.pdf_files = []
-
-    def add_pdf(self, file_path):
-        if file_path.endswith('.pdf'):
-            self.pdf_files.append(file_path)
-
-    def merge_pdfs(self, pdf_files, output_path):
-        pdf_writer = PdfWriter()
-        for file_path in pdf_files:
-            pdf_reader = PdfReader(file_path)
-            for page in range(len(pdf_reader.pages)):
-                pdf_writer.add_page(pdf_reader.pages[page])
-        with open(output_path, 'wb') as out:
-            pdf_writer.write(out)
-
-
-class FileListWidget(QListWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAcceptDrops(True)
-
-    def dragEnterEvent(self, event: QDragEnterEvent):
-        if event.mimeData().hasUrls():
-            for url in event.mimeData().urls():
-                file_path = url.toLocalFile()
-                if file_path.endswith('.pdf'):
-                    modification_time = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d %H:%M:%S')
-                    file_name = os.path.basename(file_path)
-                    item_text = f"{file_name} (修改日期: {modification_time})"
-                    item = QListWidgetItem(item_text)
-                    item.setData(Qt.UserRole, file_path)
-                    self.addItem(item)
-            event.acceptProposedAction()
-        else:
-            event.ignore()
 
 
 class PdfMergeTab(QWidget):
     def __init__(self):
         super().__init__()
-        self.pdf_manager = PdfManager()
         self.init_ui()
 
     def init_ui(self):
@@ -69,14 +18,21 @@ class PdfMergeTab(QWidget):
         left_layout = QVBoxLayout()
         right_layout = QVBoxLayout()
 
-        self.file_list = FileListWidget()
-        self.file_list.setSelectionMode(QListWidget.MultiSelection)
+        self.file_list = FileListWidget(('.pdf',), count_pdf_pages, "页")
+        self.file_list.setSelectionMode(QAbstractItemView.MultiSelection)
         left_layout.addWidget(self.file_list)
 
+        self.job_panel = JobPanel()
+        left_layout.addWidget(self.job_panel)
+
         self.add_button = QPushButton("添加PDF")
         self.add_button.clicked.connect(self.add_pdf)
         right_layout.addWidget(self.add_button)
 
+        self.add_folder_button = QPushButton("添加文件夹")
+        self.add_folder_button.clicked.connect(self.add_folder)
+        right_layout.addWidget(self.add_folder_button)
+
         self.delete_button = QPushButton("删除选择")
         self.delete_button.clicked.connect(self.delete_pdf)
         right_layout.addWidget(self.delete_button)
@@ -105,6 +61,29 @@ class PdfMergeTab(QWidget):
         self.bottom_button.clicked.connect(self.move_to_bottom)
         right_layout.addWidget(self.bottom_button)
 
+        self.page_range_button = QPushButton("设置页码")
+        self.page_range_button.clicked.connect(self.set_page_range)
+        right_layout.addWidget(self.page_range_button)
+
+        self.streaming_checkbox = QCheckBox("低内存合并")
+        right_layout.addWidget(self.streaming_checkbox)
+
+        self.dedupe_checkbox = QCheckBox("合并重复资源")
+        self.dedupe_checkbox.setChecked(True)
+        right_layout.addWidget(self.dedupe_checkbox)
+
+        # 输出配置见 pdf_stream_writer.OUTPUT_PROFILES
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem("输出: 快速写出", 'fast')
+        self.profile_combo.addItem("输出: 压缩体积", 'small')
+        self.profile_combo.addItem("输出: 打印(图片降采样)", 'print')
+        self.profile_combo.activated.connect(self.check_profile)
+        right_layout.addWidget(self.profile_combo)
+
+        # 勾选后合并任务写入持久队列，由调度器按优先级执行，关闭程序后下次启动继续
+        self.queue_checkbox = QCheckBox("加入任务队列")
+        right_layout.addWidget(self.queue_checkbox)
+
         self.merge_button = QPushButton("合并列表文件")
         self.merge_button.clicked.connect(self.merge_files)
         right_layout.addWidget(self.merge_button)
@@ -120,94 +99,83 @@ class PdfMergeTab(QWidget):
     def add_pdf(self):
         files, _ = QFileDialog.getOpenFileNames(self, "选择PDF文件", "", "PDF Files (*.pdf)")
         if files:
-            for file in files:
-                modification_time = datetime.fromtimestamp(os.path.getmtime(file)).strftime('%Y-%m-%d %H:%M:%S')
-                file_name = os.path.basename(file)
-                item_text = f"{file_name} (修改日期: {modification_time})"
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, file)
-                self.file_list.addItem(item)
+            self.file_list.add_files(files)
+
+    def add_folder(self):
+        """递归添加文件夹内的文件，在后台扫描，找到的文件陆续加入列表"""
+        directory = QFileDialog.getExistingDirectory(self, "选择PDF文件夹")
+        if directory:
+            self.file_list.add_directory(directory)
 
     def delete_pdf(self):
-        for item in self.file_list.selectedItems():
-            self.file_list.takeItem(self.file_list.row(item))
+        self.file_list.delete_selected()
 
     def clear_list(self):
         self.file_list.clear()
 
-    def remove_duplicates(self):
-        pdf_files = [self.file_list.item(i).data(Qt.UserRole) for i in range(self.file_list.count())]
-        # Remove duplicates while preserving order
-        unique_files = []
-        seen_files = set()
-        for file in reversed(pdf_files):
-            if file not in seen_files:
-                unique_files.append(file)
-                seen_files.add(file)
-        unique_files.reverse()
+    def set_page_range(self):
+        """为选中的文件设置合并时只取的页码，如 1 或 1-3,5 或 2-，留空恢复为全部页"""
+        rows = self.file_list.selected_rows()
+        if not rows and self.file_list.current_row() >= 0:
+            rows = [self.file_list.current_row()]
+        if not rows:
+            QMessageBox.warning(self, "警告", "请先选择文件")
+            return
+        spec, ok = QInputDialog.getText(self, "设置页码", "只合并这些页(如 1 或 1-3,5 或 2-，留空为全部页):")
+        if not ok:
+            return
+        from pdf_manager import parse_page_ranges
+        try:
+            parse_page_ranges(spec)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        self.file_list.set_page_range(rows, spec.strip())
 
-        self.file_list.clear()
-        for file in unique_files:
-            item_text = f"{os.path.basename(file)} (修改日期: {datetime.fromtimestamp(os.path.getmtime(file)).strftime('%Y-%m-%d %H:%M:%S')})"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, file)
-            self.file_list.addItem(item)
+    def remove_duplicates(self):
+        """按文件内容去除重复文件，另存为不同名称或复制到不同目录的同一文件也能识别"""
+        paths = self.file_list.paths()
+        job = Job(content_keys, paths)
+        job.signals.finished.connect(self.remove_duplicate_items)
+        job.signals.failed.connect(lambda error: QMessageBox.critical(self, "错误", f"查找重复文件失败:\n{error}"))
+        self.job_panel.start(job)
+
+    def remove_duplicate_items(self, keys=None):
+        """在原列表上删除重复项，不重建列表；任务运行期间列表可能已被修改，按当前内容重新判断"""
+        paths = self.file_list.paths()
+        self.file_list.remove_rows(duplicate_rows(paths, keys or {}))
 
     def move_to_top(self):
-        current_row = self.file_list.currentRow()
+        current_row = self.file_list.current_row()
         if current_row > 0:
-            item = self.file_list.takeItem(current_row)
-            self.file_list.insertItem(0, item)
-            self.file_list.setCurrentRow(0)
+            self.file_list.move_row(current_row, 0)
 
     def move_up(self):
-        current_row = self.file_list.currentRow()
+        current_row = self.file_list.current_row()
         if current_row > 0:
-            item = self.file_list.takeItem(current_row)
-            self.file_list.insertItem(current_row - 1, item)
-            self.file_list.setCurrentRow(current_row - 1)
+            self.file_list.move_row(current_row, current_row - 1)
 
     def move_down(self):
-        current_row = self.file_list.currentRow()
-        if current_row < self.file_list.count() - 1:
-            item = self.file_list.takeItem(current_row)
-            self.file_list.insertItem(current_row + 1, item)
-            self.file_list.setCurrentRow(current_row + 1)
+        current_row = self.file_list.current_row()
+        if 0 <= current_row < self.file_list.count() - 1:
+            self.file_list.move_row(current_row, current_row + 1)
 
     def move_to_bottom(self):
-        current_row = self.file_list.currentRow()
-        if current_row < self.file_list.count() - 1:
-            item = self.file_list.takeItem(current_row)
-            self.file_list.addItem(item)
-            self.file_list.setCurrentRow(self.file_list.count() - 1)
+        current_row = self.file_list.current_row()
+        if 0 <= current_row < self.file_list.count() - 1:
+            self.file_list.move_row(current_row, self.file_list.count() - 1)
+
+    def check_profile(self):
+        """选中的输出配置因缺少依赖不能完全生效时提示"""
+        from pdf_stream_writer import profile_warning
+        warning = profile_warning(self.profile_combo.currentData())
+        if warning:
+            QMessageBox.warning(self, "提示", warning)
 
     def merge_files(self):
         output_path, _ = QFileDialog.getSaveFileName(self, "保存合并后的PDF", "D:/PDF", "PDF Files (*.pdf)")
         if output_path:
-            try:
-                pdf_files = [self.file_list.item(i).data(Qt.UserRole) for i in range(self.file_list.count())]
-                if not pdf_files:
-                    QMessageBox.warning(self, "警告", "请先添加PDF文件")
-                    return
-
-                unique_files = []
-                seen_files = set()
-                for file in reversed(pdf_files):
-                    if file not in seen_files:
-                        unique_files.append(file)
-                        seen_files.add(file)
-                unique_files.reverse()
-
-                if self.pdf_manager.merge_pdfs(unique_files, output_path):
-                    QMessageBox.information(self, "成功", f"PDF文件已成功合并到:\n{output_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"合并PDF失败:\n{str(e)}")
-
-    def print_files(self):
-        try:
-            current_time = datetime.now().strftime("%y%m%d-%H%M%S")
-            output_path = os.path.abspath(f"{current_time}.pdf")
-            pdf_files = [self.file_list.item(i).data(Qt.UserRole) for i in range(self.file_list.count())]
+            pdf_files = self.file_list.paths()
             if not pdf_files:
                 QMessageBox.warning(self, "警告", "请先添加PDF文件")
                 return
@@ -220,24 +188,62 @@ class PdfMergeTab(QWidget):
                     seen_files.add(file)
             unique_files.reverse()
 
-            if not self.pdf_manager.merge_pdfs(unique_files, output_path):
+            if self.queue_checkbox.isChecked():
+                params = {'files': unique_files, 'output': output_path,
+                          'streaming': self.streaming_checkbox.isChecked(),
+                          'dedupe': self.dedupe_checkbox.isChecked(), 'page_ranges': self.file_list.page_ranges(),
+                          'profile': self.profile_combo.currentData()}
+                job_id = enqueue('pdf-merge', params, f"PDF合并 {os.path.basename(output_path)}")
+                self.job_panel.status_label.setText(f"已加入任务队列，编号 {job_id}")
                 return
 
-            if not os.path.exists(output_path):
-                QMessageBox.critical(self, "错误", "生成的PDF文件不存在")
-                return
+            # 每个任务使用独立的PdfManager，多个任务同时运行时统计互不干扰
+            from pdf_manager import PdfManager
+            pdf_manager = PdfManager()
+            dedupe = self.dedupe_checkbox.isChecked()
+            job = Job(pdf_manager.merge_pdfs, unique_files, output_path, self.streaming_checkbox.isChecked(),
+                      dedupe=dedupe, page_ranges=self.file_list.page_ranges(),
+                      profile=self.profile_combo.currentData())
+            job.signals.finished.connect(lambda result: self.on_merge_finished(pdf_manager, output_path, dedupe))
+            job.signals.failed.connect(lambda error: QMessageBox.critical(self, "错误", f"合并PDF失败:\n{error}"))
+            self.job_panel.start(job)
+
+    def on_merge_finished(self, pdf_manager, output_path, dedupe):
+        message = f"PDF文件已成功合并到:\n{output_path}"
+        if dedupe:
+            message += f"\n重复资源: 节省 {pdf_manager.saved_objects} 个对象, {pdf_manager.saved_bytes / 1024:.1f} KB"
+        QMessageBox.information(self, "成功", message)
+
+    def print_files(self):
+        pdf_files = self.file_list.paths()
+        if not pdf_files:
+            QMessageBox.warning(self, "警告", "请先添加PDF文件")
+            return
+
+        unique_files = []
+        seen_files = set()
+        for file in reversed(pdf_files):
+            if file not in seen_files:
+                unique_files.append(file)
+                seen_files.add(file)
+        unique_files.reverse()
 
-            try:
-                webbrowser.open_new_tab(f'file:///{output_path}')
-                time.sleep(1)
-                
-                # 检查pyautogui是否可用
-                if PYAUTOGUI_AVAILABLE and pyautogui:
-                    pyautogui.hotkey('ctrl', 'p')
-                    QMessageBox.information(self, "成功", "打印任务已启动")
-                else:
-                    QMessageBox.information(self, "提示", f"PDF文件已生成并打开:\n{output_path}\n请手动按 Ctrl+P 打印")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"打印失败:\n{str(e)}")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"打印准备失败:\n{str(e)}")
+        # 同一列表(内容未变)、同样选项重复打印时直接使用缓存的合并结果；合并和送打印都在后台完成
+        from pdf_manager import PdfManager
+        from print_spooler import backend_warning, print_merged
+        warning = backend_warning()
+        if warning:
+            QMessageBox.warning(self, "提示", warning)
+        page_ranges = self.file_list.page_ranges()
+        params = {'streaming': self.streaming_checkbox.isChecked(), 'dedupe': self.dedupe_checkbox.isChecked(),
+                  'page_ranges': {file: page_ranges[file] for file in unique_files if file in page_ranges},
+                  'profile': self.profile_combo.currentData()}
+        job = Job(print_merged, 'pdf-print', unique_files, params, '.pdf',
+                  lambda output_path, on_file, on_page: PdfManager().merge_pdfs(
+                      unique_files, output_path, params['streaming'], dedupe=params['dedupe'],
+                      page_ranges=params['page_ranges'], profile=params['profile'],
+                      on_file=on_file, on_page=on_page),
+                  "PDF合并打印")
+        job.signals.finished.connect(lambda result: QMessageBox.information(self, "成功", f"打印任务已提交:\n{result}"))
+        job.signals.failed.connect(lambda error: QMessageBox.critical(self, "错误", f"打印失败:\n{error}"))
+        self.job_panel.start(job)
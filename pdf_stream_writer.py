@@ -0,0 +1,411 @@
+# pdf_stream_writer.py
+
+import hashlib
+import zlib
+from io import BytesIO
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject,
+    StreamObject, EncodedStreamObject, DecodedStreamObject
+)
+
+# 尝试导入Pillow，如果失败则不做图片降采样
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 输出配置：
+#   fast   对象原样写出，写得最快
+#   small  未压缩的流用 Flate 压缩，已压缩的流按最高级别重新压缩(变小才替换)，
+#          非流对象打包进对象流，交叉引用表写成压缩的交叉引用流
+#   print  在 small 的基础上把超过打印所需分辨率的图片降采样为JPEG(需要Pillow，没有时见 profile_warning)
+OUTPUT_PROFILES = {
+    'fast': {},
+    'small': {'compress_level': 9, 'object_streams': True},
+    'print': {'compress_level': 9, 'object_streams': True, 'max_image_dpi': 150},
+}
+# 每个对象流最多打包的对象数
+OBJECT_STREAM_SIZE = 100
+JPEG_QUALITY = 80
+# 没有页面尺寸时按A4计算
+DEFAULT_MEDIA_BOX = (0, 0, 595, 842)
+
+# 页面可以从页面树的上级节点继承的属性
+INHERITABLE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+def _value(dictionary, key):
+    """取字典中的值并解析间接引用，没有该键时返回None"""
+    return dictionary[key] if key in dictionary else None
+
+
+def profile_warning(profile):
+    """配置中有功能因缺少依赖不能使用时返回提示，否则返回None"""
+    if OUTPUT_PROFILES[profile].get('max_image_dpi') and not PIL_AVAILABLE:
+        return "未安装Pillow(pip install Pillow)，打印配置不会降采样图片，输出与“压缩体积”相同"
+    return None
+
+
+def find_page(reader, page_number):
+    """沿页面树各节点的 /Count 直接找到第 page_number 页(从0开始)，不展开整棵页面树；
+    返回 (补上继承属性的页面字典, 页面的间接引用)"""
+    node = reader.trailer["/Root"]["/Pages"].get_object()
+    inherited = {}
+    remaining = page_number
+    while True:
+        for key in INHERITABLE_ATTRIBUTES:
+            if key in node:
+                inherited[key] = node[key]
+        for kid_ref in node["/Kids"]:
+            kid = kid_ref.get_object()
+            if "/Kids" in kid:
+                count = kid["/Count"]
+                if remaining < count:
+                    node = kid
+                    break
+                remaining -= count
+            elif remaining == 0:
+                page = DictionaryObject(kid)
+                for key, value in inherited.items():
+                    if key not in page:
+                        page[NameObject(key)] = value
+                return page, kid_ref
+            else:
+                remaining -= 1
+        else:
+            raise IndexError(f"页码超出范围: {page_number + 1}")
+
+
+def _references(obj):
+    """按出现顺序的逆序列出直接对象中的间接引用(pop() 依次取出)，不解析引用本身"""
+    refs = []
+    todo = [obj]
+    while todo:
+        item = todo.pop()
+        if isinstance(item, IndirectObject):
+            refs.append(item)
+        elif isinstance(item, DictionaryObject):
+            todo.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            todo.extend(reversed(item))
+    refs.reverse()
+    return refs
+
+
+class PdfStreamWriter:
+    """逐页把对象直接写入输出文件，写完即释放，内存占用与合并的文件数量无关"""
+
+    def __init__(self, stream, chunk_size=50, dedupe=False, compress_level=None, object_streams=False,
+                 max_image_dpi=None):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        # 去重：内容完全相同的对象(字体、图片、印章等)只写一次
+        self.dedupe = dedupe
+        # 输出优化(见 OUTPUT_PROFILES)
+        self.compress_level = compress_level
+        self.object_streams = object_streams
+        self.max_image_dpi = max_image_dpi if PIL_AVAILABLE else None
+        self.image_limit = None  # 当前页上图片长边的最大像素数
+        self.packed = []  # 等待打包进对象流的 (编号, 数据)
+        self.object_hashes = {}
+        self.saved_objects = 0
+        self.saved_bytes = 0
+        self.offsets = [None]  # 下标即输出对象编号，值为文件偏移，打包的对象为 (对象流编号, 序号)
+        self.page_ids = []
+        self.pages_written = 0
+
+        self.stream.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        # 页面树根和目录对象先占位，最后再写出
+        self.pages_id = self._reserve()
+        self.catalog_id = self._reserve()
+
+    def _reserve(self):
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def _serialize(self, obj):
+        buffer = BytesIO()
+        obj.write_to_stream(buffer, None)
+        return buffer.getvalue()
+
+    def _write_data(self, obj_id, data, packable=False):
+        if packable and self.object_streams:
+            # 流对象不能放进对象流，其他对象攒够一批后一起压缩写出
+            self.packed.append((obj_id, data))
+            if len(self.packed) >= OBJECT_STREAM_SIZE:
+                self._flush_object_stream()
+            return
+        self.offsets[obj_id] = self.stream.tell()
+        self.stream.write(f"{obj_id} 0 obj\n".encode())
+        self.stream.write(data)
+        self.stream.write(b"\nendobj\n")
+
+    def _write_object(self, obj_id, obj):
+        self._write_data(obj_id, self._serialize(obj), not isinstance(obj, StreamObject))
+
+    def _flush_object_stream(self):
+        if not self.packed:
+            return
+        stream_id = self._reserve()
+        header = []
+        body = BytesIO()
+        for index, (obj_id, data) in enumerate(self.packed):
+            header.append(f"{obj_id} {body.tell()}")
+            body.write(data)
+            body.write(b"\n")
+            self.offsets[obj_id] = (stream_id, index)
+        header = " ".join(header).encode() + b"\n"
+        object_stream = EncodedStreamObject()
+        object_stream[NameObject("/Type")] = NameObject("/ObjStm")
+        object_stream[NameObject("/N")] = NumberObject(len(self.packed))
+        object_stream[NameObject("/First")] = NumberObject(len(header))
+        object_stream[NameObject("/Filter")] = NameObject("/FlateDecode")
+        object_stream._data = zlib.compress(header + body.getvalue(), self.compress_level or 6)
+        self.packed = []
+        self._write_data(stream_id, self._serialize(object_stream))
+
+    def add_reader(self, reader, on_page=None, page_numbers=None):
+        """把一个PdfReader的页面写入输出，返回写入的页数；
+        page_numbers 为页码下标列表时只写这些页，只解析这些页引用到的对象"""
+        if page_numbers is None:
+            pages = [(page, page.indirect_reference) for page in reader.pages]
+        else:
+            pages = [find_page(reader, page_number) for page_number in page_numbers]
+        return self.add_pages(pages, on_page)
+
+    def add_pages(self, pages, on_page=None):
+        """写入同一源文件的 (页面字典, 间接引用) 列表，返回写入的页数；
+        同一页面出现多次时(如拆分出的各部分)，指向该页的链接指向第一次出现的位置"""
+        # 同一源文件内共享的字体、图片只写一次
+        id_map = {}
+
+        # 先为选中的页面分配编号，页面之间的互相引用(链接、批注)能直接指向新页面，
+        # 指向未选中页面的引用写为 null
+        new_page_ids = []
+        for page, ref in pages:
+            new_id = self._reserve()
+            if ref is not None:
+                id_map.setdefault((ref.idnum, ref.generation), new_id)
+            new_page_ids.append(new_id)
+
+        for page_num, ((page, _), new_id) in enumerate(zip(pages, new_page_ids)):
+            if on_page:
+                on_page(page_num, len(pages))
+            if self.max_image_dpi:
+                # 图片按所在页面的尺寸计算打印所需的像素数
+                media_box = [float(value) for value in _value(page, "/MediaBox") or DEFAULT_MEDIA_BOX]
+                longest_side = max(abs(media_box[2] - media_box[0]), abs(media_box[3] - media_box[1]))
+                self.image_limit = int(longest_side / 72 * self.max_image_dpi)
+            values = [value for key, value in page.items() if key != "/Parent"]
+            self._emit(values, id_map)
+            new_page = DictionaryObject()
+            for key, value in page.items():
+                if key == "/Parent":
+                    continue
+                new_page[key] = self._copy(value, id_map)
+            new_page[NameObject("/Parent")] = IndirectObject(self.pages_id, 0, None)
+            self._write_object(new_id, new_page)
+            self.page_ids.append(new_id)
+
+            self.pages_written += 1
+            if self.pages_written % self.chunk_size == 0:
+                self.stream.flush()
+
+        return len(pages)
+
+    def _emit(self, obj, id_map):
+        """写出 obj 引用到的所有对象，被引用的子对象先于引用它的对象写出(后序)，编号记入 id_map。
+        用显式的栈代替递归，间接引用链再长也不会超出递归深度"""
+        stack = [(None, None, _references(obj))]
+        while stack:
+            key, target, refs = stack[-1]
+            if refs:
+                ref = refs.pop()
+                child_key = (ref.idnum, ref.generation)
+                if child_key in id_map:
+                    if id_map[child_key] is None:
+                        # 循环引用：对象还在复制中，先给它分配编号
+                        id_map[child_key] = self._reserve()
+                    continue
+                child = ref.get_object()
+                if isinstance(child, DictionaryObject) and child.get("/Type") == "/Pages":
+                    # 指向源文件页面树的引用统一改为指向输出的页面树
+                    id_map[child_key] = self.pages_id
+                    continue
+                if isinstance(child, DictionaryObject) and child.get("/Type") == "/Page":
+                    # 选中的页面都已在 id_map 中，其余页面不复制
+                    continue
+                id_map[child_key] = None
+                stack.append((child_key, child, _references(child)))
+                continue
+            stack.pop()
+            if key is not None:
+                self._write_copy(key, target, id_map)
+
+    def _write_copy(self, key, target, id_map):
+        """子对象都已写出后复制并写出对象本身"""
+        new_obj = self._copy(target, id_map)
+        if isinstance(new_obj, StreamObject):
+            new_obj = self._optimize_stream(target, new_obj)
+        data = self._serialize(new_obj)
+        packable = not isinstance(new_obj, StreamObject)
+
+        if id_map[key] is not None:
+            # 被循环引用过的对象已经对外公布了编号，不能再合并
+            self._write_data(id_map[key], data, packable)
+            return
+
+        if self.dedupe:
+            digest = hashlib.sha256(data).digest()
+            if digest in self.object_hashes:
+                id_map[key] = self.object_hashes[digest]
+                self.saved_objects += 1
+                self.saved_bytes += len(data)
+                return
+
+        id_map[key] = self._reserve()
+        if self.dedupe:
+            self.object_hashes[digest] = id_map[key]
+        self._write_data(id_map[key], data, packable)
+
+    def _optimize_stream(self, source, stream):
+        """按输出配置压缩流或降采样图片，结果变小才替换；source 为源文件中的流，用于读取属性"""
+        if self.compress_level is None:
+            return stream
+        filters = _value(source, "/Filter")
+        if isinstance(filters, ArrayObject) and len(filters) == 1:
+            filters = filters[0]
+        if self.image_limit and _value(source, "/Subtype") == "/Image":
+            image = self._downsample(source, stream, filters)
+            if image is not None:
+                return image
+        if filters is None:
+            data = zlib.compress(stream._data, self.compress_level)
+        elif filters == "/FlateDecode" and "/DecodeParms" not in stream:
+            try:
+                data = zlib.compress(zlib.decompress(stream._data), self.compress_level)
+            except zlib.error:
+                return stream
+        else:
+            return stream
+        if len(data) >= len(stream._data):
+            return stream
+        new_stream = EncodedStreamObject()
+        new_stream.update(stream)
+        new_stream[NameObject("/Filter")] = NameObject("/FlateDecode")
+        new_stream._data = data
+        return new_stream
+
+    def _downsample(self, source, stream, filters):
+        """把超过 image_limit 像素的8位RGB/灰度图片缩小并编码为JPEG，不能处理的图片返回None"""
+        mode = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}.get(_value(source, "/ColorSpace"))
+        width, height = int(_value(source, "/Width") or 0), int(_value(source, "/Height") or 0)
+        if mode is None or _value(source, "/BitsPerComponent") != 8 or not width or not height or \
+                any(key in source for key in ("/ImageMask", "/Mask", "/Decode", "/DecodeParms")):
+            return None
+        scale = self.image_limit / max(width, height)
+        if scale >= 0.9:
+            return None
+        try:
+            if filters == "/DCTDecode":
+                image = Image.open(BytesIO(stream._data))
+                image.draft(mode, (int(width * scale), int(height * scale)))
+                image = image.convert(mode)
+            elif filters == "/FlateDecode":
+                image = Image.frombytes(mode, (width, height), zlib.decompress(stream._data))
+            elif filters is None:
+                image = Image.frombytes(mode, (width, height), stream._data)
+            else:
+                return None
+            image = image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.LANCZOS)
+            output = BytesIO()
+            image.save(output, 'JPEG', quality=JPEG_QUALITY)
+        except (OSError, ValueError, zlib.error):
+            return None
+        if output.tell() >= len(stream._data):
+            return None
+        new_stream = EncodedStreamObject()
+        new_stream.update(stream)
+        new_stream[NameObject("/Filter")] = NameObject("/DCTDecode")
+        new_stream[NameObject("/Width")] = NumberObject(image.width)
+        new_stream[NameObject("/Height")] = NumberObject(image.height)
+        new_stream._data = output.getvalue()
+        return new_stream
+
+    def _copy(self, obj, id_map):
+        """复制直接对象；间接引用已由 _emit 写出，换成输出中的编号，未选中的页面写为 null"""
+        if isinstance(obj, IndirectObject):
+            obj_id = id_map.get((obj.idnum, obj.generation))
+            return NullObject() if obj_id is None else IndirectObject(obj_id, 0, None)
+        if isinstance(obj, StreamObject):
+            new_obj = EncodedStreamObject() if isinstance(obj, EncodedStreamObject) else DecodedStreamObject()
+            new_obj._data = obj._data
+            for key, value in obj.items():
+                new_obj[key] = self._copy(value, id_map)
+            return new_obj
+        if isinstance(obj, DictionaryObject):
+            new_obj = DictionaryObject()
+            for key, value in obj.items():
+                new_obj[key] = self._copy(value, id_map)
+            return new_obj
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copy(item, id_map) for item in obj)
+        return obj
+
+    def close(self):
+        """写出页面树、目录和交叉引用表"""
+        pages = DictionaryObject()
+        pages[NameObject("/Type")] = NameObject("/Pages")
+        pages[NameObject("/Kids")] = ArrayObject(IndirectObject(i, 0, None) for i in self.page_ids)
+        pages[NameObject("/Count")] = NumberObject(len(self.page_ids))
+        self._write_object(self.pages_id, pages)
+
+        catalog = DictionaryObject()
+        catalog[NameObject("/Type")] = NameObject("/Catalog")
+        catalog[NameObject("/Pages")] = IndirectObject(self.pages_id, 0, None)
+        self._write_object(self.catalog_id, catalog)
+
+        if self.object_streams:
+            self._flush_object_stream()
+            self._write_xref_stream()
+            self.stream.flush()
+            return
+
+        xref_offset = self.stream.tell()
+        self.stream.write(f"xref\n0 {len(self.offsets)}\n".encode())
+        self.stream.write(b"0000000000 65535 f \n")
+        for offset in self.offsets[1:]:
+            if offset is None:
+                self.stream.write(b"0000000000 00000 f \n")
+            else:
+                self.stream.write(f"{offset:010d} 00000 n \n".encode())
+        self.stream.write(
+            f"trailer\n<< /Size {len(self.offsets)} /Root {self.catalog_id} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+        self.stream.flush()
+
+    def _write_xref_stream(self):
+        """对象流中的对象只能用交叉引用流定位：每项为 类型(1字节)、偏移或对象流编号、序号"""
+        xref_id = self._reserve()
+        xref_offset = self.stream.tell()
+        self.offsets[xref_id] = xref_offset
+        width = max(4, (xref_offset.bit_length() + 7) // 8)
+        entries = [b"\x00" + bytes(width) + b"\xff\xff"]
+        for offset in self.offsets[1:]:
+            if offset is None:
+                entries.append(b"\x00" + bytes(width) + b"\x00\x00")
+            elif isinstance(offset, tuple):
+                entries.append(b"\x02" + offset[0].to_bytes(width, 'big') + offset[1].to_bytes(2, 'big'))
+            else:
+                entries.append(b"\x01" + offset.to_bytes(width, 'big') + b"\x00\x00")
+        xref = EncodedStreamObject()
+        xref[NameObject("/Type")] = NameObject("/XRef")
+        xref[NameObject("/Size")] = NumberObject(len(self.offsets))
+        xref[NameObject("/W")] = ArrayObject([NumberObject(1), NumberObject(width), NumberObject(2)])
+        xref[NameObject("/Root")] = IndirectObject(self.catalog_id, 0, None)
+        xref[NameObject("/Filter")] = NameObject("/FlateDecode")
+        xref._data = zlib.compress(b"".join(entries), self.compress_level or 6)
+        self._write_data(xref_id, self._serialize(xref))
+        self.stream.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
@@ -0,0 +1,205 @@
+# print_spooler.py
+# 打印：合并结果直接交给打印队列，不再打开查看器、等待固定秒数后模拟 Ctrl+P。
+# 后端由环境变量 FINANCETOOL_PRINT_BACKEND 选择：
+#   shell  用关联程序的"打印"命令在后台打印(Windows 默认，支持PDF和Excel)
+#   raw    通过 win32print 把文件原样写入打印机队列(需要 pywin32，打印机需支持直接打印PDF)
+#   lp     交给 CUPS 的 lp 命令(其他系统默认)
+#   file   写入本地目录，用于测试，目录由 FINANCETOOL_PRINT_SPOOL 指定；其他系统找不到 lp 时也退回到它(见 backend_warning)
+# raw 和 lp 只发送PDF，其他格式(合并后的 .xlsx)先用 LibreOffice 转换为PDF。
+# FINANCETOOL_PRINTER 指定打印机名称，不设置时使用默认打印机。
+
+from app_paths import app_data_dir
+from instrumentation import stage
+from result_cache import cached_output
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import itertools
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# 尝试导入win32print，如果失败则raw后端不可用
+try:
+    import win32print
+    WIN32PRINT_AVAILABLE = True
+except ImportError:
+    WIN32PRINT_AVAILABLE = False
+
+CHUNK_SIZE = 1024 * 1024
+# LibreOffice 转换一个文件最多等待的秒数
+CONVERT_TIMEOUT = 300
+# 同一秒内提交的任务按序号区分
+_sequence = itertools.count(1)
+
+
+class FileSpoolBackend:
+    """把每个打印任务复制到目录中，文件完整写完后才出现(先写临时文件再改名)"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or spool_directory()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def submit(self, path, title):
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{next(_sequence):04d}-{safe_file_name(title)}"
+        spool_path = os.path.join(self.directory, name)
+        shutil.copyfile(path, spool_path + '.tmp')
+        os.replace(spool_path + '.tmp', spool_path)
+        return spool_path
+
+
+class ShellPrintBackend:
+    """用文件关联程序的"打印"命令打印，程序在后台打开并打印，不需要窗口焦点"""
+
+    def __init__(self, printer=None):
+        self.printer = printer
+
+    def submit(self, path, title):
+        try:
+            if self.printer:
+                # "printto" 命令把打印机名称作为参数传给关联程序
+                os.startfile(path, 'printto', f'"{self.printer}"')
+            else:
+                os.startfile(path, 'print')
+        except OSError as e:
+            if self.printer:
+                raise RuntimeError(f"关联程序不支持指定打印机 {self.printer}，可改用 raw 后端: {e}")
+            raise
+        if self.printer:
+            return f"已交给关联程序打印到 {self.printer}: {title}"
+        return f"已交给关联程序打印: {title}"
+
+
+class RawPrinterBackend:
+    """通过 win32print 分块写入打印机队列，文件内容原样发送，打印机需能直接解析(如PDF)"""
+
+    def __init__(self, printer=None):
+        if not WIN32PRINT_AVAILABLE:
+            raise RuntimeError("raw 打印需要安装 pywin32")
+        self.printer = printer or win32print.GetDefaultPrinter()
+
+    def submit(self, path, title):
+        with printable_pdf(path) as pdf_path:
+            handle = win32print.OpenPrinter(self.printer)
+            try:
+                job_id = win32print.StartDocPrinter(handle, 1, (title, None, 'RAW'))
+                try:
+                    win32print.StartPagePrinter(handle)
+                    with open(pdf_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                            win32print.WritePrinter(handle, chunk)
+                    win32print.EndPagePrinter(handle)
+                finally:
+                    win32print.EndDocPrinter(handle)
+            finally:
+                win32print.ClosePrinter(handle)
+        return f"已发送到 {self.printer}，任务号 {job_id}"
+
+
+class LpBackend:
+    """交给 CUPS 打印，文件内容从标准输入传入；不是PDF的文件先转换(见 printable_pdf)"""
+
+    def __init__(self, printer=None):
+        if not shutil.which('lp'):
+            raise RuntimeError("找不到 lp 命令")
+        self.printer = printer
+
+    def submit(self, path, title):
+        command = ['lp', '-t', title]
+        if self.printer:
+            command += ['-d', self.printer]
+        with printable_pdf(path) as pdf_path, open(pdf_path, 'rb') as f:
+            result = subprocess.run(command, stdin=f, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"lp 返回 {result.returncode}")
+        return result.stdout.strip()
+
+
+@contextmanager
+def printable_pdf(path):
+    """产出可以直接发给打印机的PDF：PDF原样产出，其他格式用 LibreOffice 转换到临时目录，用完删除"""
+    if os.path.splitext(path)[1].lower() == '.pdf':
+        yield path
+        return
+    office = find_office()
+    if office is None:
+        raise RuntimeError(f"打印机只能直接打印PDF，打印 {os.path.splitext(path)[1]} 文件需要安装 LibreOffice，"
+                           f"或设置 FINANCETOOL_PRINT_BACKEND=shell 用关联程序打印")
+    with tempfile.TemporaryDirectory() as directory:
+        # 单独的配置目录，已经打开的 LibreOffice 窗口不影响转换
+        command = [office, f"-env:UserInstallation={Path(directory, 'profile').as_uri()}", '--headless',
+                   '--convert-to', 'pdf', '--outdir', directory, path]
+        with stage('convert', path):
+            try:
+                result = subprocess.run(command, capture_output=True, text=True, timeout=CONVERT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                raise RuntimeError(f"转换为PDF超时({CONVERT_TIMEOUT}秒): {path}")
+        pdf_path = os.path.join(directory, os.path.splitext(os.path.basename(path))[0] + '.pdf')
+        if result.returncode != 0 or not os.path.exists(pdf_path):
+            raise RuntimeError(f"转换为PDF失败: {result.stderr.strip() or result.stdout.strip() or result.returncode}")
+        yield pdf_path
+
+
+def find_office():
+    """LibreOffice 命令行程序的路径，没有安装时返回None"""
+    for name in ('soffice', 'libreoffice'):
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def spool_directory():
+    return os.environ.get('FINANCETOOL_PRINT_SPOOL') or os.path.join(app_data_dir(), 'print_spool')
+
+
+def safe_file_name(title, max_length=100):
+    """把任务标题变成可用作文件名的文本：去掉路径分隔符、Windows 不允许的字符和控制字符"""
+    name = re.sub(r'[\x00-\x1f<>:"/\\|?*]', '_', title).strip(' .')
+    return name[-max_length:] or 'print'
+
+
+BACKENDS = {
+    'file': FileSpoolBackend,
+    'shell': ShellPrintBackend,
+    'raw': RawPrinterBackend,
+    'lp': LpBackend,
+}
+
+
+def default_backend_name():
+    if sys.platform == 'win32':
+        return 'shell'
+    return 'lp' if shutil.which('lp') else 'file'
+
+
+def backend_warning():
+    """没有指定后端、又找不到 lp 而退回 file 后端时返回提示(打印内容不会送到打印机)，否则返回None"""
+    if os.environ.get('FINANCETOOL_PRINT_BACKEND') or default_backend_name() != 'file':
+        return None
+    return f"找不到 lp 命令(CUPS)，打印内容不会送到打印机，只写入 {spool_directory()}"
+
+
+def make_backend(name=None):
+    name = name or os.environ.get('FINANCETOOL_PRINT_BACKEND') or default_backend_name()
+    if name not in BACKENDS:
+        raise ValueError(f"未知的打印后端: {name}，可选 {', '.join(BACKENDS)}")
+    if name == 'file':
+        return FileSpoolBackend()
+    return BACKENDS[name](os.environ.get('FINANCETOOL_PRINTER') or None)
+
+
+def print_file(path, title=None, backend=None):
+    """把文件交给打印队列，返回后端的说明(任务号或队列文件路径)"""
+    backend = backend or make_backend()
+    with stage('spool', path):
+        return backend.submit(path, title or os.path.basename(path))
+
+
+def print_merged(operation, files, params, extension, build, title, on_file=None, on_page=None):
+    """生成(或从结果缓存取出)合并文件后直接打印，整个过程在后台任务中完成"""
+    path = cached_output(operation, files, params, extension, build, on_file, on_page)
+    return print_file(path, title + extension)
@@ -0,0 +1,107 @@
+# result_cache.py
+
+from app_paths import app_data_dir
+from file_hash_cache import FileHashCache
+import hashlib
+import json
+import os
+import time
+import uuid
+
+# 缓存目录总大小上限，超过时删除最久未使用的结果
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+# 超过这个天数未使用的结果直接删除
+MAX_AGE_DAYS = 7
+TEMP_SUFFIX = '.partial'
+
+
+class ResultCache:
+    """按 (操作, 参数, 按顺序排列的输入文件内容哈希) 缓存合并结果，
+    同一列表重复打印时直接返回已有文件，不再重新合并"""
+
+    def __init__(self, directory=None, max_bytes=MAX_CACHE_BYTES, max_age_days=MAX_AGE_DAYS):
+        self.directory = directory or os.path.join(app_data_dir(), 'result_cache')
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, operation, files, params, on_file=None):
+        """输入文件的哈希取自持久哈希缓存，文件未变化时不再读取内容"""
+        hash_cache = FileHashCache()
+        try:
+            hashes = hash_cache.hash_files(list(dict.fromkeys(files)), on_file=on_file)
+        finally:
+            hash_cache.close()
+        payload = json.dumps([operation, params, [hashes[file] for file in files]], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def get(self, key, extension):
+        """命中时刷新修改时间(作为最近使用时间)并返回路径，未命中返回None"""
+        path = self.path(key, extension)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, extension, temp_path):
+        path = self.path(key, extension)
+        os.replace(temp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def temp_path(self, extension):
+        return os.path.join(self.directory, f"{uuid.uuid4().hex}{TEMP_SUFFIX}{extension}")
+
+    def evict(self, keep=None):
+        """删除过期的结果，总大小仍超过上限时从最久未使用的开始删除"""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            # 其他任务正在写的临时文件不动，除非已经放了很久
+            if TEMP_SUFFIX in entry.name and now - stat.st_mtime < self.max_age:
+                continue
+            if entry.path != keep and now - stat.st_mtime > self.max_age:
+                _remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                _remove(path)
+                total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        # 可能正被打印程序打开
+        pass
+
+
+def cached_output(operation, files, params, extension, build, on_file=None, on_page=None):
+    """返回操作结果文件的路径；缓存未命中时调用 build(输出路径, on_file, on_page) 生成，
+    生成失败或被取消时不留下半成品"""
+    cache = ResultCache()
+    key = cache.key(operation, files, params)
+    path = cache.get(key, extension)
+    if path:
+        return path
+    temp_path = cache.temp_path(extension)
+    try:
+        build(temp_path, on_file, on_page)
+    except BaseException:
+        _remove(temp_path)
+        raise
+    return cache.put(key, extension, temp_path)
@@ -0,0 +1,104 @@
+# row_index.py
+
+import csv
+import datetime
+import hashlib
+import re
+
+REPORT_SUFFIX = '.duplicates.csv'
+# 首次出现的位置压缩为一个整数：来源编号 << 32 | 行号
+ROW_BITS = 32
+
+
+def parse_columns(text):
+    """把 "A,C,5" 这样的列说明转换为从0开始的列号列表，字母和数字(从1开始)都可以"""
+    columns = []
+    for part in re.split(r'[,，\s]+', text.strip()):
+        if not part:
+            continue
+        if part.isdigit():
+            if int(part) < 1:
+                raise ValueError(f"列号从1开始: {part}")
+            columns.append(int(part) - 1)
+        elif part.isalpha() and part.isascii():
+            index = 0
+            for letter in part.upper():
+                index = index * 26 + ord(letter) - 64
+            columns.append(index - 1)
+        else:
+            raise ValueError(f"无法识别的列: {part}")
+    return columns
+
+
+def _normalize(value):
+    # .xls 的整数读出来是浮点数，空单元格可能是 None 或空字符串，统一后再比较
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+class RowIndex:
+    """合并时逐行计算指纹(整行或指定的关键列)，找出完全相同的行。
+    只保存8字节指纹和首次出现的位置，每行的判断是一次哈希和一次字典查找；
+    mode 为 'drop' 时丢弃重复行，为 'flag' 时保留并在行尾标注首次出现的位置"""
+
+    def __init__(self, key_columns=None, mode='drop'):
+        if mode not in ('drop', 'flag'):
+            raise ValueError(f"未知的重复行处理方式: {mode}")
+        self.key_columns = list(key_columns) if key_columns else None
+        self.mode = mode
+        # 标注写在表头宽度之后的第一列
+        self.flag_column = 0
+        self.sources = []
+        self._source_ids = {}
+        self._first_seen = {}
+        # (文件, 工作表, 行号, 首次出现的文件, 工作表, 行号)
+        self.duplicates = []
+
+    def set_header(self, header_rows):
+        self.flag_column = max((len(row) for row in header_rows), default=0)
+
+    def fingerprint(self, row):
+        if self.key_columns is None:
+            values = [_normalize(value) for value in row]
+        else:
+            values = [_normalize(row[index]) if index < len(row) else None for index in self.key_columns]
+        while values and values[-1] is None:
+            values.pop()
+        digest = hashlib.blake2b(repr(values).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    def check(self, row, file, sheet_name, row_number, key_row=None):
+        """返回要写出的行；重复行在 drop 模式下返回None。
+        key_row 为计算指纹用的行(.xls 的日期等已转换，见 excel_manager.iter_keyed_rows)，默认即 row"""
+        source = (file, sheet_name)
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = self._source_ids[source] = len(self.sources)
+            self.sources.append(source)
+
+        key = self.fingerprint(row if key_row is None else key_row)
+        first = self._first_seen.setdefault(key, source_id << ROW_BITS | row_number)
+        if first >> ROW_BITS == source_id and first & ((1 << ROW_BITS) - 1) == row_number:
+            return row
+        first_file, first_sheet = self.sources[first >> ROW_BITS]
+        first_row = first & ((1 << ROW_BITS) - 1)
+        self.duplicates.append((file, sheet_name, row_number, first_file, first_sheet, first_row))
+        if self.mode == 'drop':
+            return None
+        row = list(row)
+        row.extend([None] * (self.flag_column - len(row)))
+        row.append(f"重复: 同 {first_file} [{first_sheet}] 第{first_row}行")
+        return row
+
+    def write_report(self, path):
+        """重复行清单写成CSV(带BOM，Excel可直接打开)"""
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(["文件", "工作表", "行号", "首次出现的文件", "首次出现的工作表", "首次出现的行号"])
+            writer.writerows(self.duplicates)
+        return path
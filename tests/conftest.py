@@ -0,0 +1,14 @@
+# tests/conftest.py
+# 测试直接导入仓库根目录下的模块；索引、缓存等本机数据写到临时目录
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def app_data(tmp_path_factory, monkeypatch):
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path_factory.getbasetemp() / 'appdata'))
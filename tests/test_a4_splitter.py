@@ -0,0 +1,89 @@
+# tests/test_a4_splitter.py
+# A4拆分(user-004)：每页拆成上下若干个子页面，子页面共用原页面的内容流和资源，只有裁剪框不同。
+# 多文件拆分(user-005)：多进程与逐个拆分结果相同，汇总按列表顺序，坏文件单独报错。
+
+from pathlib import Path
+
+import pytest
+from PyPDF2 import PdfReader
+
+from a4_splitter import A4Splitter
+from benchmark import PAGE_HEIGHT, PAGE_WIDTH, make_pdf
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    path = str(tmp_path / "凭证.pdf")
+    make_pdf(path, 3, 1)
+    return path
+
+
+def crop_boxes(reader):
+    return [[float(value) for value in page.cropbox] for page in reader.pages]
+
+
+def expected_boxes(pages, parts):
+    """每页从上到下依次裁出 parts 个子页面"""
+    step = PAGE_HEIGHT / parts
+    return [[0.0, step * (parts - i - 1), float(PAGE_WIDTH), step * (parts - i)]
+            for _ in range(pages) for i in range(parts)]
+
+
+@pytest.mark.parametrize('profile', ['fast', 'small'])
+@pytest.mark.parametrize('parts', [2, 3])
+def test_split_crops_each_page_top_to_bottom(pdf_file, tmp_path, profile, parts):
+    splitter = A4Splitter(profile)
+    output = splitter.split_pdf(pdf_file, parts)
+    assert output == str(tmp_path / f"凭证-{parts}a5.pdf")
+    assert splitter.last_page_count == 3
+
+    reader = PdfReader(output)
+    boxes = crop_boxes(reader)
+    assert len(boxes) == 3 * parts
+    for box, expected in zip(boxes, expected_boxes(3, parts)):
+        assert box == pytest.approx(expected)
+    source = PdfReader(pdf_file)
+    for index, page in enumerate(reader.pages):
+        assert page.get_contents().get_data() == source.pages[index // parts].get_contents().get_data()
+
+
+@pytest.mark.parametrize('profile', ['fast', 'small'])
+def test_sub_pages_share_content_stream(pdf_file, profile):
+    reader = PdfReader(A4Splitter(profile).split_pdf(pdf_file, 3))
+    for first in range(0, len(reader.pages), 3):
+        contents = {reader.pages[index].raw_get('/Contents').idnum for index in range(first, first + 3)}
+        assert len(contents) == 1
+
+
+@pytest.fixture
+def batch(tmp_path):
+    """两个正常文件、一个损坏文件、一个不存在的文件"""
+    files = []
+    for seed, pages in ((1, 3), (2, 2)):
+        files.append(str(tmp_path / f"in{seed}.pdf"))
+        make_pdf(files[-1], pages, seed)
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 garbage")
+    return files + [str(broken), str(tmp_path / "missing.pdf")]
+
+
+def test_parallel_split_matches_sequential(batch):
+    summary = A4Splitter().split_files_parallel(batch, 2, workers=2)
+    outputs = [result[1] for result in summary['results'][:2]]
+    assert [len(PdfReader(path).pages) for path in outputs] == [6, 4]
+    parallel = [Path(path).read_bytes() for path in outputs]
+
+    sequential = A4Splitter().split_files(batch, 2)
+    assert [result[:3] for result in sequential['results']] == [result[:3] for result in summary['results']]
+    assert [Path(path).read_bytes() for path in outputs] == parallel
+
+
+def test_split_summary_reports_each_file_in_list_order(batch):
+    summary = A4Splitter().split_files_parallel(batch, 2, workers=2)
+    results = summary['results']
+    assert [result[0] for result in results] == batch
+    assert [result[3] for result in results] == [3, 2, 0, 0]
+    assert results[0][2] is None and results[1][2] is None
+    assert results[2][2].startswith("拆分PDF失败")
+    assert results[3][2].startswith("拆分PDF失败")
+    assert (summary['succeeded'], summary['failed'], summary['pages']) == (2, 2, 5)
@@ -0,0 +1,89 @@
+# tests/test_cli.py
+# 命令行批处理入口(user-010)：结果以一行JSON输出，出错时返回非零退出码。
+
+import json
+import os
+
+import pytest
+from PyPDF2 import PdfReader
+
+import cli
+from benchmark import make_pdf, make_xlsx
+
+
+def run(capsys, *argv):
+    """运行命令行，返回 (退出码, 输出的JSON)"""
+    code = cli.main(list(argv))
+    lines = capsys.readouterr().out.strip().splitlines()
+    return code, json.loads(lines[-1])
+
+
+@pytest.fixture
+def pdf_dir(tmp_path):
+    directory = tmp_path / "凭证"
+    directory.mkdir()
+    for seed, pages in ((1, 2), (2, 3)):
+        make_pdf(str(directory / f"in{seed}.pdf"), pages, seed)
+    (directory / "说明.txt").write_text("不是PDF", encoding='utf-8')
+    return directory
+
+
+def test_pdf_merge_expands_directory(capsys, pdf_dir, tmp_path):
+    output = str(tmp_path / "合并.pdf")
+    code, result = run(capsys, 'pdf-merge', str(pdf_dir), '-o', output, '--dedupe')
+    assert code == 0
+    assert (result['command'], result['ok'], result['inputs'], result['output']) == ('pdf-merge', True, 2, output)
+    assert len(PdfReader(output).pages) == 5
+
+
+def test_split_skips_existing_results_and_reports_failures(capsys, pdf_dir):
+    code, result = run(capsys, 'split', str(pdf_dir), '-n', '2', '--workers', '1')
+    assert code == 0
+    assert (result['inputs'], result['succeeded'], result['pages']) == (2, 2, 5)
+    assert os.path.exists(pdf_dir / "in1-2a5.pdf")
+
+    (pdf_dir / "broken.pdf").write_bytes(b"%PDF-1.4 garbage")
+    code, result = run(capsys, 'split', str(pdf_dir), '-n', '2', '--workers', '1')
+    # 已有的 -2a5.pdf 不再作为输入
+    assert code == 1
+    assert (result['ok'], result['inputs'], result['succeeded'], result['failed']) == (True, 3, 2, 1)
+    assert [item['error'] is None for item in result['results']] == [False, True, True]
+
+
+def test_excel_merge_expands_glob(capsys, tmp_path):
+    for seed in (1, 2):
+        make_xlsx(str(tmp_path / f"台账{seed}.xlsx"), 20, seed)
+    output = str(tmp_path / "合并" / "结果.xlsx")
+    os.makedirs(os.path.dirname(output))
+    code, result = run(capsys, 'excel-merge', str(tmp_path / "台账*.xlsx"), '-o', output, '--columnar')
+    assert code == 0
+    assert (result['inputs'], result['rows']) == (2, 40)
+
+
+def test_errors_are_reported_as_json(capsys, tmp_path):
+    code, result = run(capsys, 'pdf-merge', str(tmp_path / "*.pdf"), '-o', str(tmp_path / "out.pdf"))
+    assert code == 1
+    assert result == dict(result, ok=False, error="没有找到PDF文件")
+
+    code, result = run(capsys, 'split', str(tmp_path), '-n', '1')
+    assert code == 2
+    assert result['error'] == "拆分份数至少为2"
+
+
+def test_queue_stores_absolute_paths(capsys, pdf_dir, tmp_path, monkeypatch):
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path / "appdata"))
+    monkeypatch.chdir(pdf_dir)
+    code, result = run(capsys, 'split', 'in1.pdf', '-n', '3', '--queue', '--priority', '2')
+    assert code == 0 and len(result['queued']) == 1
+
+    from job_queue import JobQueue
+    queue = JobQueue()
+    try:
+        job = queue.jobs()[0]
+    finally:
+        queue.close()
+    assert (job['operation'], job['priority'], job['status']) == ('split', 2, 'queued')
+    assert job['params'] == {'file': str(pdf_dir / "in1.pdf"), 'parts': 3, 'profile': 'fast'}
+
+    code, result = run(capsys, 'queue', 'list')
+    assert [(item['id'], item['status']) for item in result['jobs']] == [(job['id'], 'queued')]
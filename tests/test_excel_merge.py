@@ -0,0 +1,200 @@
+# tests/test_excel_merge.py
+# Excel合并的各条路径：流式(user-006)、多进程(user-007)、增量(user-008)和列式(user-019)
+# 结果必须与原来的逐单元格合并一致。
+# 输入由 benchmark.make_xlsx / make_xls 生成：8行表头，之后是数据行，每隔一段夹一个空行。
+
+import datetime
+import os
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from benchmark import ledger_rows, make_xls, make_xlsx, xls_available
+from excel_manager import ExcelManager
+
+# (格式, 数据行数, 种子)
+INPUTS = [('.xlsx', 60, 1), ('.xls', 45, 2), ('.xlsx', 80, 3)]
+
+
+def make_ledger(path, rows, seed):
+    if path.endswith('.xls'):
+        make_xls(path, rows, seed)
+    else:
+        make_xlsx(path, rows, seed)
+    return path
+
+
+@pytest.fixture
+def excel_files(tmp_path):
+    if not xls_available():
+        pytest.skip("需要 xlwt 生成 .xls 输入")
+    return [make_ledger(str(tmp_path / f"in{index}{ext}"), rows, seed)
+            for index, (ext, rows, seed) in enumerate(INPUTS)]
+
+
+def trim(row):
+    """空字符串和空单元格一律视为None，去掉行尾的空单元格"""
+    row = [None if cell == '' else cell for cell in row]
+    while row and row[-1] is None:
+        row.pop()
+    return tuple(row)
+
+
+def read_rows(path):
+    """(第一个工作表的名称, 所有行)"""
+    ws = load_workbook(path).worksheets[0]
+    return ws.title, [trim(row) for row in ws.iter_rows(values_only=True)]
+
+
+def expected_rows():
+    """第一个文件的8行表头，加上各文件去掉空行后的数据行"""
+    header, _ = ledger_rows(INPUTS[0][1], INPUTS[0][2])
+    rows = [trim(row) for row in header]
+    for _, count, seed in INPUTS:
+        rows += [trim(row) for row in ledger_rows(count, seed)[1] if any(cell is not None for cell in row)]
+    return rows
+
+
+def merge(method, excel_files, output_path, **options):
+    manager = ExcelManager()
+    getattr(manager, method)(excel_files, output_path, **options)
+    return manager
+
+
+def test_classic_merge_keeps_header_and_data_rows(excel_files, tmp_path):
+    manager = merge('merge_files', excel_files, str(tmp_path / "classic.xlsx"))
+    title, rows = read_rows(str(tmp_path / "classic.xlsx"))
+    assert title == "凭证"
+    assert rows == expected_rows()
+    assert manager.rows_merged == len(rows) - 8
+
+
+def test_streaming_matches_classic(excel_files, tmp_path):
+    merge('merge_files', excel_files, str(tmp_path / "classic.xlsx"))
+    manager = merge('merge_files', excel_files, str(tmp_path / "streaming.xlsx"), streaming=True)
+    assert read_rows(str(tmp_path / "streaming.xlsx")) == read_rows(str(tmp_path / "classic.xlsx"))
+    assert manager.rows_merged == len(expected_rows()) - 8
+
+
+def test_parallel_matches_classic_in_list_order(excel_files, tmp_path):
+    merge('merge_files', excel_files, str(tmp_path / "classic.xlsx"))
+    manager = merge('merge_files_parallel', excel_files, str(tmp_path / "parallel.xlsx"), workers=2)
+    assert read_rows(str(tmp_path / "parallel.xlsx")) == read_rows(str(tmp_path / "classic.xlsx"))
+    assert manager.rows_merged == len(expected_rows()) - 8
+
+
+def test_parallel_sheet_merge_matches_sequential(excel_files, tmp_path):
+    merge('merge_sheets', excel_files, str(tmp_path / "sheets.xlsx"))
+    merge('merge_sheets_parallel', excel_files, str(tmp_path / "sheets_parallel.xlsx"), workers=2)
+    sequential = load_workbook(str(tmp_path / "sheets.xlsx"))
+    parallel = load_workbook(str(tmp_path / "sheets_parallel.xlsx"))
+    assert parallel.sheetnames == sequential.sheetnames == ["in0_凭证", "in1_凭证", "in2_凭证"]
+    for name in sequential.sheetnames:
+        assert [trim(row) for row in parallel[name].iter_rows(values_only=True)] == \
+            [trim(row) for row in sequential[name].iter_rows(values_only=True)]
+
+
+def incremental(excel_files, output_path):
+    """增量合并，返回 (统计, 本次重新解析的文件)"""
+    parsed = []
+    manager = ExcelManager()
+    manager.merge_files_incremental(excel_files, output_path, on_file=lambda index, total, file: parsed.append(file))
+    return manager.incremental_stats, parsed
+
+
+def assert_same_as_classic(excel_files, output_path, tmp_path):
+    merge('merge_files', excel_files, str(tmp_path / "classic.xlsx"))
+    assert read_rows(output_path) == read_rows(str(tmp_path / "classic.xlsx"))
+
+
+def test_incremental_reuses_unchanged_files(excel_files, tmp_path):
+    output = str(tmp_path / "incremental.xlsx")
+    stats, parsed = incremental(excel_files, output)
+    assert stats['added'] == 3 and parsed == excel_files
+    assert_same_as_classic(excel_files, output, tmp_path)
+
+    # 什么都没变：不重写输出
+    before = os.stat(output).st_mtime_ns
+    stats, parsed = incremental(excel_files, output)
+    assert stats['unchanged'] == 3 and parsed == []
+    assert os.stat(output).st_mtime_ns == before
+
+    # 只改修改时间，内容相同：仍视为未变化
+    os.utime(excel_files[1], ns=(1, 1))
+    stats, parsed = incremental(excel_files, output)
+    assert (stats['unchanged'], stats['changed'], parsed) == (3, 0, [])
+
+    # 新增一个文件：只解析新文件
+    added = make_ledger(str(tmp_path / "in3.xlsx"), 30, 4)
+    stats, parsed = incremental(excel_files + [added], output)
+    assert (stats['added'], stats['unchanged'], parsed) == (1, 3, [added])
+    assert_same_as_classic(excel_files + [added], output, tmp_path)
+
+
+def test_incremental_reparses_changed_and_drops_removed_files(excel_files, tmp_path):
+    output = str(tmp_path / "incremental.xlsx")
+    incremental(excel_files, output)
+
+    make_ledger(excel_files[1], 20, 9)
+    os.utime(excel_files[1], ns=(1, 1))
+    stats, parsed = incremental(excel_files, output)
+    assert (stats['changed'], stats['unchanged'], parsed) == (1, 2, [excel_files[1]])
+    assert_same_as_classic(excel_files, output, tmp_path)
+
+    stats, parsed = incremental(excel_files[1:], output)
+    assert (stats['removed'], stats['unchanged'], parsed) == (1, 2, [])
+    assert_same_as_classic(excel_files[1:], output, tmp_path)
+
+
+def test_incremental_follows_reordered_list(excel_files, tmp_path):
+    output = str(tmp_path / "incremental.xlsx")
+    incremental(excel_files, output)
+
+    reordered = [excel_files[2], excel_files[0], excel_files[1]]
+    stats, parsed = incremental(reordered, output)
+    assert stats['reordered'] and parsed == []
+    assert_same_as_classic(reordered, output, tmp_path)
+
+    # 调整顺序后再次合并，清单记录的是新顺序
+    stats, parsed = incremental(reordered, output)
+    assert not stats['reordered'] and parsed == []
+
+
+def test_incremental_rebuilds_output_edited_outside(excel_files, tmp_path):
+    output = str(tmp_path / "incremental.xlsx")
+    incremental(excel_files, output)
+    wb = load_workbook(output)
+    wb.worksheets[0].append(["手工添加"])
+    wb.save(output)
+
+    stats, parsed = incremental(excel_files, output)
+    assert stats['added'] == 3 and parsed == excel_files
+    assert_same_as_classic(excel_files, output, tmp_path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_columnar_matches_classic(excel_files, tmp_path, workers):
+    merge('merge_files', excel_files, str(tmp_path / "classic.xlsx"))
+    manager = merge('merge_files_columnar', excel_files, str(tmp_path / "columnar.xlsx"), workers=workers)
+    assert read_rows(str(tmp_path / "columnar.xlsx")) == read_rows(str(tmp_path / "classic.xlsx"))
+    assert manager.rows_merged == len(expected_rows()) - 8
+
+
+def test_columnar_keeps_formulas_dates_and_blank_rows_out(tmp_path):
+    source = str(tmp_path / "typed.xlsx")
+    wb = Workbook()
+    ws = wb.active
+    for index in range(8):
+        ws.append([f"表头{index}"])
+    ws.append([datetime.datetime(2024, 3, 1), 12.5, "=B9*2", True])
+    ws.append([None, '', None])
+    ws.append(["合计", 7, None, False])
+    wb.save(source)
+
+    merge('merge_files', [source], str(tmp_path / "classic.xlsx"))
+    merge('merge_files_columnar', [source], str(tmp_path / "columnar.xlsx"), workers=1)
+    title, rows = read_rows(str(tmp_path / "columnar.xlsx"))
+    assert rows[8:] == [(datetime.datetime(2024, 3, 1), 12.5, "=B9*2", True), ("合计", 7, None, False)]
+    assert (title, rows) == read_rows(str(tmp_path / "classic.xlsx"))
+    # 公式写成公式，而不是以"="开头的文本
+    assert load_workbook(str(tmp_path / "columnar.xlsx")).worksheets[0]["C9"].data_type == 'f'
@@ -0,0 +1,59 @@
+# tests/test_file_hash_cache.py
+# 按内容判断重复文件(user-009)：只有大小相同的文件才计算哈希，哈希按 (路径, 大小, 修改时间) 持久缓存。
+
+import os
+
+import pytest
+
+import file_hash_cache
+from file_hash_cache import FileHashCache, content_keys, duplicate_rows, file_sha256
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FileHashCache(str(tmp_path / "hashes.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_copies_are_duplicates_and_the_last_one_is_kept(tmp_path, cache):
+    first = write(tmp_path / "a.pdf", b"same content")
+    other = write(tmp_path / "b.pdf", b"other bytes!")
+    copy = write(tmp_path / "c.pdf", b"same content")
+    single = write(tmp_path / "d.pdf", b"a different size")
+    paths = [first, other, copy, single, other]
+
+    keys = content_keys(paths, cache)
+    assert set(keys) == {first, other, copy}
+    assert keys[first] == keys[copy] != keys[other]
+    # 同一路径出现两次和内容相同的副本都算重复，保留最后出现的一项
+    assert duplicate_rows(paths, keys) == [0, 1]
+
+
+def test_files_with_unique_sizes_are_not_hashed(tmp_path, monkeypatch):
+    paths = [write(tmp_path / "a.pdf", b"1"), write(tmp_path / "b.pdf", b"22")]
+    monkeypatch.setattr(file_hash_cache, 'FileHashCache', lambda: pytest.fail("不应计算哈希"))
+    assert content_keys(paths) == {}
+    assert duplicate_rows(paths + [paths[0]], {}) == [0]
+
+
+def test_hashes_are_cached_until_the_file_changes(tmp_path, cache, monkeypatch):
+    path = write(tmp_path / "a.pdf", b"version 1")
+    assert cache.hash_files([path]) == {path: file_sha256(path)}
+
+    reopened = FileHashCache(cache.db_path)
+    monkeypatch.setattr(file_hash_cache, 'file_sha256', lambda file: pytest.fail("未变化的文件不应重新读取"))
+    try:
+        assert reopened.hash_files([path])[path] == cache.hash_files([path])[path]
+    finally:
+        reopened.close()
+    monkeypatch.undo()
+
+    write(tmp_path / "a.pdf", b"version 2")
+    os.utime(path, ns=(1, 1))
+    assert cache.hash_files([path]) == {path: file_sha256(path)}
@@ -0,0 +1,86 @@
+# tests/test_hot_folder.py
+# 热文件夹(user-013)：写完的文件自动合并或拆分，源文件按结果移到"已处理"或"失败"；
+# 合并批次中无法读取的PDF单独移到"失败"，其余照常合并；输出先写临时文件，不覆盖已有文件。
+
+import glob
+import os
+
+import pytest
+from PyPDF2 import PdfReader
+
+from benchmark import make_pdf, make_xlsx
+from hot_folder import HotFolder
+
+
+@pytest.fixture
+def inbox(tmp_path):
+    directory = tmp_path / "收件"
+    directory.mkdir()
+    return directory
+
+
+def run_once(inbox, mode, **options):
+    """处理完目录中现有的文件后返回 (统计, 各任务结果)"""
+    results = []
+    hot_folder = HotFolder(str(inbox), mode, settle_seconds=0, poll_interval=0.05, workers=1, **options)
+    stats = hot_folder.run(results.append, once=True)
+    return stats, results
+
+
+def names(directory):
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def test_merge_batch_sets_invalid_pdfs_aside(inbox):
+    make_pdf(str(inbox / "a.pdf"), 2, 1)
+    (inbox / "b.pdf").write_bytes(b"%PDF-1.4 garbage")
+    make_pdf(str(inbox / "c.pdf"), 3, 2)
+
+    stats, results = run_once(inbox, 'pdf-merge')
+
+    assert len(results) == 1 and results[0]['error'] is None
+    assert list(results[0]['invalid']) == [str(inbox / "b.pdf")]
+    assert len(PdfReader(results[0]['output']).pages) == 5
+    assert names(inbox / "已处理") == ["a.pdf", "c.pdf"]
+    assert names(inbox / "失败") == ["b.pdf"]
+    assert (stats['processed'], stats['failed']) == (2, 1)
+    assert names(inbox / "输出") == [os.path.basename(results[0]['output'])]
+
+
+def test_merge_batch_without_readable_pdfs_fails(inbox):
+    (inbox / "b.pdf").write_bytes(b"%PDF-1.4 garbage")
+
+    stats, results = run_once(inbox, 'pdf-merge')
+
+    assert results[0]['output'] is None and results[0]['error']
+    assert names(inbox / "失败") == ["b.pdf"]
+    assert names(inbox / "输出") == []
+
+
+def test_split_never_overwrites_existing_files(inbox):
+    make_pdf(str(inbox / "凭证.pdf"), 2, 1)
+    # 源文件旁边和输出目录里已有同名文件
+    (inbox / "凭证-2a5.pdf").write_bytes(b"MINE")
+    (inbox / "输出").mkdir()
+    (inbox / "输出" / "凭证-2a5.pdf").write_bytes(b"EARLIER")
+
+    stats, results = run_once(inbox, 'split')
+
+    assert results[0]['error'] is None and results[0]['pages'] == 2
+    assert results[0]['output'] == str(inbox / "输出" / "凭证-2a5 (1).pdf")
+    assert len(PdfReader(results[0]['output']).pages) == 4
+    assert (inbox / "凭证-2a5.pdf").read_bytes() == b"MINE"
+    assert (inbox / "输出" / "凭证-2a5.pdf").read_bytes() == b"EARLIER"
+    assert names(inbox / "已处理") == ["凭证.pdf"]
+    assert glob.glob(str(inbox / "**" / "*.tmp.pdf"), recursive=True) == []
+
+
+def test_excel_batches(inbox):
+    for seed in (1, 2, 3):
+        make_xlsx(str(inbox / f"台账{seed}.xlsx"), 10, seed)
+
+    stats, results = run_once(inbox, 'excel-merge', batch_size=2)
+
+    assert sorted((len(result['inputs']), result['rows']) for result in results) == [(1, 10), (2, 20)]
+    assert (stats['tasks'], stats['processed'], stats['rows']) == (2, 3, 30)
+    assert len(names(inbox / "输出")) == 2
@@ -0,0 +1,77 @@
+# tests/test_instrumentation.py
+# 任务计时(user-015)：各阶段耗时、读写字节数和内存峰值增量记入日志；
+# 所有任务共用一个内存采样线程，采样间隔之间的尖峰由系统记录的进程峰值补上。
+
+import json
+import threading
+
+import pytest
+
+import instrumentation
+from instrumentation import MemorySampler, finish_trace, log_path, stage, start_trace, summary_text
+
+needs_memory = pytest.mark.skipif(instrumentation.current_rss_mb() is None or instrumentation.peak_rss_mb() is None,
+                                  reason="无法读取本进程内存")
+
+
+def samplers():
+    return [thread for thread in threading.enumerate() if thread.name == 'memory-sampler']
+
+
+def touch(size_mb):
+    """分配并实际写入 size_mb 的内存"""
+    data = bytearray(size_mb * 1024 * 1024)
+    for index in range(0, len(data), 4096):
+        data[index] = 1
+    return data
+
+
+def test_trace_records_stages_and_bytes(tmp_path):
+    source = tmp_path / "in.pdf"
+    source.write_bytes(b"x" * 2048)
+    trace = start_trace('pdf-merge')
+    with stage('open', str(source)):
+        instrumentation.count_read(str(source))
+    with stage('open', str(source)):
+        pass
+    record = finish_trace(trace, 'ok')
+
+    assert record['job'] == 'pdf-merge' and record['status'] == 'ok'
+    assert record['stages']['open']['count'] == 2
+    assert record['files'][0]['file'] == str(source)
+    assert record['bytes_read'] == 2048
+    with open(log_path(), encoding='utf-8') as f:
+        assert json.loads(f.readlines()[-1])['started'] == record['started']
+    assert summary_text(record).startswith("pdf-merge ok 用时")
+    # 没有正在记录的任务时 stage 什么也不做
+    with stage('open'):
+        pass
+
+
+@needs_memory
+def test_spike_between_samples_is_counted(monkeypatch):
+    # 采样线程在任务期间一次也不会运行，峰值只能来自系统记录
+    monkeypatch.setattr(instrumentation, 'MEMORY_SAMPLE_INTERVAL', 60)
+    sampler = MemorySampler()
+    sampler.start()
+    # 分配量超过以往峰值与当前值之差，任务期间一定创下新高
+    data = touch(int(instrumentation.peak_rss_mb() - instrumentation.current_rss_mb()) + 100)
+    del data
+    sampler.stop()
+    assert sampler.growth_mb() >= 90
+
+
+@needs_memory
+def test_traces_share_one_sampler_thread(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'MEMORY_SAMPLE_INTERVAL', 0.01)
+    first, second = MemorySampler(), MemorySampler()
+    first.start()
+    second.start()
+    assert len(samplers()) == 1
+    first.stop()
+    assert len(samplers()) == 1
+    second.stop()
+    for thread in samplers():
+        thread.join(1)
+    assert samplers() == []
+    assert first.growth_mb() >= 0 and second.growth_mb() >= 0
@@ -0,0 +1,160 @@
+# tests/test_job_queue.py
+# 持久任务队列和调度器(user-025)：结果记录、失败时不动目标文件、子进程异常退出、中断次数上限；
+# 被中断任务的临时输出按子进程号清理(user-003)。
+
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import job_queue
+from benchmark import make_pdf
+from job_queue import JobQueue, JobScheduler, MAX_ATTEMPTS, STALE_SECONDS
+from output_file import temp_output_path
+
+
+def exit_without_result(sender, operation, params):
+    """代替 job_queue._job_process：留下临时输出后不送回结果直接退出，模拟崩溃"""
+    with open(temp_output_path(params['output']), 'wb') as f:
+        f.write(b"partial")
+    os._exit(3)
+
+
+def leftovers(directory):
+    """目录中残留的临时输出"""
+    return glob.glob(os.path.join(str(directory), "*.tmp.*"))
+
+
+def run_scheduler(db_path, timeout=60):
+    """按 once 模式运行调度器直到队列清空，超时说明调度器卡住"""
+    scheduler = JobScheduler(db_path, workers=1, poll_interval=0.1)
+    thread = threading.Thread(target=scheduler.run, kwargs={'once': True}, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        scheduler.stop()
+        pytest.fail("调度器没有在队列清空后返回")
+    return scheduler
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.sqlite3"))
+    yield queue
+    queue.close()
+
+
+def test_job_result_is_recorded(queue, tmp_path):
+    inputs = []
+    for seed in (1, 2):
+        inputs.append(str(tmp_path / f"in{seed}.pdf"))
+        make_pdf(inputs[-1], 2, seed)
+    output = str(tmp_path / "merged.pdf")
+    job_id = queue.submit('pdf-merge', {'files': inputs, 'output': output})
+
+    scheduler = run_scheduler(queue.db_path)
+
+    job = queue.jobs()[0]
+    assert (job['id'], job['status'], job['error']) == (job_id, 'ok', None)
+    assert job['result']['output'] == output
+    assert job['trace']['job'] == 'pdf-merge'
+    assert scheduler.completed == 1
+    assert os.path.exists(output)
+    assert leftovers(tmp_path) == []
+
+
+def test_failed_job_keeps_existing_target(queue, tmp_path):
+    output = tmp_path / "merged.pdf"
+    output.write_bytes(b"OLD")
+    queue.submit('pdf-merge', {'files': [str(tmp_path / "missing.pdf")], 'output': str(output)})
+
+    run_scheduler(queue.db_path)
+
+    job = queue.jobs()[0]
+    assert job['status'] == 'failed'
+    assert "missing.pdf" in job['error']
+    assert output.read_bytes() == b"OLD"
+
+
+def test_child_exiting_without_result_fails_job(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, '_job_process', exit_without_result)
+    output = tmp_path / "merged.pdf"
+    output.write_bytes(b"OLD")
+    queue.submit('pdf-merge', {'files': [], 'output': str(output)})
+
+    scheduler = run_scheduler(queue.db_path)
+
+    job = queue.jobs()[0]
+    assert job['status'] == 'failed'
+    assert job['error'] == "任务进程异常退出，退出码 3"
+    assert not scheduler.running
+    assert output.read_bytes() == b"OLD"
+    assert leftovers(tmp_path) == []
+
+
+def test_interrupted_job_gives_up_after_max_attempts(queue):
+    job_id = queue.submit('split', {'file': 'a.pdf', 'parts': 2})
+    for attempt in range(MAX_ATTEMPTS):
+        assert queue.claim_next()['id'] == job_id
+        queue.requeue([job_id])
+    job = queue.jobs()[0]
+    assert job['status'] == 'failed'
+    assert job['attempts'] == MAX_ATTEMPTS
+    assert queue.claim_next() is None
+
+    assert queue.retry(job_id)
+    assert queue.claim_next()['id'] == job_id
+
+
+def test_priority_order(queue):
+    low = queue.submit('split', {'file': 'a.pdf', 'parts': 2})
+    high = queue.submit('split', {'file': 'b.pdf', 'parts': 2}, priority=5)
+    assert [queue.claim_next()['id'], queue.claim_next()['id']] == [high, low]
+
+
+def test_stale_job_removes_only_its_own_partial_output(queue, tmp_path):
+    output = str(tmp_path / "merged.pdf")
+    job_id = queue.submit('pdf-merge', {'files': [], 'output': output})
+    queue.claim_next()
+    queue.set_pid(job_id, 4242)
+    # 崩溃的进程 4242 留下的临时文件，以及另一个任务正在写同一目标的临时文件
+    crashed = tmp_path / "merged.4242-1.tmp.pdf"
+    crashed.write_bytes(b"partial")
+    other = tmp_path / "merged.4343-1.tmp.pdf"
+    other.write_bytes(b"in progress")
+    queue.conn.execute("UPDATE jobs SET heartbeat = ?", (time.time() - STALE_SECONDS - 1,))
+
+    scheduler = JobScheduler(queue.db_path, workers=1)
+    scheduler.workers = 0
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while crashed.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    scheduler.stop()
+    thread.join(10)
+
+    assert not crashed.exists()
+    assert other.read_bytes() == b"in progress"
+    assert queue.jobs()[0]['status'] == 'queued'
+
+
+def test_queue_without_pid_column_is_upgraded(tmp_path):
+    db_path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, operation TEXT, title TEXT, params TEXT, "
+                 "priority INTEGER DEFAULT 0, status TEXT, attempts INTEGER DEFAULT 0, created REAL, started REAL, "
+                 "finished REAL, heartbeat REAL, seconds REAL, result TEXT, error TEXT, trace TEXT)")
+    conn.commit()
+    conn.close()
+    queue = JobQueue(db_path)
+    try:
+        job_id = queue.submit('split', {'file': 'a.pdf', 'parts': 2})
+        queue.claim_next()
+        queue.set_pid(job_id, 1)
+        assert queue.requeue_stale(stale_seconds=-1)[0]['pid'] == 1
+    finally:
+        queue.close()
@@ -0,0 +1,44 @@
+# tests/test_output_file.py
+# 输出先写临时文件(user-003)：成功才替换目标，失败时只删除临时文件；临时文件名按进程和序号区分。
+
+import os
+
+import pytest
+
+from output_file import partial_outputs, replace_on_success, temp_output_path
+
+
+def test_temp_paths_are_unique_per_call(tmp_path):
+    output = str(tmp_path / "合并.xlsx")
+    first, second = temp_output_path(output), temp_output_path(output)
+    assert first != second
+    for path in (first, second):
+        assert os.path.dirname(path) == str(tmp_path)
+        assert path.endswith(".tmp.xlsx")
+        assert f".{os.getpid()}-" in os.path.basename(path)
+
+
+def test_partial_outputs_match_only_the_given_process(tmp_path):
+    output = str(tmp_path / "[2024] 合并.pdf")
+    own = temp_output_path(output)
+    open(own, 'wb').close()
+    other = str(tmp_path / f"[2024] 合并.{os.getpid() + 1}-1.tmp.pdf")
+    open(other, 'wb').close()
+    assert partial_outputs(output, os.getpid()) == [own]
+
+
+def test_replace_on_success(tmp_path):
+    output = tmp_path / "out.pdf"
+    output.write_bytes(b"OLD")
+    with replace_on_success(str(output)) as temp_path:
+        with open(temp_path, 'wb') as f:
+            f.write(b"NEW")
+    assert output.read_bytes() == b"NEW"
+
+    with pytest.raises(KeyboardInterrupt):
+        with replace_on_success(str(output)) as temp_path:
+            with open(temp_path, 'wb') as f:
+                f.write(b"PARTIAL")
+            raise KeyboardInterrupt
+    assert output.read_bytes() == b"NEW"
+    assert os.listdir(tmp_path) == ["out.pdf"]
@@ -0,0 +1,102 @@
+# tests/test_pdf_index.py
+# PDF索引(user-017)：页数和错误随文件变化更新，指纹和各页尺寸按需计算，内容相同的文件共用各页尺寸。
+
+import os
+import shutil
+import sqlite3
+
+import pytest
+from PyPDF2 import PdfReader
+
+import pdf_index
+from benchmark import PAGE_HEIGHT, PAGE_WIDTH, make_pdf
+from file_hash_cache import file_sha256
+from pdf_index import PdfIndex
+
+A4_BOX = [0.0, 0.0, float(PAGE_WIDTH), float(PAGE_HEIGHT)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = PdfIndex(str(tmp_path / "index.sqlite3"))
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    path = str(tmp_path / "in.pdf")
+    make_pdf(path, 3, 1)
+    return path
+
+
+def no_parsing(reader):
+    raise AssertionError("不应再逐页解析")
+
+
+def test_info_is_cached_until_file_changes(index, pdf_file, tmp_path, monkeypatch):
+    assert index.get(pdf_file) == {'page_count': 3, 'encrypted': False, 'error': None}
+    monkeypatch.setattr(pdf_index, 'scan_pdf', lambda path: pytest.fail("未变化的文件不应重新读取"))
+    assert index.get(pdf_file)['page_count'] == 3
+    monkeypatch.undo()
+
+    make_pdf(pdf_file, 5, 2)
+    os.utime(pdf_file, ns=(1, 1))
+    assert index.get(pdf_file)['page_count'] == 5
+
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 garbage")
+    assert index.get(str(broken))['error']
+    assert index.media_boxes(str(broken)) is None
+
+
+def test_media_boxes_filled_from_open_reader(index, pdf_file, monkeypatch):
+    reader = PdfReader(pdf_file)
+    assert index.media_boxes(pdf_file, reader) == [A4_BOX] * 3
+    # 有 reader 时不计算指纹
+    assert index._column(pdf_file, os.stat(pdf_file), 'sha256') is None
+
+    monkeypatch.setattr(pdf_index, 'read_media_boxes', no_parsing)
+    assert index.media_boxes(pdf_file) == [A4_BOX] * 3
+
+
+def test_copied_file_reuses_media_boxes_by_fingerprint(index, pdf_file, tmp_path, monkeypatch):
+    assert index.media_boxes(pdf_file) == [A4_BOX] * 3
+    assert index.fingerprint(pdf_file) == file_sha256(pdf_file)
+
+    copy = str(tmp_path / "copy.pdf")
+    shutil.copyfile(pdf_file, copy)
+    monkeypatch.setattr(pdf_index, 'read_media_boxes', no_parsing)
+    assert index.media_boxes(copy) == [A4_BOX] * 3
+
+
+def test_changed_file_drops_fingerprint_and_media_boxes(index, pdf_file):
+    first = index.fingerprint(pdf_file)
+    index.media_boxes(pdf_file)
+    make_pdf(pdf_file, 2, 7)
+    os.utime(pdf_file, ns=(1, 1))
+    assert index.media_boxes(pdf_file) == [A4_BOX] * 2
+    assert index.fingerprint(pdf_file) != first
+
+
+def test_index_without_fingerprint_columns_is_upgraded(tmp_path, pdf_file):
+    db_path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE pdf_index (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                 "page_count INTEGER, encrypted INTEGER, error TEXT)")
+    conn.commit()
+    conn.close()
+    index = PdfIndex(db_path)
+    try:
+        assert index.media_boxes(pdf_file) == [A4_BOX] * 3
+    finally:
+        index.close()
+
+
+def test_splitter_records_media_boxes(pdf_file, monkeypatch):
+    from a4_splitter import A4Splitter
+    output = A4Splitter().split_pdf(pdf_file, 2)
+    assert len(PdfReader(output).pages) == 6
+    # 第二次拆分各页尺寸取自索引
+    monkeypatch.setattr(pdf_index, 'read_media_boxes', no_parsing)
+    A4Splitter('small').split_pdf(pdf_file, 2)
@@ -0,0 +1,213 @@
+# tests/test_pdf_merge.py
+# 流式合并(user-001)、对象去重(user-002)、按页码选取(user-023)和输出配置(user-024)。
+# 输入由 benchmark.make_pdf 生成：每个文件共用同一份字体，各自带一张不同的图片。
+
+import os
+import re
+
+import pytest
+from PyPDF2 import PdfReader
+
+from benchmark import IMAGE_SIZE, _pdf_bytes, make_pdf
+from pdf_index import root_page_count, scan_pdf
+from pdf_manager import PdfManager, parse_page_ranges
+
+# (页数, 种子)
+INPUTS = [(3, 1), (2, 2), (4, 3)]
+
+
+@pytest.fixture
+def pdf_files(tmp_path):
+    files = []
+    for index, (pages, seed) in enumerate(INPUTS):
+        path = str(tmp_path / f"in{index}.pdf")
+        make_pdf(path, pages, seed)
+        files.append(path)
+    return files
+
+
+def merge(pdf_files, output_path, **options):
+    manager = PdfManager()
+    manager.merge_pdfs(pdf_files, output_path, **options)
+    return manager
+
+
+def page_labels(path):
+    """每页第一行凭证的 "种子-页号"，用来确认页面来源和顺序"""
+    return [re.search(rb"\((\d+-\d{3})-", page.get_contents().get_data()).group(1).decode()
+            for page in PdfReader(path).pages]
+
+
+def page_summary(page):
+    """页面尺寸、内容流(解码后)、字体和图片数据，与对象编号、压缩方式无关"""
+    resources = page["/Resources"]
+    font = resources["/Font"]["/F1"].get_object()
+    image = resources["/XObject"]["/Im1"].get_object()
+    return (
+        [float(value) for value in page.mediabox],
+        page.get_contents().get_data(),
+        font["/FontDescriptor"]["/FontFile2"].get_object().get_data(),
+        image.get_data(),
+    )
+
+
+def expected_labels():
+    labels = []
+    for pages, seed in INPUTS:
+        labels.extend(f"{seed}-{page:03d}" for page in range(pages))
+    return labels
+
+
+@pytest.mark.parametrize('options', [
+    {'streaming': True},
+    {'dedupe': True},
+    {'profile': 'small'},
+])
+def test_streaming_merge_matches_classic_merge(pdf_files, tmp_path, options):
+    classic = str(tmp_path / "classic.pdf")
+    merged = str(tmp_path / "merged.pdf")
+    merge(pdf_files, classic)
+    merge(pdf_files, merged, **options)
+
+    classic_pages = PdfReader(classic).pages
+    merged_pages = PdfReader(merged).pages
+    assert len(merged_pages) == len(classic_pages) == sum(pages for pages, _ in INPUTS)
+    for classic_page, merged_page in zip(classic_pages, merged_pages):
+        assert page_summary(merged_page) == page_summary(classic_page)
+    assert page_labels(merged) == expected_labels()
+
+
+def test_dedupe_writes_shared_font_once(pdf_files, tmp_path):
+    plain = str(tmp_path / "plain.pdf")
+    deduped = str(tmp_path / "deduped.pdf")
+    merge(pdf_files, plain, streaming=True)
+    manager = merge(pdf_files, deduped, dedupe=True)
+
+    # 字体程序、字体描述和字体字典在后两个文件里都与第一个相同
+    assert manager.saved_objects >= 3 * (len(pdf_files) - 1)
+    font_bytes = len(PdfReader(pdf_files[0]).pages[0]["/Resources"]["/Font"]["/F1"]["/FontDescriptor"]
+                     ["/FontFile2"].get_object()._data)
+    assert os.path.getsize(plain) - os.path.getsize(deduped) >= font_bytes * (len(pdf_files) - 1)
+
+    fonts = {page["/Resources"]["/Font"].raw_get("/F1").idnum for page in PdfReader(deduped).pages}
+    images = {page["/Resources"]["/XObject"].raw_get("/Im1").idnum for page in PdfReader(deduped).pages}
+    assert len(fonts) == 1
+    assert len(images) == len(pdf_files)
+
+
+def test_page_ranges_select_and_order_pages(pdf_files, tmp_path):
+    merged = str(tmp_path / "merged.pdf")
+    merge(pdf_files, merged, page_ranges={pdf_files[0]: "3, 1", pdf_files[1]: "2 -"})
+    assert page_labels(merged) == ["1-002", "1-000", "2-001", "3-000", "3-001", "3-002", "3-003"]
+
+
+def test_page_ranges_without_pages_are_rejected(pdf_files, tmp_path):
+    with pytest.raises(ValueError, match="选不到任何页"):
+        merge(pdf_files, str(tmp_path / "merged.pdf"), page_ranges={pdf_files[1]: "5-"})
+    assert not (tmp_path / "merged.pdf").exists()
+
+
+def test_page_count_does_not_expand_page_tree(pdf_files):
+    reader = PdfReader(pdf_files[0])
+    assert root_page_count(reader) == INPUTS[0][0]
+    assert reader.flattened_pages is None
+    assert scan_pdf(pdf_files[2])['page_count'] == INPUTS[2][0]
+
+
+def test_page_count_falls_back_without_root_count(tmp_path):
+    source = tmp_path / "no-count.pdf"
+    source.write_bytes(_pdf_bytes([
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R 4 0 R] >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>",
+    ], 1))
+    assert root_page_count(PdfReader(str(source))) == 2
+
+
+@pytest.mark.parametrize('spec, ranges', [
+    ("", []),
+    ("1-3,5,8-", [(1, 3), (5, 5), (8, None)]),
+    ("1 - 3", [(1, 3)]),
+    ("1, 3 - 5", [(1, 1), (3, 5)]),
+    ("2~4，6 7", [(2, 4), (6, 6), (7, 7)]),
+])
+def test_parse_page_ranges(spec, ranges):
+    assert parse_page_ranges(spec) == ranges
+
+
+@pytest.mark.parametrize('spec', ["0", "3-1", "a", "1-2-3"])
+def test_parse_page_ranges_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_page_ranges(spec)
+
+
+@pytest.mark.parametrize('profile', ['small', 'print'])
+def test_object_streams_have_valid_xref_stream(pdf_files, tmp_path, profile):
+    merged = str(tmp_path / "merged.pdf")
+    merge(pdf_files, merged, profile=profile)
+
+    with open(merged, 'rb') as f:
+        data = f.read()
+    assert b"/Type /XRef" in data and b"/Type /ObjStm" in data
+    assert b"\nxref\n" not in data
+    reader = PdfReader(merged, strict=True)
+    assert len(reader.pages) == sum(pages for pages, _ in INPUTS)
+    assert page_labels(merged) == expected_labels()
+
+    # 交叉引用流中每个对象都能找到：直接写出的指向 "编号 0 obj"，打包的在对象流中
+    offsets = reader.xref[0]
+    packed = reader.xref_objStm
+    assert offsets and packed
+    xref_offset = int(data.rsplit(b"startxref", 1)[1].split()[0])
+    xref_id = int(data[xref_offset:].split(None, 1)[0])
+    xref_stream = reader.get_object(xref_id)
+    assert xref_stream["/Type"] == "/XRef"
+    assert xref_stream["/Size"] == max(list(offsets) + list(packed)) + 1
+    for obj_id, offset in offsets.items():
+        assert data[offset:].startswith(b"%d 0 obj" % obj_id)
+    for obj_id in packed:
+        assert reader.get_object(obj_id) is not None
+
+    pikepdf = pytest.importorskip('pikepdf')
+    with pikepdf.open(merged) as pdf:
+        assert pdf.check_pdf_syntax() == []
+        assert len(pdf.pages) == len(reader.pages)
+
+
+def test_print_profile_downsamples_images(pdf_files, tmp_path):
+    pytest.importorskip('PIL')
+    merged = str(tmp_path / "merged.pdf")
+    # 图片 160 像素，放在 A4 页面上；把打印分辨率降到 10dpi 使其超出需要
+    from pdf_stream_writer import OUTPUT_PROFILES
+    OUTPUT_PROFILES['test'] = dict(OUTPUT_PROFILES['print'], max_image_dpi=10)
+    try:
+        merge(pdf_files, merged, profile='test')
+    finally:
+        del OUTPUT_PROFILES['test']
+    image = PdfReader(merged).pages[0]["/Resources"]["/XObject"]["/Im1"].get_object()
+    assert image["/Filter"] == "/DCTDecode"
+    assert image["/Width"] < IMAGE_SIZE
+
+
+def test_long_reference_chain(tmp_path):
+    """间接引用链比递归深度限制长也能复制"""
+    depth = 5000
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Chain 4 0 R >>",
+    ]
+    for index in range(depth):
+        objects.append(b"<< /Next %d 0 R >>" % (5 + index) if index < depth - 1 else b"<< /Back 4 0 R >>")
+    source = tmp_path / "chain.pdf"
+    source.write_bytes(_pdf_bytes(objects, 1))
+    merged = str(tmp_path / "merged.pdf")
+    merge([str(source)], merged, streaming=True)
+
+    node = PdfReader(merged).pages[0]["/Chain"]
+    length = 1
+    while "/Next" in node:
+        node = node["/Next"]
+        length += 1
+    assert length == depth
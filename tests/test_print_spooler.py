@@ -0,0 +1,100 @@
+# tests/test_print_spooler.py
+# 打印(user-021)：file 后端写入队列目录；lp 后端只发送PDF，其他格式先用 LibreOffice 转换；
+# 找不到 lp 而退回 file 后端时有提示。lp 和 soffice 用临时目录中的脚本代替。
+
+import os
+import shutil
+import stat
+import sys
+
+import pytest
+
+import print_spooler
+from print_spooler import FileSpoolBackend, LpBackend, backend_warning, print_file
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="用 shell 脚本代替 lp 和 soffice")
+
+FAKE_LP = """#!/bin/sh
+cat > "$FAKE_PRINTER/job.bin"
+echo "$@" > "$FAKE_PRINTER/args.txt"
+echo "request id is fake-1"
+"""
+
+# 把 --outdir 之后的目录和最后一个参数(源文件)取出来，输出一个"PDF"
+FAKE_SOFFICE = """#!/bin/sh
+for last; do :; done
+while [ "$1" != "--outdir" ]; do shift; done
+name=$(basename "$last")
+printf '%%PDF-converted' > "$2/${name%.*}.pdf"
+"""
+
+
+def install(directory, name, script):
+    path = directory / name
+    path.write_text(script)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+
+@pytest.fixture
+def bin_dir(tmp_path, monkeypatch):
+    """假程序放在 PATH 最前面，查找 lp、soffice 时只看这个目录；打印内容写到 FAKE_PRINTER 目录"""
+    directory = tmp_path / "bin"
+    directory.mkdir()
+    printer = tmp_path / "printer"
+    printer.mkdir()
+    which = shutil.which
+    monkeypatch.setattr(shutil, 'which', lambda name: which(name, path=str(directory)))
+    monkeypatch.setenv('PATH', str(directory) + os.pathsep + os.environ['PATH'])
+    monkeypatch.setenv('FAKE_PRINTER', str(printer))
+    monkeypatch.delenv('FINANCETOOL_PRINT_BACKEND', raising=False)
+    return directory
+
+
+def test_file_backend_copies_job(tmp_path):
+    source = tmp_path / "合并.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    backend = FileSpoolBackend(str(tmp_path / "spool"))
+    spool_path = print_file(str(source), "PDF合并打印: 1/2.pdf", backend)
+    assert os.path.dirname(spool_path) == str(tmp_path / "spool")
+    assert spool_path.endswith("PDF合并打印_ 1_2.pdf")
+    with open(spool_path, 'rb') as f:
+        assert f.read() == b"%PDF-1.4"
+
+
+def test_lp_sends_pdf_unchanged(tmp_path, bin_dir):
+    install(bin_dir, 'lp', FAKE_LP)
+    source = tmp_path / "合并.pdf"
+    source.write_bytes(b"%PDF-1.4 original")
+    assert LpBackend('office').submit(str(source), "合并.pdf") == "request id is fake-1"
+    assert (tmp_path / "printer" / "job.bin").read_bytes() == b"%PDF-1.4 original"
+    assert (tmp_path / "printer" / "args.txt").read_text().split() == ['-t', '合并.pdf', '-d', 'office']
+
+
+def test_lp_converts_workbook_to_pdf(tmp_path, bin_dir):
+    install(bin_dir, 'lp', FAKE_LP)
+    install(bin_dir, 'soffice', FAKE_SOFFICE)
+    source = tmp_path / "合并.xlsx"
+    source.write_bytes(b"PK workbook")
+    LpBackend().submit(str(source), "Excel合并打印.xlsx")
+    assert (tmp_path / "printer" / "job.bin").read_bytes() == b"%PDF-converted"
+
+
+def test_lp_rejects_workbook_without_libreoffice(tmp_path, bin_dir):
+    install(bin_dir, 'lp', FAKE_LP)
+    source = tmp_path / "合并.xlsx"
+    source.write_bytes(b"PK workbook")
+    with pytest.raises(RuntimeError, match="LibreOffice"):
+        LpBackend().submit(str(source), "Excel合并打印.xlsx")
+    assert not (tmp_path / "printer" / "job.bin").exists()
+
+
+def test_fallback_to_file_backend_is_reported(bin_dir, monkeypatch):
+    assert "找不到 lp 命令" in backend_warning()
+    assert isinstance(print_spooler.make_backend(), FileSpoolBackend)
+
+    install(bin_dir, 'lp', FAKE_LP)
+    assert backend_warning() is None
+    (bin_dir / 'lp').unlink()
+    monkeypatch.setenv('FINANCETOOL_PRINT_BACKEND', 'file')
+    # 明确选择 file 后端时不提示
+    assert backend_warning() is None
@@ -0,0 +1,93 @@
+# tests/test_result_cache.py
+# 合并结果缓存(user-018)：同一组文件、同样参数重复打印时直接返回已有结果，
+# 内容、顺序或参数变了就重新生成；生成失败不留下半成品，超过上限时删除最久未使用的结果。
+
+import os
+import time
+
+import pytest
+
+from result_cache import ResultCache, cached_output
+
+
+@pytest.fixture(autouse=True)
+def own_cache(tmp_path, monkeypatch):
+    # 每个测试用各自的缓存目录，内容相同的输入不会命中别的测试留下的结果
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path / "appdata"))
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    files = []
+    for name, data in (("a.pdf", b"first"), ("b.pdf", b"second")):
+        (tmp_path / name).write_bytes(data)
+        files.append(str(tmp_path / name))
+    return files
+
+
+class Build:
+    """记录被调用的次数，输出内容为调用序号"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, output_path, on_file, on_page):
+        self.calls += 1
+        with open(output_path, 'wb') as f:
+            f.write(b"result %d" % self.calls)
+
+
+def test_same_files_and_params_reuse_the_result(inputs):
+    build = Build()
+    first = cached_output('pdf-print', inputs, {'profile': 'print'}, '.pdf', build)
+    assert cached_output('pdf-print', inputs, {'profile': 'print'}, '.pdf', build) == first
+    assert build.calls == 1
+    with open(first, 'rb') as f:
+        assert f.read() == b"result 1"
+
+
+@pytest.mark.parametrize('change', ['order', 'params', 'operation', 'content'])
+def test_changed_inputs_build_again(inputs, change):
+    build = Build()
+    cached_output('pdf-print', inputs, {'profile': 'print'}, '.pdf', build)
+    operation, files, params = 'pdf-print', inputs, {'profile': 'print'}
+    if change == 'order':
+        files = inputs[::-1]
+    elif change == 'params':
+        params = {'profile': 'fast'}
+    elif change == 'operation':
+        operation = 'excel-print'
+    else:
+        with open(inputs[0], 'ab') as f:
+            f.write(b" changed")
+    cached_output(operation, files, params, '.pdf', build)
+    assert build.calls == 2
+
+
+def test_failed_build_leaves_nothing_behind(inputs):
+    def fail(output_path, on_file, on_page):
+        with open(output_path, 'wb') as f:
+            f.write(b"partial")
+        raise RuntimeError("合并失败")
+
+    with pytest.raises(RuntimeError):
+        cached_output('pdf-print', inputs, {}, '.pdf', fail)
+    assert os.listdir(ResultCache().directory) == []
+    build = Build()
+    cached_output('pdf-print', inputs, {}, '.pdf', build)
+    assert build.calls == 1
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=25)
+    paths = []
+    now = time.time()
+    for index in range(3):
+        temp_path = cache.temp_path('.pdf')
+        with open(temp_path, 'wb') as f:
+            f.write(b"x" * 10)
+        os.utime(temp_path, (now - 100 + index, now - 100 + index))
+        paths.append(cache.put(f"key{index}", '.pdf', temp_path))
+    # 第三个结果放入时总大小超过上限，最久未使用的第一个被删除
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
+    assert cache.get("key0", '.pdf') is None
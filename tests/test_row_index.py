@@ -0,0 +1,97 @@
+# tests/test_row_index.py
+# 合并时检查重复行(user-020)：按整行或关键列的指纹判断，drop 模式丢弃、flag 模式在行尾标注，
+# 重复行清单写在输出文件旁边；.xls 与 .xlsx 中同样的日期、数字视为相同。
+
+import csv
+import datetime
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from benchmark import xls_available
+from excel_manager import ExcelManager
+from row_index import REPORT_SUFFIX, RowIndex, parse_columns
+
+HEADER = [[f"表头{index}"] for index in range(7)] + [["日期", "凭证号", "金额"]]
+
+
+def make_xlsx(path, rows):
+    wb = Workbook()
+    for row in HEADER + rows:
+        wb.active.append(row)
+    wb.save(path)
+    return path
+
+
+def make_xls(path, rows):
+    import xlwt
+    wb = xlwt.Workbook(encoding='utf-8')
+    ws = wb.add_sheet("Sheet")
+    date_style = xlwt.easyxf(num_format_str='YYYY-MM-DD')
+    for row_index, row in enumerate(HEADER + rows):
+        for column_index, value in enumerate(row):
+            if isinstance(value, datetime.datetime):
+                ws.write(row_index, column_index, value, date_style)
+            elif value is not None:
+                ws.write(row_index, column_index, value)
+    wb.save(path)
+    return path
+
+
+def merge(files, output_path, key_columns='', mode='drop'):
+    manager = ExcelManager()
+    manager.merge_files(files, output_path, row_index=RowIndex(parse_columns(key_columns), mode))
+    return manager, [row for row in load_workbook(output_path).active.iter_rows(min_row=9, values_only=True)]
+
+
+def test_parse_columns():
+    assert parse_columns("A, c，5 AA") == [0, 2, 4, 26]
+    assert parse_columns("") == []
+    for text in ("0", "A1", "列"):
+        with pytest.raises(ValueError):
+            parse_columns(text)
+
+
+def test_duplicate_rows_are_dropped_and_reported(tmp_path):
+    first = make_xlsx(str(tmp_path / "一月.xlsx"), [["2024-01-02", "记-1", 100], ["2024-01-03", "记-2", 50]])
+    second = make_xlsx(str(tmp_path / "二月.xlsx"), [["2024-01-03", "记-2", 50.0, None], ["2024-02-01", "记-3", 7]])
+    output = str(tmp_path / "合并.xlsx")
+
+    manager, rows = merge([first, second], output)
+
+    assert [row[1] for row in rows] == ["记-1", "记-2", "记-3"]
+    assert (manager.rows_merged, manager.duplicate_rows) == (3, 1)
+    with open(manager.duplicate_report, encoding='utf-8-sig') as f:
+        report = list(csv.reader(f))
+    assert report[1] == [second, "Sheet", "9", first, "Sheet", "10"]
+
+    # 没有重复行时删除上次留下的清单
+    manager, rows = merge([first], output)
+    assert manager.duplicate_report is None
+    assert not (tmp_path / ("合并.xlsx" + REPORT_SUFFIX)).exists()
+
+
+def test_key_columns_and_flag_mode(tmp_path):
+    source = make_xlsx(str(tmp_path / "台账.xlsx"), [["2024-01-02", "记-1", 100], ["2024-01-05", "记-1", 200]])
+
+    _, rows = merge([source], str(tmp_path / "整行.xlsx"))
+    assert len(rows) == 2
+
+    manager, rows = merge([source], str(tmp_path / "凭证号.xlsx"), key_columns="B", mode='flag')
+    assert manager.duplicate_rows == 1
+    assert rows[0][:3] == ("2024-01-02", "记-1", 100) and rows[0][3] is None
+    assert rows[1][:3] == ("2024-01-05", "记-1", 200)
+    assert rows[1][3] == f"重复: 同 {source} [Sheet] 第9行"
+
+
+def test_dates_match_across_xls_and_xlsx(tmp_path):
+    if not xls_available():
+        pytest.skip("需要 xlwt 生成 .xls 输入")
+    rows = [[datetime.datetime(2024, 3, 1), "记-1", 100], [datetime.datetime(2024, 3, 2), "记-2", 12.5]]
+    old = make_xls(str(tmp_path / "旧账.xls"), rows)
+    new = make_xlsx(str(tmp_path / "新账.xlsx"), rows + [[datetime.datetime(2024, 3, 3), "记-3", 1]])
+
+    manager, merged = merge([old, new], str(tmp_path / "合并.xlsx"))
+
+    assert manager.duplicate_rows == 2
+    assert [row[1] for row in merged] == ["记-1", "记-2", "记-3"]